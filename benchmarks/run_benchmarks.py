@@ -0,0 +1,205 @@
+"""
+Замеры времени и пиковой памяти функций services, reports и views на синтетических выписках.
+
+Запуск из корня репозитория:
+    python -m benchmarks.run_benchmarks --sizes 10000 100000 1000000
+    python -m benchmarks.run_benchmarks --sizes 10000 --compare benchmarks/results/previous.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Any, Callable, Collection, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import generate_transactions, to_records
+from src.logging_config import configure_logging
+from src.reports import spending_by_category
+from src.result_cache import configure_result_cache
+from src.services import analyze_cashback_categories, filter_personal_transfers, investment_bank, simple_search
+from src.views import events_page, main_page
+
+RESULTS_DIR = os.path.join("benchmarks", "results")
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+# Замедление относительно базового прогона, которое считается регрессией
+REGRESSION_THRESHOLD = 1.2
+
+
+class Benchmark(NamedTuple):
+    """
+    Замер: имя, функция, получающая подготовленные входные данные, и имена нужных ей входных данных.
+    """
+
+    name: str
+    run: Callable[[Dict[str, Any]], Any]
+    inputs: Tuple[str, ...] = ("df",)
+
+
+BENCHMARKS = (
+    Benchmark("analyze_cashback_categories", lambda data: analyze_cashback_categories(data["df"], 2024, 6)),
+    Benchmark("investment_bank", lambda data: investment_bank("2024-06", data["df"], 50)),
+    Benchmark("simple_search", lambda data: simple_search(data["records"], "pyaterochka"), ("records",)),
+    Benchmark("filter_personal_transfers", lambda data: filter_personal_transfers(data["df"])),
+    Benchmark("spending_by_category", lambda data: spending_by_category(data["df"], "Продукты", "2024-03-01")),
+    Benchmark("events_page", lambda data: events_page(data["df"])),
+    Benchmark("main_page", lambda data: main_page(data["json_path"]), ("json_path",)),
+)
+
+
+def prepare_inputs(
+    n_rows: int, work_dir: str, seed: int = 0, inputs: Collection[str] = ("df", "records", "json_path")
+) -> Dict[str, Any]:
+    """
+    Генерирует выписку и готовит входные данные замеров: DataFrame ("df"),
+    список словарей ("records") и JSON-файл ("json_path"). Список и файл строятся
+    только если они перечислены в inputs: на миллионе строк это десятки секунд
+    и сотни мегабайт. Подготовка в замер времени не входит.
+    """
+    data: Dict[str, Any] = {"df": generate_transactions(n_rows, seed=seed)}
+    if "records" in inputs or "json_path" in inputs:
+        records = to_records(data["df"])
+        if "records" in inputs:
+            data["records"] = records
+        if "json_path" in inputs:
+            data["json_path"] = os.path.join(work_dir, f"transactions_{n_rows}.json")
+            with open(data["json_path"], "w", encoding="utf-8") as f:
+                json.dump(records, f, ensure_ascii=False)
+        del records
+    return data
+
+
+def measure(benchmark: Benchmark, data: Dict[str, Any], repeat: int) -> Dict[str, Any]:
+    """
+    Замеряет время repeat запусков и пиковую память отдельного запуска под tracemalloc,
+    чтобы трассировка не искажала время.
+    """
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        benchmark.run(data)
+        timings.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    try:
+        benchmark.run(data)
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "min_seconds": min(timings),
+        "median_seconds": statistics.median(timings),
+        "peak_memory_bytes": peak_memory,
+    }
+
+
+def run_benchmarks(
+    sizes: Sequence[int] = DEFAULT_SIZES,
+    names: Optional[Sequence[str]] = None,
+    repeat: int = 3,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """
+    Выполняет замеры для всех размеров выписки.
+
+    Кэш результатов отключается, а логирование ограничивается предупреждениями,
+    чтобы замер отражал вычисления, а не запись логов.
+
+    Returns:
+        Dict[str, Any]: Описание окружения и список результатов замеров.
+    """
+    configure_result_cache(enabled=False)
+    configure_logging(level=logging.WARNING)
+    selected = [benchmark for benchmark in BENCHMARKS if names is None or benchmark.name in names]
+    inputs = {name for benchmark in selected for name in benchmark.inputs}
+
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for n_rows in sizes:
+            data = prepare_inputs(n_rows, work_dir, seed, inputs)
+            for benchmark in selected:
+                result = {"benchmark": benchmark.name, "rows": n_rows, "repeat": repeat}
+                result.update(measure(benchmark, data, repeat))
+                results.append(result)
+                print(
+                    f"{benchmark.name:<30} {n_rows:>10} rows  {result['median_seconds']:.4f} s  "
+                    f"{result['peak_memory_bytes'] / 2 ** 20:.1f} MiB",
+                    file=sys.stderr,
+                )
+            del data
+
+    return {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+
+def compare_results(
+    baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = REGRESSION_THRESHOLD
+) -> List[Dict[str, Any]]:
+    """
+    Находит замеры, медианное время которых выросло больше чем в threshold раз.
+    """
+    baseline_times = {(r["benchmark"], r["rows"]): r["median_seconds"] for r in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        previous = baseline_times.get((result["benchmark"], result["rows"]))
+        if previous and result["median_seconds"] > previous * threshold:
+            regressions.append({
+                "benchmark": result["benchmark"],
+                "rows": result["rows"],
+                "baseline_seconds": previous,
+                "current_seconds": result["median_seconds"],
+                "ratio": result["median_seconds"] / previous,
+            })
+    return regressions
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="Размеры выписок")
+    parser.add_argument("--benchmarks", nargs="+", help="Имена замеров (по умолчанию все)")
+    parser.add_argument("--repeat", type=int, default=3, help="Количество запусков каждого замера")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Файл результатов (по умолчанию benchmarks/results/<время>.json)")
+    parser.add_argument("--compare", help="Файл предыдущего прогона для поиска регрессий")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.sizes, args.benchmarks, args.repeat, args.seed)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"benchmark-{datetime.now():%Y%m%d-%H%M%S}.json")
+    if os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=4)
+    print(f"Результаты сохранены в {output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare_results(json.load(f), report, args.threshold)
+        for regression in regressions:
+            print(
+                f"Регрессия: {regression['benchmark']} ({regression['rows']} строк) "
+                f"{regression['baseline_seconds']:.4f} s -> {regression['current_seconds']:.4f} s",
+                file=sys.stderr,
+            )
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
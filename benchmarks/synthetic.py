@@ -0,0 +1,152 @@
+from typing import NamedTuple, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Колонки синтетической выписки
+COLUMNS = (
+    "Дата операции", "Категория", "Сумма", "Сумма операции", "Кэшбек", "Описание операции", "Комментарий", "Тип",
+)
+
+PERSON_NAMES = (
+    "Ирина Ш.", "Максим Ш.", "Александр Ф.", "Руслан К.", "Вениамин Б.", "Елена П.", "Дмитрий В.", "Ольга Н.",
+    "Сергей Л.", "Анна Т.", "Павел Р.", "Мария Д.", "Николай Г.", "Татьяна С.", "Андрей М.", "Юлия К.",
+)
+
+COMMENTS = ("Перевод денежных средств", "Возврат долга", "За обед", "На подарок", "Кофе")
+
+
+class CategoryProfile(NamedTuple):
+    """
+    Распределение операций одной категории: доля в выписке, тип операции,
+    описания, медиана и разброс суммы (логнормальное распределение) и доля
+    операций с кешбэком.
+    """
+
+    category: str
+    weight: float
+    operation_type: str
+    descriptions: Tuple[str, ...]
+    median_amount: float
+    sigma: float
+    cashback_share: float
+
+
+# Доли категорий и суммы подобраны по реальной выписке за 2024 год
+PROFILES = (
+    CategoryProfile(
+        "Прочие расходы", 0.40, "Списание",
+        ('Перечисление средств в рамках услуги "Копилка для сдачи"', "Между своими счетами",
+         "Пополнение брокерского счета, перевод кэшбэка на Инвесткопилку"),
+        30.0, 1.2, 0.0,
+    ),
+    CategoryProfile(
+        "Фастфуд", 0.15, "Списание",
+        ("MOSKVA\\TEREMOK  CAFE", "Gorod Moskva\\ONE PRICE", "MOSCOW\\IP CHEBAN A  A", "Moskovskaya o\\Vkusnoitochka",
+         "MOSKVA\\TAKO"),
+        350.0, 0.6, 0.6,
+    ),
+    CategoryProfile(
+        "Продукты", 0.12, "Списание",
+        ("Odinczovo\\IP MUSTAFAEV G A", "Moskovskaya o\\PYATEROCHKA 24", "Odinczovo\\OOO FMMR",
+         "Odinczovo\\PEREKRESTOK GUBKIN", "MOSCOW\\MAGNOLIYA"),
+        450.0, 0.8, 0.5,
+    ),
+    CategoryProfile(
+        "Финансовые операции", 0.06, "Списание", PERSON_NAMES, 1500.0, 1.0, 0.0,
+    ),
+    CategoryProfile(
+        "Пополнения", 0.08, "Пополнение",
+        ("Между своими счетами", "Вход. перевод из другого банка", "Вход. перевод от клиента Альфа-Банка")
+        + PERSON_NAMES[:4],
+        4000.0, 1.1, 0.0,
+    ),
+    CategoryProfile(
+        "Транспорт", 0.05, "Списание",
+        ("Odincovo\\OAO CPPC", "MOSCOW\\VOYKOVSKAYA", "Moskva\\Moskva Metro", "Odintsovo\\AO Centralnaya PPK"),
+        60.0, 0.5, 0.3,
+    ),
+    CategoryProfile("Алкоголь", 0.03, "Списание", ("MOSCOW\\KRASNOE&BELOE", "Odinczovo\\BRISTOL"), 400.0, 0.6, 0.5),
+    CategoryProfile("Цифровые товары", 0.03, "Списание", ("YANDEX.PLUS", "APPLE.COM/BILL"), 300.0, 0.5, 0.8),
+    CategoryProfile("Такси", 0.02, "Списание", ("YANDEX.GO", "CITYMOBIL"), 450.0, 0.5, 0.8),
+    CategoryProfile(
+        "Кафе и рестораны", 0.02, "Списание", ("MOSCOW\\COFFEE LIKE", "MOSKVA\\KHACHAPURI"), 1200.0, 0.6, 0.8
+    ),
+    CategoryProfile("Маркетплейсы", 0.02, "Списание", ("MOSKVA\\OZON RU", "WILDBERRIES"), 1500.0, 0.9, 0.8),
+    CategoryProfile("Связь, интернет и ТВ", 0.01, "Списание", ("MTS", "Beeline"), 500.0, 0.3, 0.8),
+    CategoryProfile("АЗС", 0.01, "Списание", ("LUKOIL AZS", "GAZPROMNEFT"), 2000.0, 0.4, 0.8),
+)
+
+
+def generate_transactions(
+    n_rows: int, seed: int = 0, start: str = "2023-01-01", end: str = "2024-12-31"
+) -> pd.DataFrame:
+    """
+    Генерирует синтетическую выписку со схемой реальной выгрузки.
+
+    Строковые колонки создаются как pandas Categorical, поэтому даже 10 млн
+    строк занимают несколько сотен мегабайт. Даты - datetime64, в порядке
+    убывания, как в выписке банка. "Сумма операции" заполнена так же, как
+    в нормализованной выписке (см. src.utils.add_service_columns). Результат
+    детерминирован для заданного seed.
+
+    Args:
+        n_rows (int): Количество транзакций.
+        seed (int): Начальное значение генератора случайных чисел.
+        start (str): Первая дата периода 'YYYY-MM-DD'.
+        end (str): Последняя дата периода 'YYYY-MM-DD'.
+
+    Returns:
+        pd.DataFrame: Транзакции с колонками COLUMNS.
+    """
+    rng = np.random.default_rng(seed)
+    weights = np.array([profile.weight for profile in PROFILES])
+    category_codes = rng.choice(len(PROFILES), size=n_rows, p=weights / weights.sum())
+
+    # Общий словарь описаний; описание выбирается равномерно внутри категории
+    descriptions = sorted({text for profile in PROFILES for text in profile.descriptions})
+    description_codes = np.empty(n_rows, dtype=np.int32)
+    amounts = np.empty(n_rows, dtype=float)
+    has_cashback = np.empty(n_rows, dtype=bool)
+    for code, profile in enumerate(PROFILES):
+        rows = np.flatnonzero(category_codes == code)
+        lookup = np.array([descriptions.index(text) for text in profile.descriptions], dtype=np.int32)
+        description_codes[rows] = lookup[rng.integers(len(lookup), size=len(rows))]
+        amounts[rows] = rng.lognormal(np.log(profile.median_amount), profile.sigma, size=len(rows))
+        has_cashback[rows] = rng.random(len(rows)) < profile.cashback_share
+    amounts = np.round(np.maximum(amounts, 0.5), 2)
+
+    is_income = np.array([profile.operation_type == "Пополнение" for profile in PROFILES])[category_codes]
+    cashback = np.where(has_cashback, np.floor(amounts) / 100, np.nan)
+
+    start_ts, end_ts = pd.Timestamp(start), pd.Timestamp(end)
+    offsets = np.sort(rng.integers(0, (end_ts - start_ts).days + 1, size=n_rows))[::-1]
+    dates = start_ts + pd.to_timedelta(offsets, unit="D")
+
+    # Комментарии есть только у части переводов
+    comment_codes = np.full(n_rows, -1, dtype=np.int8)
+    transfers = np.isin(category_codes, [i for i, p in enumerate(PROFILES) if p.descriptions == PERSON_NAMES])
+    commented = transfers & (rng.random(n_rows) < 0.3)
+    comment_codes[commented] = rng.integers(len(COMMENTS), size=int(commented.sum()))
+
+    return pd.DataFrame({
+        "Дата операции": dates,
+        "Категория": pd.Categorical.from_codes(category_codes, [profile.category for profile in PROFILES]),
+        "Сумма": amounts,
+        # Как после add_service_columns: положительная сумма только у списаний
+        "Сумма операции": np.where(is_income, np.nan, amounts),
+        "Кэшбек": cashback,
+        "Описание операции": pd.Categorical.from_codes(description_codes, descriptions),
+        "Комментарий": pd.Categorical.from_codes(comment_codes, COMMENTS),
+        "Тип": pd.Categorical.from_codes(is_income.astype(np.int8), ["Списание", "Пополнение"]),
+    })
+
+
+def to_records(df: pd.DataFrame) -> list:
+    """
+    Преобразует синтетическую выписку в список словарей, как у функций,
+    принимающих транзакции списком. Даты - строки ДД.ММ.ГГГГ, пропуски - None.
+    """
+    frame = df.astype(object)
+    frame["Дата операции"] = df["Дата операции"].dt.strftime("%d.%m.%Y")
+    return frame.where(df.notna(), None).to_dict(orient="records")
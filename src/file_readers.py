@@ -0,0 +1,470 @@
+from __future__ import annotations
+
+import hashlib
+import importlib.util
+import json
+import os
+from typing import Any, Dict, Iterator, List, Optional
+
+from src.lazy_imports import lazy_import
+from src.logging_config import setup_logger
+from src.metrics import instrument
+from src.utils import normalize_transactions
+
+pd = lazy_import("pandas")
+# pyarrow - необязательная зависимость: без нее кэш пишется в pickle, а экспорт в Arrow недоступен
+pa = lazy_import("pyarrow") if importlib.util.find_spec("pyarrow") is not None else None
+
+file_readers_logger = setup_logger("file_readers", "logs/file_readers.log")
+
+# Директория по умолчанию для колоночного кэша выписок
+CACHE_DIR = os.path.join(".cache", "statements")
+
+# Размер блока при потоковом чтении JSON-файлов транзакций
+JSON_READ_CHUNK_SIZE = 1 << 16
+
+# Колонка с именем файла выписки в объединенных данных
+SOURCE_COLUMN = "Источник"
+STATEMENT_EXTENSIONS = (".xlsx", ".xls")
+
+# Колонки, по которым совпадают одни и те же операции в пересекающихся выписках.
+# Статус и дата проводки не учитываются: они меняются между выгрузками.
+DEDUP_COLUMNS = ("Дата операции", "Номер счета", "Номер карты", "Описание операции", "Сумма", "Валюта", "Тип")
+
+# Формат дат в выгрузках банка
+STATEMENT_DATE_FORMAT = "%d.%m.%Y"
+DATE_COLUMN = "Дата операции"
+
+
+def _source_prefix(file_path: str) -> str:
+    """
+    Возвращает префикс имени файла кэша, уникальный для пути к выписке.
+    """
+    abs_path = os.path.abspath(file_path)
+    path_hash = hashlib.sha1(abs_path.encode("utf-8")).hexdigest()[:16]
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    return f"{stem}-{path_hash}"
+
+
+def _cache_key(file_path: str) -> str:
+    """
+    Формирует ключ кэша по пути, времени изменения и размеру файла.
+    """
+    stat = os.stat(file_path)
+    state = f"{os.path.abspath(file_path)}|{stat.st_mtime_ns}|{stat.st_size}"
+    state_hash = hashlib.sha1(state.encode("utf-8")).hexdigest()[:16]
+    return f"{_source_prefix(file_path)}-{state_hash}"
+
+
+def _parse_statement(file_path: str) -> pd.DataFrame:
+    """
+    Читает XLSX-выписку и приводит колонки к типам, пригодным для колоночного хранения.
+    """
+    df = pd.read_excel(file_path)
+
+    # Пустые колонки без заголовка - артефакт выгрузки
+    df = df.drop(columns=[col for col in df.columns if str(col).startswith("Unnamed:")])
+
+    if DATE_COLUMN in df.columns:
+        df[DATE_COLUMN] = pd.to_datetime(df[DATE_COLUMN], format=STATEMENT_DATE_FORMAT, errors="coerce")
+
+    # Номера счетов не помещаются в int64, поэтому храним их как строки
+    for column in df.columns:
+        if df[column].dtype == object:
+            df[column] = df[column].where(df[column].isna(), df[column].astype(str))
+
+    return df
+
+
+def _write_cache(df: pd.DataFrame, cache_base: str) -> str:
+    """
+    Атомарно записывает DataFrame в кэш. Parquet используется при наличии pyarrow,
+    иначе - pickle.
+    """
+    try:
+        cache_path = f"{cache_base}.parquet"
+        tmp_path = f"{cache_path}.tmp"
+        df.to_parquet(tmp_path, index=False)
+    except ImportError:
+        cache_path = f"{cache_base}.pkl"
+        tmp_path = f"{cache_path}.tmp"
+        df.to_pickle(tmp_path)
+    os.replace(tmp_path, cache_path)
+    return cache_path
+
+
+def _read_cache(cache_path: str, columns: Optional[List[str]]) -> pd.DataFrame:
+    """
+    Читает DataFrame из кэша, загружая только запрошенные колонки.
+    """
+    if cache_path.endswith(".parquet"):
+        return pd.read_parquet(cache_path, columns=columns)
+    df = pd.read_pickle(cache_path)
+    return df[columns] if columns is not None else df
+
+
+def _find_cache(cache_base: str) -> Optional[str]:
+    for extension in (".parquet", ".pkl"):
+        if os.path.exists(cache_base + extension):
+            return cache_base + extension
+    return None
+
+
+def _remove_stale_caches(cache_dir: str, file_path: str, current_base: str) -> None:
+    """
+    Удаляет кэши предыдущих версий той же выписки.
+    """
+    prefix = _source_prefix(file_path) + "-"
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if name.startswith(prefix) and os.path.splitext(path)[0] != current_base:
+            os.remove(path)
+            file_readers_logger.info("Удален устаревший кэш: %s", path)
+
+
+@instrument("file_readers.read_statement")
+def read_statement(
+    file_path: str,
+    columns: Optional[List[str]] = None,
+    cache_dir: Optional[str] = CACHE_DIR,
+    normalize: bool = False,
+) -> pd.DataFrame:
+    """
+    Загружает банковскую выписку из XLSX, используя колоночный кэш.
+
+    При первом чтении выписка разбирается из Excel и сохраняется в кэш (Parquet).
+    Кэш привязан к пути, времени изменения и размеру файла, поэтому
+    изменение выписки приводит к повторному разбору.
+
+    Args:
+        file_path (str): Путь к XLSX-файлу выписки.
+        columns (Optional[List[str]]): Колонки для загрузки. По умолчанию - все.
+        cache_dir (Optional[str]): Директория кэша. None отключает кэширование.
+        normalize (bool): Привести колонки к компактным типам (см. normalize_transactions).
+
+    Returns:
+        pd.DataFrame: Транзакции выписки с датой операции в формате datetime64.
+    """
+    df = _load_statement(file_path, columns, cache_dir)
+    return normalize_transactions(df) if normalize else df
+
+
+def _load_statement(file_path: str, columns: Optional[List[str]], cache_dir: Optional[str]) -> pd.DataFrame:
+    if cache_dir is None:
+        file_readers_logger.info("Чтение выписки %s без кэша.", file_path)
+        df = _parse_statement(file_path)
+        return df[columns] if columns is not None else df
+
+    cache_base = os.path.join(cache_dir, _cache_key(file_path))
+    cache_path = _find_cache(cache_base)
+    if cache_path is not None:
+        file_readers_logger.info("Выписка %s загружена из кэша %s.", file_path, cache_path)
+        return _read_cache(cache_path, columns)
+
+    file_readers_logger.info("Кэш для %s не найден, разбор XLSX.", file_path)
+    df = _parse_statement(file_path)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    _remove_stale_caches(cache_dir, file_path, cache_base)
+    cache_path = _write_cache(df, cache_base)
+    file_readers_logger.info("Выписка %s сохранена в кэш %s: %s строк.", file_path, cache_path, len(df))
+
+    return df[columns] if columns is not None else df
+
+
+def export_arrow(df: pd.DataFrame, file_path: str) -> str:
+    """
+    Сохраняет транзакции в файл Arrow IPC (Feather v2) без сжатия для чтения через open_arrow.
+
+    Файл записывается атомарно. Категориальные колонки сохраняются как словарные.
+
+    Args:
+        df (pd.DataFrame): Нормализованные транзакции (см. normalize_transactions).
+        file_path (str): Путь к файлу.
+
+    Returns:
+        str: Путь к записанному файлу.
+
+    Raises:
+        ImportError: Не установлен pyarrow.
+    """
+    if pa is None:
+        raise ImportError("Для экспорта в Arrow требуется пакет pyarrow")
+    if os.path.dirname(file_path):
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    tmp_path = f"{file_path}.tmp.{os.getpid()}"
+    with pa.OSFile(tmp_path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, file_path)
+    file_readers_logger.info("Экспортировано %s транзакций в %s.", len(df), file_path)
+    return file_path
+
+
+def _arrow_dtype(arrow_type):
+    # Словарные колонки становятся pandas Categorical (копируются только коды и словарь),
+    # остальные остаются массивами Arrow поверх отображенного файла
+    return None if pa.types.is_dictionary(arrow_type) else pd.ArrowDtype(arrow_type)
+
+
+def open_arrow(file_path: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Открывает файл export_arrow через отображение в память (memory map).
+
+    Числовые, строковые колонки и даты не копируются в память процесса, а ссылаются
+    на страницы файла, поэтому несколько процессов, открывших один файл, делят
+    одни и те же страницы. Функции services, reports и views принимают такой DataFrame
+    наравне с обычным. Изменять его не следует.
+
+    Args:
+        file_path (str): Путь к файлу Arrow IPC.
+        columns (Optional[List[str]]): Колонки для загрузки. По умолчанию - все.
+
+    Returns:
+        pd.DataFrame: Транзакции с колонками pd.ArrowDtype и Categorical.
+
+    Raises:
+        ImportError: Не установлен pyarrow.
+    """
+    if pa is None:
+        raise ImportError("Для чтения Arrow требуется пакет pyarrow")
+    table = pa.ipc.open_file(pa.memory_map(file_path, "r")).read_all()
+    if columns is not None:
+        table = table.select(columns)
+    df = table.to_pandas(types_mapper=_arrow_dtype)
+    file_readers_logger.info("Открыт Arrow-файл %s: %s транзакций.", file_path, len(df))
+    return df
+
+
+def _drop_overlap_duplicates(merged: pd.DataFrame, newer: pd.DataFrame) -> pd.DataFrame:
+    """
+    Удаляет из уже объединенных данных операции, которые повторяются в более новой выписке.
+
+    Сравниваются только строки из периода пересечения выписок. Одинаковые операции
+    учитываются с кратностью: две одинаковые покупки в один день сохраняются,
+    если они есть в обеих выписках. Из пересечения остается версия новой выписки.
+    """
+    if merged.empty or newer.empty or DATE_COLUMN not in merged.columns:
+        return merged
+
+    overlap_start = newer[DATE_COLUMN].min()
+    overlap_end = merged[DATE_COLUMN].max()
+    if pd.isna(overlap_start) or pd.isna(overlap_end) or overlap_start > overlap_end:
+        return merged
+
+    key_columns = [col for col in DEDUP_COLUMNS if col in merged.columns and col in newer.columns]
+    in_overlap = merged[DATE_COLUMN].between(overlap_start, overlap_end)
+    merged_keys = pd.util.hash_pandas_object(merged.loc[in_overlap, key_columns], index=False)
+    newer_keys = pd.util.hash_pandas_object(newer[key_columns], index=False)
+
+    # k-я копия операции удаляется, если в новой выписке таких операций больше k
+    occurrence = merged_keys.groupby(merged_keys).cumcount()
+    newer_counts = newer_keys.value_counts().reindex(merged_keys.to_numpy(), fill_value=0).to_numpy()
+    duplicate = merged_keys.index[occurrence.to_numpy() < newer_counts]
+
+    file_readers_logger.info("Удалено повторов из пересечения выписок: %s", len(duplicate))
+    return merged.drop(index=duplicate)
+
+
+def read_statements(
+    directory: str,
+    max_workers: Optional[int] = None,
+    cache_dir: Optional[str] = CACHE_DIR,
+    normalize: bool = True,
+) -> pd.DataFrame:
+    """
+    Загружает все XLSX-выписки из директории параллельно в пуле процессов.
+
+    Выписки упорядочиваются по первой дате операции. Операции из пересекающихся
+    периодов соседних выгрузок учитываются один раз. Имя файла каждой строки
+    сохраняется в колонке SOURCE_COLUMN.
+
+    Args:
+        directory (str): Директория с выписками.
+        max_workers (Optional[int]): Количество процессов. 1 - разбор в текущем процессе,
+            None - по числу процессоров.
+        cache_dir (Optional[str]): Директория кэша (см. read_statement).
+        normalize (bool): Привести результат к компактным типам (см. normalize_transactions).
+
+    Returns:
+        pd.DataFrame: Объединенные транзакции всех выписок.
+    """
+    file_paths = sorted(
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if name.lower().endswith(STATEMENT_EXTENSIONS) and not name.startswith("~$")
+    )
+    file_readers_logger.info("Загрузка %s выписок из %s, процессов: %s", len(file_paths), directory, max_workers)
+    if not file_paths:
+        return pd.DataFrame()
+
+    if max_workers == 1 or len(file_paths) == 1:
+        frames = [read_statement(file_path, cache_dir=cache_dir) for file_path in file_paths]
+    else:
+        # Пул процессов импортирует multiprocessing, поэтому импорт отложен до первого использования
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            frames = list(executor.map(
+                read_statement, file_paths, [None] * len(file_paths), [cache_dir] * len(file_paths)
+            ))
+
+    for file_path, frame in zip(file_paths, frames):
+        frame[SOURCE_COLUMN] = os.path.basename(file_path)
+
+    def first_date(frame: pd.DataFrame):
+        if DATE_COLUMN not in frame.columns or frame[DATE_COLUMN].isna().all():
+            return pd.Timestamp.max
+        return frame[DATE_COLUMN].min()
+
+    merged = pd.DataFrame()
+    for frame in sorted(frames, key=first_date):
+        merged = pd.concat([_drop_overlap_duplicates(merged, frame), frame], ignore_index=True)
+
+    file_readers_logger.info("Объединено %s транзакций из %s выписок.", len(merged), len(file_paths))
+    return normalize_transactions(merged) if normalize else merged
+
+
+def _iter_json_lines(f) -> Iterator[Any]:
+    for line_number, line in enumerate(f, start=1):
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                raise json.JSONDecodeError(f"Строка {line_number}: {e.msg}", e.doc, e.pos) from e
+
+
+def _first_line_is_document(f) -> bool:
+    """
+    Проверяет, что первая непустая строка файла - отдельный JSON-документ, как в JSON Lines.
+    Позиция чтения файла не восстанавливается.
+    """
+    for line in f:
+        if line.strip():
+            try:
+                json.loads(line)
+            except json.JSONDecodeError:
+                return False
+            return True
+    return True
+
+
+def _iter_json_array(f, buffer: str, chunk_size: int) -> Iterator[Any]:
+    """
+    Последовательно разбирает элементы JSON-массива, читая файл блоками.
+    В памяти хранится только текущий блок и разбираемый элемент.
+    """
+    decoder = json.JSONDecoder()
+    pos = buffer.index("[") + 1
+    eof = False
+    expect_item = True
+    after_comma = False
+
+    while True:
+        # Пропуск пробелов и разделителей между элементами
+        while True:
+            while pos < len(buffer) and buffer[pos].isspace():
+                pos += 1
+            if pos < len(buffer) or eof:
+                break
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+
+        if pos >= len(buffer):
+            raise json.JSONDecodeError("Незавершенный JSON-массив", buffer, pos)
+        if buffer[pos] == "]":
+            if after_comma:
+                raise json.JSONDecodeError("Лишняя запятая в конце массива", buffer, pos)
+            # После закрывающей скобки допускаются только пробелы до конца файла
+            pos += 1
+            while True:
+                while pos < len(buffer) and buffer[pos].isspace():
+                    pos += 1
+                if pos < len(buffer):
+                    raise json.JSONDecodeError("Лишние данные после JSON-массива", buffer, pos)
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    return
+                buffer, pos = chunk, 0
+        if not expect_item:
+            if buffer[pos] != ",":
+                raise json.JSONDecodeError("Ожидалась запятая между элементами", buffer, pos)
+            pos += 1
+            expect_item = after_comma = True
+            continue
+
+        try:
+            item, end = decoder.raw_decode(buffer, pos)
+            # Число на границе блока может быть прочитано не полностью ("15" из "15.5"),
+            # поэтому элемент считается завершенным только перед разделителем
+            complete = eof or (end < len(buffer) and (buffer[end] in ",]" or buffer[end].isspace()))
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            complete = False
+        if not complete:
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+            continue
+
+        yield item
+        pos = end
+        expect_item = after_comma = False
+        if pos > chunk_size:
+            buffer, pos = buffer[pos:], 0
+
+
+def iter_json_transactions(file_path: str, chunk_size: int = JSON_READ_CHUNK_SIZE) -> Iterator[Dict[str, Any]]:
+    """
+    Потоково читает транзакции из JSON-файла, не загружая его целиком.
+
+    Поддерживаются файл с JSON-массивом транзакций, JSON Lines (по одной
+    транзакции в строке) и одна транзакция - JSON-объект на нескольких строках.
+    Формат определяется по первому символу файла и первой непустой строке.
+
+    Args:
+        file_path (str): Путь к файлу.
+        chunk_size (int): Размер блока чтения в символах.
+
+    Yields:
+        Dict[str, Any]: Очередная транзакция.
+    """
+    with open(file_path, encoding="utf-8") as f:
+        buffer = ""
+        while not buffer.strip():
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            buffer += chunk
+
+        if buffer.lstrip().startswith("["):
+            yield from _iter_json_array(f, buffer, chunk_size)
+            return
+
+        f.seek(0)
+        if buffer.lstrip().startswith("{") and not _first_line_is_document(f):
+            # Объект, отформатированный с отступами, - один документ, а не JSON Lines
+            f.seek(0)
+            yield json.load(f)
+            return
+        f.seek(0)
+        yield from _iter_json_lines(f)
+
+
+def iter_transaction_batches(file_path: str, batch_size: int = 10_000) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Потоково читает транзакции из JSON-файла пакетами фиксированного размера.
+    Последний пакет может быть меньше batch_size.
+    """
+    batch = []
+    for transaction in iter_json_transactions(file_path):
+        batch.append(transaction)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
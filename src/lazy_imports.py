@@ -0,0 +1,31 @@
+import importlib.util
+import sys
+from types import ModuleType
+
+
+def lazy_import(name: str) -> ModuleType:
+    """
+    Возвращает модуль, который загружается при первом обращении к его атрибуту.
+
+    Используется для тяжелых зависимостей (pandas, numpy): импорт модулей
+    пакета и запуск CLI не тратят время на их загрузку, пока они не нужны.
+    Если модуль уже загружен, возвращается он сам.
+
+    Args:
+        name (str): Имя модуля, например "pandas".
+
+    Returns:
+        ModuleType: Модуль с отложенной загрузкой.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
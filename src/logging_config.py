@@ -1,22 +1,152 @@
+import atexit
 import logging
 import os
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
 
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+formatter = logging.Formatter(LOG_FORMAT)
 
-def setup_logger(logger_name: str, log_file: str, level=logging.INFO):
+# Записи всех логгеров проходят через общую очередь и пишутся в файлы фоновым потоком
+_log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+_file_handlers: Dict[str, logging.Handler] = {}
+_queue_handlers: Dict[str, logging.Handler] = {}
+_listener: Optional[QueueListener] = None
+_listener_lock = threading.Lock()
+_use_queue = True
+
+
+class _LazyFileHandler(logging.FileHandler):
     """
-    Настраивает логгер с указанным именем и файлом логирования.
+    Файловый обработчик, который создает директорию и открывает файл только при первой записи.
+    """
+
+    def __init__(self, filename: str, mode: str = "a") -> None:
+        super().__init__(filename, mode=mode, encoding="utf-8", delay=True)
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
+
+
+class _RoutingHandler(logging.Handler):
+    """
+    Передает запись из очереди файловому обработчику ее логгера.
+    """
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        handler = _file_handlers.get(record.name)
+        if handler is not None:
+            handler.handle(record)
+        return True
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.handle(record)
+
+
+class _LazyQueueHandler(QueueHandler):
+    """
+    Обработчик очереди, запускающий фоновый поток записи при первом сообщении.
+    """
+
+    def emit(self, record: logging.LogRecord) -> None:
+        _ensure_listener()
+        super().emit(record)
+
+
+def _ensure_listener() -> None:
+    global _listener
+    if _listener is not None:
+        return
+    with _listener_lock:
+        if _listener is None:
+            _listener = QueueListener(_log_queue, _RoutingHandler())
+            _listener.start()
+
+
+def setup_logger(logger_name: str, log_file: str, level=logging.INFO, mode: str = "a"):
     """
-    os.makedirs(os.path.dirname(log_file), exist_ok=True)
+    Настраивает логгер с указанным именем и файлом логирования.
 
+    Файл и директория создаются только при первой записи, поэтому вызов
+    на уровне модуля не выполняет файловых операций при импорте. По умолчанию
+    записи передаются в файл асинхронно через очередь (см. configure_logging).
+    """
     logger = logging.getLogger(logger_name)
     logger.setLevel(level)
 
-    file_handler = logging.FileHandler(log_file, mode="a", encoding="utf-8")
-    formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
-    file_handler.setFormatter(formatter)
-
-    if not logger.handlers:
-        logger.addHandler(file_handler)
+    if logger_name not in _file_handlers:
+        file_handler = _LazyFileHandler(log_file, mode=mode)
+        file_handler.setFormatter(formatter)
+        _file_handlers[logger_name] = file_handler
+        _queue_handlers[logger_name] = _LazyQueueHandler(_log_queue)
+        logger.addHandler(_queue_handlers[logger_name] if _use_queue else file_handler)
 
     return logger
 
+
+def configure_logging(level: Optional[int] = None, use_queue: Optional[bool] = None) -> None:
+    """
+    Меняет настройки всех логгеров, созданных через setup_logger.
+
+    Args:
+        level (Optional[int]): Новый уровень логирования, например logging.WARNING.
+        use_queue (Optional[bool]): True - асинхронная запись через очередь,
+            False - синхронная запись в файл из вызывающего потока.
+    """
+    global _use_queue
+    if use_queue is not None and use_queue != _use_queue:
+        shutdown_logging()
+        _use_queue = use_queue
+        for logger_name, file_handler in _file_handlers.items():
+            logger = logging.getLogger(logger_name)
+            queue_handler = _queue_handlers[logger_name]
+            logger.removeHandler(file_handler if use_queue else queue_handler)
+            logger.addHandler(queue_handler if use_queue else file_handler)
+
+    if level is not None:
+        for logger_name in _file_handlers:
+            logging.getLogger(logger_name).setLevel(level)
+
+
+def shutdown_logging() -> None:
+    """
+    Дописывает накопленные в очереди записи и закрывает файлы логов.
+    После вызова логирование продолжает работать: поток записи запустится заново,
+    а файлы, открытые в режиме "w", при следующей записи откроются на дозапись.
+    """
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+    for file_handler in _file_handlers.values():
+        file_handler.close()
+        # FileHandler не открывает повторно закрытый файл с mode="w"
+        file_handler.mode = "a"
+
+
+def _reinit_after_fork() -> None:
+    """
+    Восстанавливает логирование в дочернем процессе (например, в пуле ProcessPoolExecutor).
+
+    Поток записи родителя в дочерний процесс не копируется, поэтому очередь
+    создается заново. Файлы открываются повторно в режиме дозаписи, чтобы
+    не перезаписать логи родительского процесса.
+    """
+    global _log_queue, _listener, _listener_lock
+    _log_queue = queue.SimpleQueue()
+    _listener = None
+    _listener_lock = threading.Lock()
+    for queue_handler in _queue_handlers.values():
+        queue_handler.queue = _log_queue
+    for file_handler in _file_handlers.values():
+        file_handler.stream = None
+        file_handler.mode = "a"
+
+
+atexit.register(shutdown_logging)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reinit_after_fork)
@@ -0,0 +1,338 @@
+"""
+Пакетный запуск анализов по выписке.
+
+Выписка загружается один раз, после чего задания из файла выполняются
+параллельно в пуле потоков над общими данными. Результат каждого задания
+записывается в отдельный файл <output-dir>/<name>.json.
+
+С ключом --processes задания выполняются в пуле процессов: нормализованная
+таблица один раз экспортируется в Arrow-файл, который процессы открывают
+через memory map и не разбирают выписку повторно.
+
+Пример:
+    python -m src.main data/Statement_18.12.2023-18.12.2024.XLSX --jobs jobs.json --output-dir reports
+
+Файл заданий - JSON-список (или объект с ключом "jobs"):
+    [
+        {"name": "cashback", "type": "cashback", "start_month": "2024-01", "end_month": "2024-12"},
+        {"name": "piggy_bank", "type": "investment_bank", "limits": [10, 50, 100]},
+        {"name": "ozon", "type": "search", "query": "ozon"},
+        {"name": "transfers", "type": "personal_transfers"},
+        {"name": "fastfood", "type": "spending", "category": "Фастфуд", "start_date": "2024-09-01"},
+        {"name": "events", "type": "events"}
+    ]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence
+
+from src.file_readers import export_arrow, iter_json_transactions, open_arrow, read_statement
+from src.lazy_imports import lazy_import
+from src.logging_config import setup_logger
+from src.reports import spending_by_category
+from src.services import (
+    TransactionSearchIndex, analyze_cashback_by_month, filter_personal_transfers, investment_bank_by_month,
+    simple_search,
+)
+from src.transactions_filters import TransactionStore
+from src.utils import add_service_columns, dataframe_to_records, dumps_json, frame_to_json, normalize_transactions
+from src.views import events_page
+
+pd = lazy_import("pandas")
+
+main_logger = setup_logger("main", "logs/main.log")
+
+# Формат дат в транзакциях, передаваемых поиску, - как в выписке банка
+SEARCH_DATE_FORMAT = "%d.%m.%Y"
+
+
+class JobResult(NamedTuple):
+    """
+    Итог выполнения задания: путь к файлу результата или текст ошибки.
+    """
+
+    name: str
+    output_path: Optional[str]
+    seconds: float
+    error: Optional[str] = None
+
+
+def load_transactions(file_path: str) -> pd.DataFrame:
+    """
+    Загружает выписку (XLSX или JSON) и приводит ее к виду, который ожидают функции services
+    (см. utils.add_service_columns).
+    """
+    if file_path.lower().endswith(".json"):
+        df = normalize_transactions(pd.DataFrame(list(iter_json_transactions(file_path))))
+    else:
+        df = read_statement(file_path, normalize=True)
+    return add_service_columns(df)
+
+
+class SharedData:
+    """
+    Данные выписки, общие для всех заданий. Производные структуры
+    (TransactionStore, поисковый индекс) строятся один раз при первом обращении.
+    """
+
+    def __init__(self, df: pd.DataFrame) -> None:
+        self.frame = df
+        self._lock = threading.Lock()
+        self._store: Optional[TransactionStore] = None
+        self._search_index: Optional[TransactionSearchIndex] = None
+
+    @property
+    def store(self) -> TransactionStore:
+        with self._lock:
+            if self._store is None:
+                self._store = TransactionStore(self.frame)
+            return self._store
+
+    @property
+    def search_index(self) -> TransactionSearchIndex:
+        with self._lock:
+            if self._search_index is None:
+                self._search_index = TransactionSearchIndex(dataframe_to_records(self.frame, SEARCH_DATE_FORMAT))
+            return self._search_index
+
+
+def _cashback_job(data: SharedData, job: Dict[str, Any], compact: bool) -> str:
+    return dumps_json(analyze_cashback_by_month(data.frame, job.get("start_month"), job.get("end_month")), compact)
+
+
+def _investment_bank_job(data: SharedData, job: Dict[str, Any], compact: bool) -> str:
+    savings = investment_bank_by_month(data.frame, job["limits"], job.get("start_month"), job.get("end_month"))
+    result = {month: {str(limit): value for limit, value in row.items()} for month, row in savings.iterrows()}
+    return dumps_json(result, compact)
+
+
+def _search_job(data: SharedData, job: Dict[str, Any], compact: bool) -> str:
+    return simple_search(data.search_index, job["query"], compact=compact)
+
+
+def _personal_transfers_job(data: SharedData, job: Dict[str, Any], compact: bool) -> str:
+    return frame_to_json(filter_personal_transfers(data.frame), compact)
+
+
+def _spending_job(data: SharedData, job: Dict[str, Any], compact: bool) -> str:
+    # spending_by_category сообщает об ошибке даты в ответе, а задание должно завершиться ошибкой
+    datetime.strptime(job["start_date"], "%Y-%m-%d")
+    return spending_by_category(data.store, job["category"], job["start_date"], compact=compact)
+
+
+def _events_job(data: SharedData, job: Dict[str, Any], compact: bool) -> str:
+    return events_page(data.store, compact=compact)
+
+
+# Типы заданий: обработчик и обязательные параметры
+JOB_TYPES: Dict[str, Callable[[SharedData, Dict[str, Any], bool], str]] = {
+    "cashback": _cashback_job,
+    "investment_bank": _investment_bank_job,
+    "search": _search_job,
+    "personal_transfers": _personal_transfers_job,
+    "spending": _spending_job,
+    "events": _events_job,
+}
+REQUIRED_PARAMS = {
+    "investment_bank": ("limits",),
+    "search": ("query",),
+    "spending": ("category", "start_date"),
+}
+
+
+def load_jobs(file_path: str) -> List[Dict[str, Any]]:
+    """
+    Читает и проверяет файл заданий.
+
+    Raises:
+        ValueError: Неизвестный тип задания, нет обязательного параметра или имена повторяются.
+    """
+    with open(file_path, encoding="utf-8") as f:
+        jobs = json.load(f)
+    if isinstance(jobs, dict):
+        jobs = jobs.get("jobs", [])
+
+    names = set()
+    for position, job in enumerate(jobs):
+        job_type = job.get("type")
+        if job_type not in JOB_TYPES:
+            raise ValueError(f"Задание {position}: неизвестный тип '{job_type}'")
+        missing = [param for param in REQUIRED_PARAMS.get(job_type, ()) if param not in job]
+        if missing:
+            raise ValueError(f"Задание {position} ({job_type}): нет параметров {missing}")
+        job.setdefault("name", f"{position:02d}_{job_type}")
+        if job["name"] in names:
+            raise ValueError(f"Повторяется имя задания '{job['name']}'")
+        names.add(job["name"])
+    return jobs
+
+
+def _run_job(data: SharedData, job: Dict[str, Any], output_dir: str, compact: bool) -> JobResult:
+    started = time.perf_counter()
+    try:
+        result = JOB_TYPES[job["type"]](data, job, compact)
+        output_path = os.path.join(output_dir, f"{job['name']}.json")
+        with open(output_path, "w", encoding="utf-8") as f:
+            f.write(result)
+    except Exception as e:
+        main_logger.error("Задание '%s' завершилось ошибкой: %s", job["name"], e)
+        return JobResult(job["name"], None, time.perf_counter() - started, f"{type(e).__name__}: {e}")
+    main_logger.info("Задание '%s' выполнено: %s", job["name"], output_path)
+    return JobResult(job["name"], output_path, time.perf_counter() - started)
+
+
+def run_jobs(
+    data: SharedData,
+    jobs: Sequence[Dict[str, Any]],
+    output_dir: str,
+    max_workers: Optional[int] = None,
+    compact: bool = False,
+) -> List[JobResult]:
+    """
+    Выполняет задания параллельно в пуле потоков над общими данными.
+
+    Args:
+        data (SharedData): Загруженная выписка.
+        jobs (Sequence[Dict[str, Any]]): Задания (см. load_jobs).
+        output_dir (str): Директория для файлов результатов.
+        max_workers (Optional[int]): Количество потоков. None - по умолчанию ThreadPoolExecutor.
+        compact (bool): Записывать компактный JSON без отступов.
+
+    Returns:
+        List[JobResult]: Итоги заданий в порядке файла заданий.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(_run_job, data, job, output_dir, compact) for job in jobs]
+        return [future.result() for future in futures]
+
+
+# Общие данные процесса пула (см. _init_worker)
+_worker_data: Optional[SharedData] = None
+
+
+def _init_worker(arrow_path: str) -> None:
+    global _worker_data
+    _worker_data = SharedData(open_arrow(arrow_path))
+
+
+def _run_job_in_worker(job: Dict[str, Any], output_dir: str, compact: bool) -> JobResult:
+    return _run_job(_worker_data, job, output_dir, compact)
+
+
+def run_job_type_in_worker(job_type: str, job: Dict[str, Any], compact: bool) -> str:
+    """
+    Выполняет обработчик задания над данными процесса пула, запущенного start_process_pool.
+    """
+    return JOB_TYPES[job_type](_worker_data, job, compact)
+
+
+def start_process_pool(
+    df: pd.DataFrame, work_dir: str, processes: Optional[int] = None, start_method: Optional[str] = None
+) -> Executor:
+    """
+    Экспортирует таблицу в Arrow-файл в work_dir и запускает пул процессов, каждый
+    из которых открывает этот файл через memory map (см. export_arrow, open_arrow).
+    Файл должен существовать, пока пул не остановлен.
+
+    start_method - способ запуска процессов multiprocessing ("fork", "forkserver", "spawn").
+    None - способ по умолчанию для платформы. Из процесса, где уже работают другие
+    потоки, безопаснее "forkserver" или "spawn": fork копирует захваченные ими блокировки.
+
+    Raises:
+        ImportError: Не установлен pyarrow.
+    """
+    # Пул процессов импортирует multiprocessing, поэтому импорт отложен до первого использования
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    arrow_path = export_arrow(df, os.path.join(work_dir, "transactions.arrow"))
+    return ProcessPoolExecutor(
+        max_workers=processes,
+        mp_context=multiprocessing.get_context(start_method),
+        initializer=_init_worker,
+        initargs=(arrow_path,),
+    )
+
+
+def run_jobs_in_processes(
+    df: pd.DataFrame,
+    jobs: Sequence[Dict[str, Any]],
+    output_dir: str,
+    processes: Optional[int] = None,
+    compact: bool = False,
+) -> List[JobResult]:
+    """
+    Выполняет задания в пуле процессов над одной копией данных.
+
+    Таблица экспортируется во временный Arrow-файл (см. export_arrow), который каждый
+    процесс открывает через memory map: страницы файла общие для всех процессов.
+
+    Args:
+        df (pd.DataFrame): Загруженная выписка (см. load_transactions).
+        jobs (Sequence[Dict[str, Any]]): Задания (см. load_jobs).
+        output_dir (str): Директория для файлов результатов.
+        processes (Optional[int]): Количество процессов. None - по числу процессоров.
+        compact (bool): Записывать компактный JSON без отступов.
+
+    Returns:
+        List[JobResult]: Итоги заданий в порядке файла заданий.
+
+    Raises:
+        ImportError: Не установлен pyarrow.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    with tempfile.TemporaryDirectory(prefix="finanalyze-") as tmp_dir:
+        with start_process_pool(df, tmp_dir, processes) as executor:
+            futures = [executor.submit(_run_job_in_worker, job, output_dir, compact) for job in jobs]
+            return [future.result() for future in futures]
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("statement", help="Выписка: XLSX или JSON-файл транзакций")
+    parser.add_argument("--jobs", required=True, help="JSON-файл заданий")
+    parser.add_argument("--output-dir", default="reports", help="Директория для результатов")
+    parser.add_argument("--workers", type=int, default=None, help="Количество потоков")
+    parser.add_argument(
+        "--processes", type=int, default=None, help="Выполнять задания в заданном числе процессов (требует pyarrow)"
+    )
+    parser.add_argument("--compact", action="store_true", help="Компактный JSON без отступов")
+    args = parser.parse_args(argv)
+
+    try:
+        jobs = load_jobs(args.jobs)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+    started = time.perf_counter()
+    df = load_transactions(args.statement)
+    main_logger.info(
+        "Выписка %s загружена за %.2f с: %s транзакций", args.statement, time.perf_counter() - started, len(df)
+    )
+
+    results = None
+    if args.processes is not None:
+        try:
+            results = run_jobs_in_processes(df, jobs, args.output_dir, args.processes, args.compact)
+        except ImportError as e:
+            main_logger.warning("Пул процессов недоступен, задания выполняются в потоках: %s", e)
+    if results is None:
+        results = run_jobs(SharedData(df), jobs, args.output_dir, args.workers, args.compact)
+    for result in results:
+        status = result.output_path if result.error is None else f"ошибка: {result.error}"
+        print(f"{result.name}: {status} ({result.seconds:.2f} с)")
+    return 1 if any(result.error for result in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
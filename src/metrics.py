@@ -0,0 +1,195 @@
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+# Метрики собираются, только если включены через configure_metrics
+# или переменную окружения FINANALYZE_METRICS=1
+_enabled = os.environ.get("FINANALYZE_METRICS", "") not in ("", "0")
+_metrics: Dict[str, Dict[str, float]] = {}
+_lock = threading.Lock()
+
+PROMETHEUS_PREFIX = "finanalyze"
+
+
+def configure_metrics(enabled: bool) -> None:
+    """
+    Включает или выключает сбор метрик. В выключенном состоянии таймеры
+    и счетчики не выполняют никакой работы.
+    """
+    global _enabled
+    _enabled = enabled
+
+
+def metrics_enabled() -> bool:
+    return _enabled
+
+
+def _record(name: str, seconds: float, rows_in: Optional[int], rows_out: Optional[int], failed: bool) -> None:
+    with _lock:
+        metric = _metrics.get(name)
+        if metric is None:
+            metric = _metrics[name] = {
+                "calls": 0, "errors": 0, "seconds_total": 0.0, "seconds_max": 0.0, "rows_in": 0, "rows_out": 0,
+            }
+        metric["calls"] += 1
+        metric["errors"] += failed
+        metric["seconds_total"] += seconds
+        metric["seconds_max"] = max(metric["seconds_max"], seconds)
+        if rows_in is not None:
+            metric["rows_in"] += rows_in
+        if rows_out is not None:
+            metric["rows_out"] += rows_out
+
+
+class Stage:
+    """
+    Таймер этапа обработки. Используется как контекстный менеджер:
+
+        with stage("reports.spending_by_category.filter", rows_in=len(df)) as s:
+            filtered = df[mask]
+            s.rows_out = len(filtered)
+    """
+
+    __slots__ = ("name", "rows_in", "rows_out", "_started")
+
+    def __init__(self, name: str, rows_in: Optional[int] = None) -> None:
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out: Optional[int] = None
+
+    def __enter__(self) -> "Stage":
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        _record(self.name, time.perf_counter() - self._started, self.rows_in, self.rows_out, exc_type is not None)
+
+
+class _NullStage:
+    """
+    Пустой этап для выключенных метрик: присваивания rows_in/rows_out игнорируются.
+    """
+
+    __slots__ = ()
+    name = rows_in = rows_out = None
+
+    def __enter__(self) -> "_NullStage":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        return None
+
+    def __setattr__(self, key: str, value: Any) -> None:
+        return None
+
+
+_NULL_STAGE = _NullStage()
+
+
+def stage(name: str, rows_in: Optional[int] = None):
+    """
+    Возвращает таймер этапа name. При выключенных метриках - общий пустой объект.
+    """
+    if not _enabled:
+        return _NULL_STAGE
+    return Stage(name, rows_in)
+
+
+def _count_rows(value: Any) -> Optional[int]:
+    if isinstance(value, (str, bytes, dict)) or not hasattr(value, "__len__"):
+        return None
+    return len(value)
+
+
+def instrument(name: str) -> Callable:
+    """
+    Декоратор, измеряющий время вызовов функции и объем данных.
+
+    Входные строки - длина первого позиционного аргумента с длиной (DataFrame,
+    список транзакций, TransactionStore), выходные - длина результата, если он
+    не строка. Для генераторов время считается за весь перебор.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def generator_wrapper(*args, **kwargs):
+                if not _enabled:
+                    yield from func(*args, **kwargs)
+                    return
+                rows_in = next((n for n in map(_count_rows, args) if n is not None), None)
+                started = time.perf_counter()
+                failed = True
+                try:
+                    yield from func(*args, **kwargs)
+                    failed = False
+                finally:
+                    _record(name, time.perf_counter() - started, rows_in, None, failed)
+
+            return generator_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            rows_in = next((n for n in map(_count_rows, args) if n is not None), None)
+            started = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except BaseException:
+                _record(name, time.perf_counter() - started, rows_in, None, True)
+                raise
+            _record(name, time.perf_counter() - started, rows_in, _count_rows(result), False)
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def reset_metrics() -> None:
+    with _lock:
+        _metrics.clear()
+
+
+def metrics_snapshot() -> Dict[str, Dict[str, float]]:
+    """
+    Возвращает копию накопленных метрик: для каждого этапа число вызовов и ошибок,
+    суммарное и максимальное время в секундах, входные и выходные строки.
+    """
+    with _lock:
+        return {name: dict(metric) for name, metric in sorted(_metrics.items())}
+
+
+def metrics_json() -> str:
+    return json.dumps(metrics_snapshot(), ensure_ascii=False, indent=4)
+
+
+def metrics_prometheus() -> str:
+    """
+    Возвращает метрики в текстовом формате Prometheus.
+    """
+    series = (
+        ("calls", "counter", "Количество вызовов этапа"),
+        ("errors", "counter", "Количество вызовов этапа, завершившихся исключением"),
+        ("seconds_total", "counter", "Суммарное время этапа в секундах"),
+        ("seconds_max", "gauge", "Максимальное время одного вызова этапа в секундах"),
+        ("rows_in", "counter", "Количество входных строк"),
+        ("rows_out", "counter", "Количество выходных строк"),
+    )
+    snapshot = metrics_snapshot()
+    lines = []
+    for field, metric_type, description in series:
+        metric_name = f"{PROMETHEUS_PREFIX}_stage_{field}"
+        if metric_type == "counter" and not metric_name.endswith("_total"):
+            metric_name += "_total"
+        lines.append(f"# HELP {metric_name} {description}")
+        lines.append(f"# TYPE {metric_name} {metric_type}")
+        for name, metric in snapshot.items():
+            label = name.replace("\\", "\\\\").replace('"', '\\"')
+            lines.append(f'{metric_name}{{stage="{label}"}} {metric[field]}')
+    return "\n".join(lines) + "\n"
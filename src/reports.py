@@ -1,61 +1,223 @@
-import json
+from __future__ import annotations
+
+import logging
 from datetime import datetime, timedelta
-import pandas as pd
+from typing import List, Optional, Sequence, Union
+
+from src.lazy_imports import lazy_import
 from src.logging_config import setup_logger
-import logging
-import numpy as np
-from src.services import formatter
+from src.metrics import instrument, stage
+from src.result_cache import memoize
+from src.transactions_filters import TransactionStore
+from src.utils import dataframe_to_records, dumps_json
+
+pd = lazy_import("pandas")
+np = lazy_import("numpy")
 
 # Настройка логгера
 reports_logger = setup_logger("reports", "logs/reports.log", level=logging.DEBUG)
 
-def spending_by_category(df: pd.DataFrame, category: str, start_date: str) -> str:
-    reports_logger.info(f"Начало анализа трат по категории '{category}' с даты {start_date}.")
+# Длина периода анализа трат, 3 месяца
+SPENDING_WINDOW_DAYS = 90
+# Разность накопленных сумм ближе к целому - сумма пересчитывается напрямую
+_INTEGER_TOLERANCE = 1e-6
+
+
+def _total_spent(amount: float) -> int:
+    """
+    Приводит сумму трат к int для JSON (дробная часть отбрасывается).
+    """
+    return int(amount)
+
+
+def _window_sum(
+    df: Union[pd.DataFrame, TransactionStore], category: str, start_date: datetime, end_date: datetime
+) -> float:
+    """
+    Считает сумму трат по категории за [start_date, end_date) так же, как spending_by_category:
+    по тем же строкам и в том же порядке сложения.
+    """
+    if isinstance(df, TransactionStore):
+        return df.query(category, start_date, end_date)["Сумма"].sum()
+    operation_dates = df["Дата операции"]
+    if not pd.api.types.is_datetime64_any_dtype(operation_dates):
+        operation_dates = pd.to_datetime(operation_dates, format="%Y-%m-%d")
+    mask = (df["Категория"] == category) & (operation_dates >= start_date) & (operation_dates < end_date)
+    return df.loc[mask, "Сумма"].sum()
+
+
+@instrument("reports.spending_by_category")
+@memoize
+def spending_by_category(
+    df: Union[pd.DataFrame, TransactionStore], category: str, start_date: str, compact: bool = False
+) -> str:
+    """
+    Возвращает JSON с тратами по категории за 90 дней начиная с start_date.
+    Вместо DataFrame можно передать TransactionStore: тогда строки выбираются
+    двоичным поиском по заранее отсортированным датам. При compact=True
+    JSON выводится без отступов, пропуски в транзакциях записываются как null;
+    в форматированном JSON они, как и раньше, записываются как NaN.
+    """
+    reports_logger.info("Начало анализа трат по категории '%s' с даты %s.", category, start_date)
 
     # Проверка на наличие необходимых колонок
     required_columns = {"Дата операции", "Категория", "Сумма"}
     if not required_columns.issubset(df.columns):
         error_message = f"Отсутствуют необходимые колонки: {required_columns - set(df.columns)}"
         reports_logger.error(error_message)
-        return json.dumps({"error": error_message}, ensure_ascii=False, indent=4)
+        return dumps_json({"error": error_message}, compact)
 
     # Преобразование дат
     try:
-        df["Дата операции"] = pd.to_datetime(df["Дата операции"], format="%Y-%m-%d")
+        if not isinstance(df, TransactionStore):
+            with stage("reports.spending_by_category.parse_dates", rows_in=len(df)):
+                operation_dates = df["Дата операции"]
+                if not pd.api.types.is_datetime64_any_dtype(operation_dates):
+                    operation_dates = pd.to_datetime(operation_dates, format="%Y-%m-%d")
         start_date = datetime.strptime(start_date, "%Y-%m-%d")
-        end_date = start_date + timedelta(days=90)  # 3 месяца
+        end_date = start_date + timedelta(days=SPENDING_WINDOW_DAYS)
     except Exception as e:
         error_message = f"Ошибка преобразования дат: {str(e)}"
         reports_logger.error(error_message)
-        return json.dumps({"error": error_message}, ensure_ascii=False, indent=4)
+        return dumps_json({"error": error_message}, compact)
 
     # Фильтрация по категории и дате
-    filtered_df = df[
-        (df["Категория"] == category) &
-        (df["Дата операции"] >= start_date) &
-        (df["Дата операции"] < end_date)
-    ]
-
-    # Преобразование дат операций в строки
-    if not filtered_df.empty:
-        filtered_df["Дата операции"] = filtered_df["Дата операции"].dt.strftime("%Y-%m-%d")
+    with stage("reports.spending_by_category.filter", rows_in=len(df)) as timer:
+        if isinstance(df, TransactionStore):
+            filtered_df = df.query(category, start_date, end_date)
+        else:
+            mask = (
+                (df["Категория"] == category) &
+                (operation_dates >= start_date) &
+                (operation_dates < end_date)
+            )
+            filtered_df = df[mask].copy()
+            filtered_df["Дата операции"] = operation_dates[mask]
+        timer.rows_out = len(filtered_df)
 
     # Проверка на пустой результат
     if filtered_df.empty:
-        reports_logger.warning(f"Нет транзакций по категории '{category}' за указанный период.")
-        return json.dumps({"category": category, "total_spent": 0, "transactions": []}, ensure_ascii=False, indent=4)
+        reports_logger.warning("Нет транзакций по категории '%s' за указанный период.", category)
+        return dumps_json({"category": category, "total_spent": 0, "transactions": []}, compact)
 
     # Подсчет общей суммы
-    total_spending = int(filtered_df["Сумма"].sum())  # Преобразуем в int для JSON совместимости
+    with stage("reports.spending_by_category.aggregate", rows_in=len(filtered_df)):
+        total_spending = _total_spent(filtered_df["Сумма"].sum())
 
     # Формирование результата
+    with stage("reports.spending_by_category.serialize", rows_in=len(filtered_df)):
+        result = {
+            "category": category,
+            "total_spent": total_spending,
+            "start_date": start_date.strftime("%Y-%m-%d"),  # Преобразуем дату в строку
+            "end_date": end_date.strftime("%Y-%m-%d"),      # Преобразуем дату в строку
+        }
+        # Даты операций преобразуются в строки. В форматированном JSON пропуски
+        # записываются как NaN, как в исходном отчете, в компактном - как null
+        result["transactions"] = dataframe_to_records(filtered_df, missing=None if compact else float("nan"))
+        result_json = dumps_json(result, compact)
+
+    reports_logger.info(
+        "Траты по категории '%s': %s за период %s - %s.", category, total_spending, start_date.date(), end_date.date()
+    )
+    return result_json
+
+
+@instrument("reports.spending_by_category_batch")
+def spending_by_category_batch(
+    df: Union[pd.DataFrame, TransactionStore],
+    start_dates: Sequence[str],
+    categories: Optional[List[str]] = None,
+    window_days: int = SPENDING_WINDOW_DAYS,
+    include_transactions: bool = False,
+    compact: bool = False,
+) -> str:
+    """
+    Считает траты сразу по всем категориям и набору скользящих периодов.
+
+    Суммы по дням и категориям вычисляются одним groupby, после чего сумма
+    за любой период [start, start + window_days) берется как разность
+    накопленных сумм. Для каждой пары (категория, дата начала) "total_spent"
+    совпадает с результатом spending_by_category: суммы, близкие к целому,
+    пересчитываются напрямую, чтобы отбрасывание дробной части дало то же значение.
+
+    Args:
+        df (Union[pd.DataFrame, TransactionStore]): Транзакции.
+        start_dates (Sequence[str]): Даты начала периодов в формате 'YYYY-MM-DD'.
+        categories (Optional[List[str]]): Категории. По умолчанию - все категории из данных.
+        window_days (int): Длина периода в днях.
+        include_transactions (bool): Добавить в ответ списки транзакций по каждой паре.
+        compact (bool): Компактный JSON без отступов.
+
+    Returns:
+        str: JSON с матрицей "total_spent" (строки - категории, колонки - даты начала).
+    """
+    reports_logger.info("Начало пакетного анализа трат: %s периодов по %s дней.", len(start_dates), window_days)
+
+    required_columns = {"Дата операции", "Категория", "Сумма"}
+    if not required_columns.issubset(df.columns):
+        error_message = f"Отсутствуют необходимые колонки: {required_columns - set(df.columns)}"
+        reports_logger.error(error_message)
+        return dumps_json({"error": error_message}, compact)
+
+    try:
+        with stage("reports.spending_by_category_batch.load", rows_in=len(df)):
+            store = df if isinstance(df, TransactionStore) else TransactionStore(df)
+        starts = [datetime.strptime(start_date, "%Y-%m-%d") for start_date in start_dates]
+    except Exception as e:
+        error_message = f"Ошибка преобразования дат: {str(e)}"
+        reports_logger.error(error_message)
+        return dumps_json({"error": error_message}, compact)
+
+    frame = store.frame
+    frame = frame[frame["Дата операции"].notna() & frame["Категория"].notna()]
+    category_values = frame["Категория"].astype(object)
+    if categories is None:
+        categories = sorted(set(category_values))
+
+    # Суммы по дням и категориям, затем накопленные суммы по дням
+    with stage("reports.spending_by_category_batch.aggregate", rows_in=len(frame)):
+        daily = (
+            frame["Сумма"]
+            .groupby([frame["Дата операции"].dt.normalize(), category_values])
+            .sum()
+            .unstack(fill_value=0)
+            .reindex(columns=categories, fill_value=0)
+        )
+        days = daily.index.to_numpy(dtype="datetime64[ns]")
+        cumulative = np.vstack([np.zeros((1, len(categories))), daily.to_numpy(dtype=float).cumsum(axis=0)])
+
+        window_starts = np.array(starts, dtype="datetime64[ns]")
+        window_ends = window_starts + np.timedelta64(window_days, "D")
+        lo = np.searchsorted(days, window_starts, side="left")
+        hi = np.searchsorted(days, window_ends, side="left")
+        totals = cumulative[hi] - cumulative[lo]
+
+        # Разность накопленных сумм может отличаться от прямой суммы в последнем знаке.
+        # Рядом с целым это меняет результат int(), поэтому такие суммы считаются напрямую.
+        near_integer = np.abs(totals - np.round(totals)) < _INTEGER_TOLERANCE
+        for j, i in zip(*np.nonzero(near_integer)):
+            start = starts[j]
+            totals[j, i] = _window_sum(df, categories[i], start, start + timedelta(days=window_days))
+
     result = {
-        "category": category,
-        "total_spent": total_spending,
-        "start_date": start_date.strftime("%Y-%m-%d"),  # Преобразуем дату в строку
-        "end_date": end_date.strftime("%Y-%m-%d"),      # Преобразуем дату в строку
-        "transactions": filtered_df.to_dict(orient="records")
+        "window_days": window_days,
+        "start_dates": [start.strftime("%Y-%m-%d") for start in starts],
+        "categories": categories,
+        "total_spent": [[_total_spent(total) for total in totals[:, i]] for i in range(len(categories))],
     }
 
-    reports_logger.info(f"Траты по категории '{category}': {total_spending} за период {start_date.date()} - {end_date.date()}.")
-    return json.dumps(result, ensure_ascii=False, indent=4)
+    if include_transactions:
+        transactions = {}
+        for category in categories:
+            transactions[category] = {}
+            for start in starts:
+                window_df = store.query(category, start, start + timedelta(days=window_days))
+                transactions[category][start.strftime("%Y-%m-%d")] = dataframe_to_records(window_df)
+        result["transactions"] = transactions
+
+    with stage("reports.spending_by_category_batch.serialize"):
+        result_json = dumps_json(result, compact)
+
+    reports_logger.info("Пакетный анализ трат завершен: %s категорий, %s периодов.", len(categories), len(starts))
+    return result_json
@@ -0,0 +1,316 @@
+from __future__ import annotations
+
+import copy
+import functools
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+
+from src.lazy_imports import lazy_import
+from src.logging_config import setup_logger
+
+pd = lazy_import("pandas")
+
+result_cache_logger = setup_logger("result_cache", "logs/result_cache.log")
+
+# Меняется при изменении формата результатов, чтобы не читать устаревший кэш с диска
+RESULT_CACHE_VERSION = 1
+DEFAULT_MAXSIZE = 128
+
+_MISSING = object()
+
+
+class _FrameFingerprint(NamedTuple):
+    """
+    Отпечаток DataFrame или Series вместе с состоянием, для которого он вычислен.
+    """
+
+    arrays: Tuple[Any, ...]
+    axes: Tuple[Any, ...]
+    snapshot: Any
+    value: str
+
+
+# id(DataFrame) -> последний вычисленный отпечаток; запись удаляется вместе с DataFrame
+_frame_fingerprints: Dict[int, _FrameFingerprint] = {}
+_frame_fingerprints_lock = threading.Lock()
+
+
+def _frame_state(value: Any) -> Optional[Tuple[Tuple[Any, ...], Tuple[Any, ...]]]:
+    """
+    Возвращает массивы данных и оси DataFrame или Series, если их можно получить.
+    """
+    arrays = getattr(getattr(value, "_mgr", None), "arrays", None)
+    if arrays is None:
+        return None
+    return tuple(arrays), tuple(value.axes)
+
+
+def _hash_frame(value: Any) -> str:
+    digest = hashlib.sha1()
+    digest.update(type(value).__name__.encode("utf-8"))
+    columns = value.columns if isinstance(value, pd.DataFrame) else [value.name]
+    dtypes = value.dtypes if isinstance(value, pd.DataFrame) else [value.dtype]
+    digest.update(repr(list(zip(columns, map(str, dtypes)))).encode("utf-8"))
+    try:
+        digest.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    except TypeError:
+        # В ячейках есть нехэшируемые значения (списки, словари)
+        digest.update(pickle.dumps(value))
+    return digest.hexdigest()
+
+
+def _frame_fingerprint(value: Any) -> str:
+    """
+    Возвращает отпечаток DataFrame или Series, вычисляя хэш содержимого один раз на объект.
+
+    Вместе с отпечатком хранится неглубокая копия объекта. При Copy-on-Write
+    (всегда включен начиная с pandas 3.0) она делает массивы данных общими,
+    поэтому любое изменение исходного объекта на месте сначала копирует
+    затронутый массив. Повторный вызов сравнивает массивы и оси объекта
+    с сохраненными по идентичности - это не зависит от числа строк.
+    Если массивы или оси заменены, хэш вычисляется заново.
+    """
+    state = _frame_state(value)
+    key = id(value)
+    with _frame_fingerprints_lock:
+        entry = _frame_fingerprints.get(key)
+    if (
+        entry is not None
+        and state is not None
+        and len(entry.arrays) == len(state[0])
+        and all(a is b for a, b in zip(entry.arrays, state[0]))
+        and all(a is b for a, b in zip(entry.axes, state[1]))
+    ):
+        return entry.value
+
+    result = _hash_frame(value)
+    if state is None:
+        return result
+    snapshot = value.copy(deep=False)
+    # Массивы берутся после копирования: копия не должна их заменить
+    state = _frame_state(value)
+    with _frame_fingerprints_lock:
+        if key not in _frame_fingerprints:
+            weakref.finalize(value, _frame_fingerprints.pop, key, None)
+        _frame_fingerprints[key] = _FrameFingerprint(state[0], state[1], snapshot, result)
+    return result
+
+
+def fingerprint(value: Any) -> str:
+    """
+    Вычисляет отпечаток содержимого значения для ключа кэша.
+
+    DataFrame и Series хэшируются по значениям, индексу, колонкам и типам
+    один раз на объект (см. _frame_fingerprint): повторный вызов для того же
+    неизмененного объекта не просматривает данные, а измененный на месте
+    DataFrame получает новый отпечаток. Объекты с методом data_fingerprint()
+    (например, TransactionStore) возвращают отпечаток сами.
+
+    Raises:
+        TypeError: Значение нельзя однозначно описать отпечатком (например, генератор).
+    """
+    if hasattr(value, "data_fingerprint"):
+        return value.data_fingerprint()
+
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return _frame_fingerprint(value)
+
+    digest = hashlib.sha1()
+    if isinstance(value, (list, tuple, dict, str, int, float, bool)) or value is None:
+        try:
+            digest.update(json.dumps(value, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+        except (TypeError, ValueError):
+            digest.update(pickle.dumps(value))
+        return digest.hexdigest()
+
+    raise TypeError(f"Нельзя вычислить отпечаток значения типа {type(value).__name__}")
+
+
+class ResultCache:
+    """
+    LRU-кэш результатов функций с ограничением числа записей и статистикой.
+
+    Если задана директория, результаты дополнительно сохраняются на диск
+    и переживают перезапуск процесса. Кэш потокобезопасен.
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_MAXSIZE, directory: Optional[str] = None) -> None:
+        self.maxsize = maxsize
+        self.directory = directory
+        self.enabled = True
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pkl")
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """
+        Возвращает результат по ключу или default. Учитывает попадание или промах.
+        """
+        with self._lock:
+            value = self._entries.get(key, _MISSING)
+            if value is not _MISSING:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+
+        if self.directory is not None:
+            try:
+                with open(self._disk_path(key), "rb") as f:
+                    value = pickle.load(f)
+            except (OSError, pickle.UnpicklingError, EOFError):
+                value = _MISSING
+            if value is not _MISSING:
+                self._store(key, value)
+                with self._lock:
+                    self.hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return default
+
+    def _store(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def put(self, key: str, value: Any) -> None:
+        """
+        Сохраняет результат, вытесняя давно не использованные записи сверх maxsize.
+        """
+        self._store(key, value)
+        if self.directory is not None:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = f"{self._disk_path(key)}.tmp.{os.getpid()}.{threading.get_ident()}"
+            with open(tmp_path, "wb") as f:
+                pickle.dump(value, f)
+            os.replace(tmp_path, self._disk_path(key))
+
+    def clear(self) -> None:
+        """
+        Очищает кэш в памяти и на диске и обнуляет статистику.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+        if self.directory is not None and os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.endswith(".pkl"):
+                    os.remove(os.path.join(self.directory, name))
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Возвращает статистику: попадания, промахи, вытеснения и текущий размер.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+            }
+
+
+# Общий кэш результатов отчетов
+result_cache = ResultCache()
+
+
+def configure_result_cache(
+    maxsize: Optional[int] = None, directory: Optional[str] = None, enabled: Optional[bool] = None
+) -> None:
+    """
+    Меняет настройки общего кэша результатов.
+
+    Args:
+        maxsize (Optional[int]): Максимальное число результатов в памяти.
+        directory (Optional[str]): Директория для хранения результатов на диске.
+        enabled (Optional[bool]): False - функции вызываются без кэширования.
+    """
+    if maxsize is not None:
+        result_cache.maxsize = maxsize
+    if directory is not None:
+        result_cache.directory = directory
+    if enabled is not None:
+        result_cache.enabled = enabled
+
+
+# Аргументы, которые входят в ключ кэша как есть
+_SCALAR_TYPES = (str, int, float, bool, type(None))
+
+
+def _key_part(value: Any) -> str:
+    """
+    Возвращает часть ключа кэша для аргумента.
+
+    Наборы данных входят в ключ отпечатком: data_fingerprint() для TransactionStore,
+    fingerprint() для DataFrame и Series (хэш вычисляется один раз на объект).
+    Списки транзакций не сериализуются при каждом вызове - это дороже самого расчета.
+
+    Raises:
+        TypeError: Аргумент не дает дешевого ключа - функция вызывается без кэша.
+    """
+    if hasattr(value, "data_fingerprint") or isinstance(value, (pd.DataFrame, pd.Series)):
+        return fingerprint(value)
+    if isinstance(value, _SCALAR_TYPES):
+        return f"{type(value).__name__}:{value!r}"
+    if isinstance(value, tuple) and all(isinstance(item, _SCALAR_TYPES) for item in value):
+        return repr(value)
+    raise TypeError(f"Аргумент типа {type(value).__name__} не кэшируется")
+
+
+def memoize(func: Callable) -> Callable:
+    """
+    Декоратор, кэширующий результат функции в result_cache.
+
+    Ключ - имя функции и ключи аргументов (см. _key_part). Аргументы сопоставляются
+    с сигнатурой функции с учетом значений по умолчанию, поэтому позиционный
+    и именованный вызов (compact=True и True) дают один ключ. Вызовы со списком
+    транзакций или другим аргументом без дешевого ключа выполняются без кэша.
+    Изменяемые результаты (словари, списки) возвращаются копией, чтобы
+    вызывающий код не мог испортить сохраненное значение.
+    Исходная функция доступна как func.__wrapped__.
+    """
+    name = f"{func.__module__}.{func.__qualname__}"
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not result_cache.enabled:
+            return func(*args, **kwargs)
+        try:
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            parts = [name, str(RESULT_CACHE_VERSION)]
+            parts += [f"{key}={_key_part(value)}" for key, value in bound.arguments.items()]
+        except TypeError:
+            return func(*args, **kwargs)
+        key = hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()
+
+        result = result_cache.get(key, _MISSING)
+        if result is _MISSING:
+            result = func(*args, **kwargs)
+            result_cache.put(key, result)
+        else:
+            result_cache_logger.debug("Результат %s взят из кэша.", name)
+        return result if isinstance(result, (str, bytes, int, float)) else copy.deepcopy(result)
+
+    return wrapper
@@ -0,0 +1,315 @@
+"""
+Локальный HTTP-сервис аналитики по выписке.
+
+Выписка загружается один раз и хранится в памяти как общие данные только для
+чтения; обработчики запросов выполняются вне цикла событий, поэтому тяжелые
+агрегации его не блокируют. При изменении файла выписки данные
+перезагружаются в фоне, а запросы, начатые до перезагрузки, дорабатывают
+на прежних данных.
+
+По умолчанию обработчики выполняются в пуле потоков. Поиск, построение
+триграммного индекса и агрегации на Python удерживают GIL, поэтому
+одновременные тяжелые запросы в потоках выполняются по очереди и замедляют
+цикл событий. С ключом --processes обработчики выполняются в пуле процессов:
+таблица экспортируется в Arrow-файл, который процессы открывают через
+memory map (как в src.main), и запросы выполняются параллельно.
+
+Пример:
+    python -m src.server data/Statement_18.12.2023-18.12.2024.XLSX --port 8080
+    python -m src.server data/Statement_18.12.2023-18.12.2024.XLSX --processes 4
+
+Эндпоинты (GET, ответ - JSON):
+    /search?query=ozon
+    /cashback?start_month=2024-01&end_month=2024-12
+    /spending?category=Фастфуд&start_date=2024-09-01
+    /events
+    /health
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from http import HTTPStatus
+from typing import Any, Dict, Optional, Sequence, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+from src.lazy_imports import lazy_import
+from src.logging_config import setup_logger
+from src.main import (
+    JOB_TYPES, REQUIRED_PARAMS, SharedData, load_transactions, run_job_type_in_worker, start_process_pool,
+)
+
+pd = lazy_import("pandas")
+
+server_logger = setup_logger("server", "logs/server.log")
+
+# Эндпоинт -> тип задания из src.main
+ENDPOINTS = {
+    "/search": "search",
+    "/cashback": "cashback",
+    "/spending": "spending",
+    "/events": "events",
+}
+DEFAULT_RELOAD_INTERVAL = 1.0
+MAX_REQUEST_LINE = 8192
+
+
+class AnalyticsServer:
+    """
+    HTTP-сервер над общими данными выписки.
+
+    Args:
+        statement_path (str): Выписка: XLSX или JSON-файл транзакций.
+        host (str): Адрес для прослушивания.
+        port (int): Порт. 0 - выбрать свободный (см. атрибут port после start()).
+        max_workers (Optional[int]): Размер пула потоков для обработчиков.
+        reload_interval (Optional[float]): Период проверки файла в секундах. None - без перезагрузки.
+        compact (bool): Отвечать компактным JSON без отступов.
+        processes (Optional[int]): Выполнять обработчики в пуле из указанного числа процессов.
+            None - в пуле потоков. Без pyarrow используется пул потоков.
+    """
+
+    def __init__(
+        self,
+        statement_path: str,
+        host: str = "127.0.0.1",
+        port: int = 8080,
+        max_workers: Optional[int] = None,
+        reload_interval: Optional[float] = DEFAULT_RELOAD_INTERVAL,
+        compact: bool = False,
+        processes: Optional[int] = None,
+    ) -> None:
+        self.statement_path = statement_path
+        self.host = host
+        self.port = port
+        self.reload_interval = reload_interval
+        self.compact = compact
+        self.processes = processes
+        self.data: Optional[SharedData] = None
+        self.loaded_at: Optional[float] = None
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        # Пул процессов для текущих данных и временная директория с его Arrow-файлом
+        self._process_pool: Optional[Executor] = None
+        self._process_pool_dir: Optional[str] = None
+        self._signature: Optional[Tuple[int, int]] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._watcher: Optional[asyncio.Task] = None
+
+    def _file_signature(self) -> Tuple[int, int]:
+        stat = os.stat(self.statement_path)
+        return stat.st_mtime_ns, stat.st_size
+
+    async def load(self) -> None:
+        """
+        Загружает выписку в пуле потоков и атомарно подменяет общие данные.
+        """
+        loop = asyncio.get_running_loop()
+        signature = self._file_signature()
+        started = time.perf_counter()
+        df = await loop.run_in_executor(self._executor, load_transactions, self.statement_path)
+        if self.processes is not None:
+            await self._start_process_pool(df)
+        self.data = SharedData(df)
+        self._signature = signature
+        self.loaded_at = time.time()
+        server_logger.info(
+            "Выписка %s загружена за %.2f с: %s транзакций", self.statement_path, time.perf_counter() - started, len(df)
+        )
+
+    async def _start_process_pool(self, df: pd.DataFrame) -> None:
+        """
+        Запускает пул процессов над новыми данными. Прежний пул останавливается
+        в фоне после завершения уже принятых запросов.
+        """
+        import multiprocessing
+
+        # Сервер уже запустил потоки, поэтому процессы пула создаются без fork
+        start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        loop = asyncio.get_running_loop()
+        work_dir = tempfile.mkdtemp(prefix="finanalyze-server-")
+        try:
+            pool = await loop.run_in_executor(
+                self._executor, start_process_pool, df, work_dir, self.processes, start_method
+            )
+        except ImportError as e:
+            shutil.rmtree(work_dir, ignore_errors=True)
+            server_logger.warning("Пул процессов недоступен, запросы выполняются в потоках: %s", e)
+            self.processes = None
+            return
+        except BaseException:
+            shutil.rmtree(work_dir, ignore_errors=True)
+            raise
+        previous = (self._process_pool, self._process_pool_dir)
+        self._process_pool, self._process_pool_dir = pool, work_dir
+        if previous[0] is not None:
+            loop.run_in_executor(self._executor, _shutdown_process_pool, *previous)
+
+    async def reload_if_changed(self) -> bool:
+        """
+        Перезагружает выписку, если файл изменился. При ошибке чтения остаются прежние данные.
+
+        Returns:
+            bool: True, если данные были перезагружены.
+        """
+        try:
+            signature = self._file_signature()
+        except OSError as e:
+            server_logger.warning("Не удалось проверить файл выписки: %s", e)
+            return False
+        if signature == self._signature:
+            return False
+        try:
+            await self.load()
+        except Exception as e:
+            # Не пытаемся повторно читать тот же (например, недописанный) файл до следующего изменения
+            self._signature = signature
+            server_logger.error("Не удалось перезагрузить выписку, используются прежние данные: %s", e)
+            return False
+        return True
+
+    async def _watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            await self.reload_if_changed()
+
+    async def start(self) -> None:
+        """
+        Загружает выписку, начинает принимать соединения и следить за файлом.
+        """
+        await self.load()
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        if self.reload_interval is not None:
+            self._watcher = asyncio.create_task(self._watch())
+        server_logger.info("Сервер запущен на %s:%s", self.host, self.port)
+
+    async def serve_forever(self) -> None:
+        if self._server is None:
+            await self.start()
+        await self._server.serve_forever()
+
+    async def stop(self) -> None:
+        if self._watcher is not None:
+            self._watcher.cancel()
+            try:
+                await self._watcher
+            except asyncio.CancelledError:
+                pass
+            self._watcher = None
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if self._process_pool is not None:
+            _shutdown_process_pool(self._process_pool, self._process_pool_dir)
+            self._process_pool = self._process_pool_dir = None
+        self._executor.shutdown(wait=True)
+        server_logger.info("Сервер остановлен.")
+
+    async def dispatch(self, method: str, target: str) -> Tuple[HTTPStatus, str]:
+        """
+        Выполняет запрос и возвращает статус и тело ответа.
+        """
+        if method != "GET":
+            return HTTPStatus.METHOD_NOT_ALLOWED, _error_body("Поддерживается только GET")
+
+        url = urlsplit(target)
+        params: Dict[str, Any] = dict(parse_qsl(url.query))
+        if url.path == "/health":
+            body = {"status": "ok", "transactions": len(self.data.frame), "loaded_at": self.loaded_at}
+            return HTTPStatus.OK, json.dumps(body, ensure_ascii=False)
+
+        job_type = ENDPOINTS.get(url.path)
+        if job_type is None:
+            return HTTPStatus.NOT_FOUND, _error_body(f"Неизвестный путь {url.path}")
+        missing = [param for param in REQUIRED_PARAMS.get(job_type, ()) if param not in params]
+        if missing:
+            return HTTPStatus.BAD_REQUEST, _error_body(f"Нет параметров {missing}")
+
+        # Запрос работает с данными, актуальными на момент начала, даже если файл перезагрузят
+        data, process_pool = self.data, self._process_pool
+        loop = asyncio.get_running_loop()
+        try:
+            if process_pool is not None:
+                body = await loop.run_in_executor(process_pool, run_job_type_in_worker, job_type, params, self.compact)
+            else:
+                body = await loop.run_in_executor(self._executor, JOB_TYPES[job_type], data, params, self.compact)
+        except ValueError as e:
+            return HTTPStatus.BAD_REQUEST, _error_body(str(e))
+        except Exception as e:
+            server_logger.error("Ошибка обработки запроса %s: %s", target, e)
+            return HTTPStatus.INTERNAL_SERVER_ERROR, _error_body(f"{type(e).__name__}: {e}")
+        return HTTPStatus.OK, body
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = await reader.readline()
+            # Заголовки не используются, но их нужно дочитать до пустой строки
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request_line.decode("latin-1").split()
+            if len(request_line) > MAX_REQUEST_LINE or len(parts) != 3:
+                status, body = HTTPStatus.BAD_REQUEST, _error_body("Некорректная строка запроса")
+            else:
+                status, body = await self.dispatch(parts[0], parts[1])
+            server_logger.info("%s %s", request_line.decode("latin-1").strip(), status.value)
+
+            payload = body.encode("utf-8")
+            head = (
+                f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                "Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(payload)}\r\n"
+                "Connection: close\r\n\r\n"
+            )
+            writer.write(head.encode("latin-1") + payload)
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError) as e:
+            server_logger.warning("Соединение прервано: %s", e)
+        finally:
+            writer.close()
+
+
+def _shutdown_process_pool(pool: Executor, work_dir: str) -> None:
+    pool.shutdown(wait=True)
+    shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _error_body(message: str) -> str:
+    return json.dumps({"error": message}, ensure_ascii=False)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("statement", help="Выписка: XLSX или JSON-файл транзакций")
+    parser.add_argument("--host", default="127.0.0.1", help="Адрес для прослушивания")
+    parser.add_argument("--port", type=int, default=8080, help="Порт")
+    parser.add_argument("--workers", type=int, default=None, help="Количество потоков для обработчиков")
+    parser.add_argument(
+        "--reload-interval", type=float, default=DEFAULT_RELOAD_INTERVAL,
+        help="Период проверки изменения файла в секундах, 0 - без перезагрузки",
+    )
+    parser.add_argument("--compact", action="store_true", help="Компактный JSON без отступов")
+    parser.add_argument(
+        "--processes", type=int, default=None,
+        help="Выполнять обработчики в заданном числе процессов (требует pyarrow)",
+    )
+    args = parser.parse_args(argv)
+
+    server = AnalyticsServer(
+        args.statement, args.host, args.port, args.workers, args.reload_interval or None, args.compact,
+        args.processes,
+    )
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        server_logger.info("Сервер остановлен пользователем.")
+
+
+if __name__ == "__main__":
+    main()
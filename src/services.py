@@ -1,189 +1,935 @@
-import os
-import json
+from __future__ import annotations
+
+import functools
+import heapq
 import logging
+from collections import Counter
 from datetime import datetime
-from typing import Any, Dict, List
+from itertools import islice
+from typing import (
+    Any, Dict, FrozenSet, Iterable, Iterator, List, NamedTuple, Optional, Pattern, Sequence, Set, Tuple, Union
+)
 import re
 from math import ceil
 
-from unicodedata import category
+from src.lazy_imports import lazy_import
+from src.logging_config import setup_logger
+from src.metrics import instrument, stage
+from src.result_cache import memoize
+from src.utils import CASHBACK_PATTERN, DATE_FORMATS, add_service_columns, dumps_json, iter_json, parse_numeric
+
+pd = lazy_import("pandas")
+np = lazy_import("numpy")
+
+# Настройка логгера: файл открывается при первой записи, а не при импорте
+services_logger = setup_logger("services", "logs/services.log", level=logging.DEBUG, mode="w")
 
-# Создаем директорию для логов, если она отсутствует
-os.makedirs("logs", exist_ok=True)
 
-# Настройка логгера
-services_logger = logging.getLogger("services")
-services_logger.setLevel(logging.DEBUG)
+OPERATION_DATE_FORMAT = "%d.%m.%Y"
 
-# Настройка обработчика и форматтера
-file_handler = logging.FileHandler("logs/services.log", mode="w", encoding="utf-8")
-formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
-file_handler.setFormatter(formatter)
+Transactions = Union[List[Dict[str, Any]], "pd.DataFrame"]
 
-# Добавление обработчика к логгеру
-services_logger.addHandler(file_handler)
+
+def _to_frame(transactions: Transactions, columns: List[str]) -> pd.DataFrame:
+    """
+    Приводит транзакции к DataFrame, оставляя только нужные колонки.
+    Колонки, которых нет в исходных данных, в результат не попадают.
+    """
+    if isinstance(transactions, pd.DataFrame):
+        return transactions[[col for col in columns if col in transactions.columns]]
+
+    present = {key for tx in transactions for key in tx} & set(columns)
+    return pd.DataFrame.from_records(transactions, columns=[col for col in columns if col in present])
+
+
+def _parse_operation_dates(dates: pd.Series) -> pd.Series:
+    """
+    Разбирает колонку "Дата операции" за один проход.
+    Строки ожидаются в формате ДД.ММ.ГГГГ, пропуски превращаются в NaT.
+    """
+    if pd.api.types.is_datetime64_any_dtype(dates):
+        return dates
+    return pd.to_datetime(dates, format=OPERATION_DATE_FORMAT)
 
 
+def _parse_cashback(raw: pd.Series) -> pd.Series:
+    """
+    Извлекает числовое значение кешбэка для всей колонки сразу.
+
+    Числа берутся как есть, строки - только если целиком соответствуют
+    CASHBACK_PATTERN. Все остальные значения, включая пропуски, дают 0.0.
+    """
+    return parse_numeric(raw, CASHBACK_PATTERN).fillna(0.0)
+
+
+def _month_index(month: str) -> int:
+    """
+    Переводит месяц в формате 'YYYY-MM' в порядковый номер (год * 12 + месяц - 1).
+    """
+    parsed = datetime.strptime(month, "%Y-%m")
+    return parsed.year * 12 + parsed.month - 1
+
+
+@instrument("services.analyze_cashback_by_month")
+def analyze_cashback_by_month(
+    transactions: Transactions, start_month: Optional[str] = None, end_month: Optional[str] = None
+) -> Dict[str, Dict[str, float]]:
+    """
+    Рассчитывает кешбэк по категориям для каждого месяца диапазона за один проход.
+    Для TransactionDatabase ответ строится по сводке по месяцам без чтения транзакций.
+
+    Args:
+        transactions (Union[List[Dict[str, Any]], pd.DataFrame]): Список транзакций или DataFrame.
+        start_month (Optional[str]): Первый месяц диапазона в формате 'YYYY-MM' включительно.
+        end_month (Optional[str]): Последний месяц диапазона в формате 'YYYY-MM' включительно.
+
+    Returns:
+        Dict[str, Dict[str, float]]: Словарь вида {'YYYY-MM': {категория: сумма кешбэка}},
+        упорядоченный по месяцам. Месяцы без транзакций не включаются.
+    """
+    services_logger.info("Начало анализа кешбека за период %s - %s", start_month or "...", end_month or "...")
+
+    summary = _monthly_summary(transactions)
+    if summary is not None:
+        with stage("services.analyze_cashback_by_month.summary", rows_in=len(summary)):
+            summary = summary[_summary_months(summary, start_month, end_month)]
+            # Пустая категория в сводке - пропуск в колонке "Категория", как None в списке транзакций
+            categories = summary["category"].astype(object).where(summary["category"].ne(""), None)
+            totals = summary["cashback"].groupby([summary["month"], categories], sort=True, dropna=False).sum()
+            cashback_by_month: Dict[str, Dict[str, float]] = {}
+            for (month_key, category), total in totals.items():
+                cashback_by_month.setdefault(month_key, {})[None if pd.isna(category) else category] = float(total)
+        services_logger.info("Анализ кэшбека завершен по сводке.")
+        return cashback_by_month
+
+    with stage("services.analyze_cashback_by_month.load"):
+        df = _to_frame(transactions, ["Дата операции", "Категория", "Кэшбек"])
+    if "Дата операции" not in df.columns:
+        services_logger.debug("Найдено 0 транзакций для анализа.")
+        services_logger.info("Анализ кэшбека завершен.")
+        return {}
+
+    # Фильтрация транзакций по диапазону месяцев
+    with stage("services.analyze_cashback_by_month.filter", rows_in=len(df)) as timer:
+        dates = _parse_operation_dates(df["Дата операции"])
+        month_index = dates.dt.year * 12 + dates.dt.month - 1
+        mask = month_index.notna()
+        if start_month is not None:
+            mask &= month_index >= _month_index(start_month)
+        if end_month is not None:
+            mask &= month_index <= _month_index(end_month)
+        df = df[mask]
+        month_index = month_index[mask].astype(int)
+        timer.rows_out = len(df)
+    services_logger.debug("Найдено %s транзакций для анализа.", len(df))
+
+    # Подсчет кешбэка по месяцам и категориям
+    with stage("services.analyze_cashback_by_month.aggregate", rows_in=len(df)):
+        if isinstance(transactions, pd.DataFrame):
+            # Пропуск в ячейке соответствует значению None в списке транзакций
+            if "Категория" in df.columns:
+                categories = df["Категория"].astype(object).where(df["Категория"].notna(), None)
+            else:
+                categories = pd.Series(UNKNOWN_CATEGORY, index=df.index, dtype=object)
+            if "Кэшбек" in df.columns:
+                cashback = _parse_cashback(df["Кэшбек"])
+            else:
+                cashback = pd.Series(0.0, index=df.index)
+        else:
+            # В DataFrame не различаются отсутствующий ключ, None и NaN, поэтому значения
+            # отобранных строк берутся из словарей: без ключа категория - UNKNOWN_CATEGORY,
+            # None остается None, кешбэк None дает 0.0, а NaN - NaN в сумме категории
+            rows = [transactions[position] for position in df.index]
+            categories = pd.Series([tx.get("Категория", UNKNOWN_CATEGORY) for tx in rows], index=df.index, dtype=object)
+            raw_cashback = pd.Series([tx.get("Кэшбек", 0) for tx in rows], index=df.index, dtype=object)
+            is_nan = np.array([isinstance(value, float) and value != value for value in raw_cashback], dtype=bool)
+            cashback = _parse_cashback(raw_cashback).mask(is_nan)
+
+        keys = [month_index, categories]
+        totals = cashback.fillna(0.0).groupby(keys, sort=False, dropna=False).sum()
+        totals[cashback.isna().groupby(keys, sort=False, dropna=False).any()] = np.nan
+
+        cashback_by_month: Dict[str, Dict[str, float]] = {}
+        for (index, category), total in totals.items():
+            month_key = f"{index // 12}-{index % 12 + 1:02d}"
+            cashback_by_month.setdefault(month_key, {})[None if pd.isna(category) else category] = float(total)
+
+    services_logger.info("Анализ кэшбека завершен.")
+    return dict(sorted(cashback_by_month.items()))
+
+
+@instrument("services.analyze_cashback_categories")
+@memoize
 def analyze_cashback_categories(
-    transactions: List[Dict[str, Any]], year: int, month: int
+    transactions: Transactions, year: int, month: int
 ) -> Dict[str, float]:
     """
     Анализирует транзакции и возвращает сумму кешбэка по категориям за указанный месяц.
 
     Args:
-        transactions (List[Dict[str, Any]]): Список транзакций.
+        transactions (Union[List[Dict[str, Any]], pd.DataFrame]): Список транзакций или DataFrame.
         year (int): Год для анализа.
         month (int): Месяц для анализа.
 
     Returns:
         Dict[str, float]: Словарь с категориями и суммой кешбэка.
     """
-    services_logger.info(f"Начало анализа кешбека за {year}-{month:02d}")
-
-    # Фильтрация транзакций по году и месяцу
-    filtered_transactions = [
-        tx
-        for tx in transactions
-        if "Дата операции" in tx
-        and datetime.strptime(tx["Дата операции"], "%d.%m.%Y").year == year
-        and datetime.strptime(tx["Дата операции"], "%d.%m.%Y").month == month
-    ]
-    services_logger.debug(f"Найдено {len(filtered_transactions)} транзакций для анализа.")
-
-    # Подсчет кешбэка по категориям
-    cashback_by_category = {}
-    for tx in filtered_transactions:
-        category = tx.get("Категория", "Неизвестная категория")
-        cashback_raw = tx.get("Кэшбек", 0)
-
-        # Извлечение числового значения из строки кешбэка
-        if isinstance(cashback_raw, str):
-            cashback_match = re.fullmatch(r"[+-]?\d*\.?\d+", cashback_raw)
-            cashback = float(cashback_match.group()) if cashback_match else 0.0
-        elif isinstance(cashback_raw, (int, float)):
-            cashback = float(cashback_raw)
-        else:
-            cashback = 0.0
+    month_key = f"{year}-{month:02d}"
+    return analyze_cashback_by_month(transactions, month_key, month_key).get(month_key, {})
 
-        cashback_by_category[category] = cashback_by_category.get(category, 0) + cashback
 
-    services_logger.info("Анализ кэшбека завершен.")
-    return cashback_by_category
+def _round_up_savings(amounts: np.ndarray, limits: np.ndarray) -> np.ndarray:
+    """
+    Считает отложенную сумму для каждой пары (транзакция, предел округления).
+    Сумма округляется вверх до следующего кратного пределу значения.
+
+    Returns:
+        np.ndarray: Матрица размера len(amounts) x len(limits).
+    """
+    amounts = amounts[:, np.newaxis]
+    return (np.floor_divide(amounts, limits) + 1) * limits - amounts
+
+
+def _operation_month_mask(dates: pd.Series, month: str) -> pd.Series:
+    """
+    Отмечает транзакции, дата которых начинается с month.
+    Для нормализованных дат (datetime64) месяц 'YYYY-MM' сравнивается без форматирования в строки.
+    """
+    if pd.api.types.is_datetime64_any_dtype(dates):
+        if re.fullmatch(r"\d{4}-\d{2}", month):
+            year, month_number = map(int, month.split("-"))
+            return (dates.dt.year == year) & (dates.dt.month == month_number)
+        dates = dates.dt.strftime("%Y-%m-%d")
+    return dates.str.startswith(month, na=False).astype(bool)
 
 
-def investment_bank(month: str, transactions: List[Dict[str, Any]], limit: int) -> float:
+def _operation_months(dates: pd.Series) -> pd.Series:
+    """
+    Возвращает месяц каждой транзакции в формате 'YYYY-MM' или None, если дата не распознана.
+    """
+    if pd.api.types.is_datetime64_any_dtype(dates):
+        return dates.dt.strftime("%Y-%m").where(dates.notna(), None)
+    months = dates.str.slice(0, 7)
+    return months.where(dates.str.match(r"\d{4}-\d{2}", na=False).astype(bool), None)
+
+
+@instrument("services.investment_bank")
+def investment_bank(month: str, transactions: Transactions, limit: int) -> float:
     """
     Рассчитывает накопления в 'Инвесткопилке' за указанный месяц.
+    Для TransactionDatabase и предела из SUMMARY_LIMITS ответ строится по сводке по месяцам,
+    для остальных пределов и периодов короче месяца - по транзакциям месяца.
 
     Args:
         month (str): Месяц для расчета в формате 'YYYY-MM'.
-        transactions (List[Dict[str, Any]]): Список транзакций.
+        transactions (Union[List[Dict[str, Any]], pd.DataFrame]): Список транзакций или DataFrame.
         limit (int): Предел округления.
 
     Returns:
         float: Сумма накоплений.
     """
-    total_saved = 0.0
+    summary = _monthly_summary(transactions)
+    if summary is not None:
+        column = _summary_column(limit)
+        if column is not None and re.fullmatch(r"\d{4}(-\d{2})?", month):
+            total_saved = float(summary.loc[summary["month"].str.startswith(month), column].sum())
+            services_logger.info("Итоговая накопленная сумма по сводке: %s", total_saved)
+            return round(total_saved, 2)
+        # Предел или период не совпадают со сводкой - считаем по исходным строкам
+        transactions = _summary_raw_rows(transactions, [month[:7]] if re.match(r"\d{4}-\d{2}", month) else None)
+
+    df = _to_frame(transactions, ["Дата операции", "Сумма операции"])
+    if not {"Дата операции", "Сумма операции"}.issubset(df.columns):
+        services_logger.debug("Пропущены все транзакции: отсутствует дата или сумма операции.")
+        services_logger.info("Итоговая накопленная сумма: 0.0")
+        return 0.0
+
+    # Проверка соответствия месяца и корректности суммы операции
+    with stage("services.investment_bank.filter", rows_in=len(df)) as timer:
+        in_month = _operation_month_mask(df["Дата операции"], month)
+        amounts = parse_numeric(df.loc[in_month, "Сумма операции"]).dropna()
+        timer.rows_out = len(amounts)
+    services_logger.debug("Учтено транзакций: %s, пропущено: %s.", len(amounts), len(df) - len(amounts))
+
+    with stage("services.investment_bank.aggregate", rows_in=len(amounts)):
+        saved = _round_up_savings(amounts.to_numpy(dtype=float), np.array([limit], dtype=float))
+        total_saved = float(saved.sum())
+
+    services_logger.info("Итоговая накопленная сумма: %s", total_saved)
+    return round(total_saved, 2)
 
-    for tx in transactions:
-        operation_date = tx.get("Дата операции", "")
-        amount = tx.get("Сумма операции")
 
-        # Проверка соответствия месяца
-        if not operation_date.startswith(month):
-            services_logger.debug(f"Пропущена транзакция с датой {operation_date}: не совпадает месяц.")
-            continue
+@instrument("services.investment_bank_by_month")
+def investment_bank_by_month(
+    transactions: Transactions,
+    limits: List[int],
+    start_month: Optional[str] = None,
+    end_month: Optional[str] = None,
+) -> pd.DataFrame:
+    """
+    Рассчитывает накопления в 'Инвесткопилке' сразу для всех месяцев диапазона
+    и нескольких пределов округления. Для TransactionDatabase и пределов из SUMMARY_LIMITS
+    ответ строится по сводке по месяцам.
+
+    Args:
+        transactions (Union[List[Dict[str, Any]], pd.DataFrame]): Список транзакций или DataFrame.
+        limits (List[int]): Пределы округления, например [10, 50, 100].
+        start_month (Optional[str]): Первый месяц диапазона в формате 'YYYY-MM' включительно.
+        end_month (Optional[str]): Последний месяц диапазона в формате 'YYYY-MM' включительно.
+
+    Returns:
+        pd.DataFrame: Матрица накоплений: строки - месяцы 'YYYY-MM', колонки - пределы округления.
+    """
+    services_logger.info(
+        "Расчет накоплений для пределов %s за период %s - %s", limits, start_month or "...", end_month or "..."
+    )
+
+    empty_result = pd.DataFrame(columns=list(limits), dtype=float).rename_axis("Месяц")
+    summary = _monthly_summary(transactions)
+    if summary is not None:
+        columns = [_summary_column(limit) for limit in limits]
+        if None in columns:
+            transactions = _summary_raw_rows(transactions)
+        else:
+            summary = summary[_summary_months(summary, start_month, end_month)]
+            if summary.empty:
+                return empty_result
+            totals = summary.groupby("month", sort=True)[columns].sum()
+            totals.columns = list(limits)
+            services_logger.info("Расчет накоплений по сводке завершен: %s месяцев.", len(totals))
+            return totals.round(2).rename_axis("Месяц")
+
+    df = _to_frame(transactions, ["Дата операции", "Сумма операции"])
+    if not {"Дата операции", "Сумма операции"}.issubset(df.columns):
+        return empty_result
+
+    # Месяц берется из префикса даты 'YYYY-MM', строки без такого префикса пропускаются
+    months = _operation_months(df["Дата операции"])
+    mask = months.notna()
+    if start_month is not None:
+        mask &= months >= start_month
+    if end_month is not None:
+        mask &= months <= end_month
+    months = months[mask]
+    if months.empty:
+        return empty_result
+
+    amounts = parse_numeric(df.loc[mask, "Сумма операции"])
+    valid = amounts.notna()
+    if services_logger.isEnabledFor(logging.DEBUG):
+        valid_count = int(valid.sum())
+        services_logger.debug("Учтено транзакций: %s, пропущено: %s.", valid_count, len(df) - valid_count)
+
+    saved = _round_up_savings(amounts[valid].to_numpy(dtype=float), np.array(limits, dtype=float))
+    totals = (
+        pd.DataFrame(saved, columns=list(limits), index=months[valid].to_numpy())
+        .groupby(level=0)
+        .sum()
+        .reindex(sorted(months.unique()), fill_value=0.0)
+        .round(2)
+        .rename_axis("Месяц")
+    )
+
+    services_logger.info("Расчет накоплений завершен: %s месяцев.", len(totals))
+    return totals
+
+
+# Пределы округления Инвесткопилки, накопления для которых хранятся в сводке по месяцам
+SUMMARY_LIMITS = (10, 50, 100)
+SUMMARY_KEYS = ["month", "category", "type"]
+UNKNOWN_CATEGORY = "Неизвестная категория"
+
+
+@instrument("services.summarize_by_month")
+def summarize_by_month(transactions: Transactions, limits: Sequence[int] = SUMMARY_LIMITS) -> pd.DataFrame:
+    """
+    Сворачивает транзакции в итоги по (месяцу, категории, типу).
+
+    Сводки аддитивны: сводка объединения транзакций равна сумме сводок частей,
+    поэтому ее можно пополнять при добавлении новых операций.
+
+    Args:
+        transactions (Union[List[Dict[str, Any]], pd.DataFrame]): Транзакции с колонками,
+            которые ожидают функции services (см. utils.add_service_columns).
+        limits (Sequence[int]): Пределы округления для накоплений Инвесткопилки.
+
+    Returns:
+        pd.DataFrame: Колонки month, category, type (пропуски - пустая строка),
+        rows - число операций, amount_count и amount_total - число и сумма
+        корректных значений "Сумма", cashback - сумма кешбэка,
+        savings_<предел> - накопления Инвесткопилки.
+    """
+    df = _to_frame(transactions, ["Дата операции", "Категория", "Тип", "Сумма", "Сумма операции", "Кэшбек"])
+    if "Дата операции" in df.columns:
+        dates = _parse_operation_dates(df["Дата операции"])
+        months = dates.dt.strftime("%Y-%m").astype(object).where(dates.notna(), "")
+    else:
+        months = pd.Series("", index=df.index, dtype=object)
+
+    amounts = _column_or_empty(df, "Сумма")
+    if not pd.api.types.is_numeric_dtype(amounts):
+        amounts = pd.to_numeric(amounts, errors="coerce")
+    operation_amounts = parse_numeric(_column_or_empty(df, "Сумма операции"))
+    valid = operation_amounts.notna().to_numpy()
+    saved = np.zeros((len(df), len(limits)))
+    saved[valid] = _round_up_savings(operation_amounts[valid].to_numpy(dtype=float), np.array(limits, dtype=float))
+
+    columns = {
+        "month": months,
+        "category": _column_or_empty(df, "Категория").astype(object).fillna(""),
+        "type": _column_or_empty(df, "Тип").astype(object).fillna(""),
+        "rows": 1,
+        "amount_count": amounts.notna().astype(int),
+        "amount_total": amounts.fillna(0.0),
+        "cashback": _parse_cashback(df["Кэшбек"]) if "Кэшбек" in df.columns else 0.0,
+    }
+    for position, limit in enumerate(limits):
+        columns[f"savings_{limit}"] = saved[:, position]
+    return pd.DataFrame(columns, index=df.index).groupby(SUMMARY_KEYS, sort=True, as_index=False).sum()
+
+
+def _summary_column(limit: Any) -> Optional[str]:
+    """
+    Возвращает колонку сводки для предела округления или None, если предела нет в SUMMARY_LIMITS.
+    Целые значения float (например, 50.0) соответствуют той же колонке, что и 50.
+    """
+    try:
+        value = float(limit)
+    except (TypeError, ValueError):
+        return None
+    if not value.is_integer() or int(value) not in SUMMARY_LIMITS:
+        return None
+    return f"savings_{int(value)}"
+
+
+def _monthly_summary(transactions: Any) -> Optional[pd.DataFrame]:
+    """
+    Возвращает сводку по месяцам, если транзакции переданы хранилищем со сводкой (TransactionDatabase).
+    """
+    if hasattr(transactions, "monthly_summary"):
+        return transactions.monthly_summary()
+    return None
+
+
+def _summary_raw_rows(transactions: Any, months: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Загружает исходные строки из хранилища со сводкой для запросов, на которые сводка не отвечает.
+    """
+    return add_service_columns(transactions.load(months))
 
-        # Проверка наличия суммы операции
-        if amount is None or amount == "":
-            services_logger.debug(f"Пропущена транзакция с датой {operation_date}: отсутствует сумма операции.")
-            continue
 
-        # Попытка преобразования суммы операции в float
+def _summary_months(summary: pd.DataFrame, start_month: Optional[str], end_month: Optional[str]) -> pd.Series:
+    months = summary["month"]
+    mask = months.ne("")
+    if start_month is not None:
+        mask &= months >= start_month
+    if end_month is not None:
+        mask &= months <= end_month
+    return mask
+
+
+# Поля транзакции, по которым выполняется поиск
+SEARCH_FIELDS = ("Описание операции", "Комментарий", "Категория", "Тип")
+
+
+def _search_fields(tx: Dict[str, Any]) -> Tuple[str, ...]:
+    """
+    Возвращает значения полей поиска транзакции в нижнем регистре.
+    """
+    values = (tx.get(field, "") for field in SEARCH_FIELDS)
+    return tuple(value.lower() if isinstance(value, str) else "" for value in values)
+
+
+# Режимы объединения слов запроса в ranked_search
+SEARCH_MODES = ("and", "or")
+# Минимальное триграммное сходство слова запроса и слова транзакции для нечеткого совпадения
+FUZZY_THRESHOLD = 0.4
+_WORD_PATTERN = re.compile(r"\w+")
+
+
+def _search_words(fields: Tuple[str, ...]) -> Set[str]:
+    """
+    Возвращает слова полей поиска (последовательности букв и цифр).
+    """
+    return {word for field in fields for word in _WORD_PATTERN.findall(field)}
+
+
+@functools.lru_cache(maxsize=65536)
+def _word_trigrams(word: str) -> FrozenSet[str]:
+    # Как в pg_trgm: два пробела в начале и один в конце, чтобы учитывать границы слова
+    padded = f"  {word} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def trigram_similarity(first: str, second: str) -> float:
+    """
+    Возвращает триграммное сходство двух слов: долю общих триграмм (коэффициент Жаккара) от 0 до 1.
+    """
+    first_trigrams, second_trigrams = _word_trigrams(first), _word_trigrams(second)
+    shared = len(first_trigrams & second_trigrams)
+    return shared / (len(first_trigrams) + len(second_trigrams) - shared)
+
+
+def _term_score(term: str, fields: Tuple[str, ...], words: Set[str], threshold: Optional[float]) -> float:
+    """
+    Оценивает совпадение слова запроса с транзакцией: 1.0 - подстрока одного из полей,
+    иначе лучшее триграммное сходство со словами транзакции, если оно не ниже threshold.
+    Слова короче трех символов ищутся только как подстрока.
+    """
+    if any(term in field for field in fields):
+        return 1.0
+    if threshold is None or len(term) < TransactionSearchIndex.NGRAM_SIZE:
+        return 0.0
+    best = max((trigram_similarity(term, word) for word in words), default=0.0)
+    return best if best >= threshold else 0.0
+
+
+def _relevance(terms: List[str], fields: Tuple[str, ...], mode: str, threshold: Optional[float]) -> float:
+    """
+    Возвращает релевантность транзакции от 0 до 1 - среднюю оценку слов запроса.
+    В режиме "and" транзакция без совпадения хотя бы одного слова получает 0.
+    """
+    words = _search_words(fields) if threshold is not None else set()
+    total = 0.0
+    for term in terms:
+        score = _term_score(term, fields, words, threshold)
+        if score == 0.0 and mode == "and":
+            return 0.0
+        total += score
+    return total / len(terms)
+
+
+@functools.lru_cache(maxsize=4096)
+def _parse_search_date(value: str) -> datetime:
+    for date_format in DATE_FORMATS:
         try:
-            amount = float(amount)
-        except (ValueError, TypeError):
-            services_logger.debug(f"Пропущена транзакция с датой {operation_date}: некорректный формат суммы {amount}.")
+            return datetime.strptime(value, date_format)
+        except ValueError:
+            continue
+    return datetime.min
+
+
+def _recency(tx: Dict[str, Any]) -> datetime:
+    """
+    Возвращает дату операции для ранжирования по свежести. Транзакции без даты - в конце.
+    """
+    value = tx.get("Дата операции")
+    if isinstance(value, str):
+        return _parse_search_date(value)
+    if isinstance(value, datetime) and not pd.isna(value):
+        return value.replace(tzinfo=None)
+    return datetime.min
+
+
+def _top_ranked(
+    candidates: Iterable[Tuple[int, Dict[str, Any], Tuple[str, ...]]],
+    terms: List[str],
+    mode: str,
+    threshold: Optional[float],
+    top_k: int,
+) -> List[Tuple[float, Dict[str, Any]]]:
+    """
+    Отбирает top_k транзакций по релевантности, затем по дате операции (свежие выше).
+
+    Лучшие результаты хранятся в куче размера top_k, поэтому все совпадения
+    не сортируются и не держатся в памяти.
+    """
+    heap: List[Tuple[float, datetime, int, Dict[str, Any]]] = []
+    for position, tx, fields in candidates:
+        relevance = _relevance(terms, fields, mode, threshold)
+        if relevance == 0.0:
             continue
+        # -position: при равенстве выше транзакция, встретившаяся раньше; словари не сравниваются
+        entry = (relevance, _recency(tx), -position, tx)
+        if len(heap) < top_k:
+            heapq.heappush(heap, entry)
+        elif entry > heap[0]:
+            heapq.heapreplace(heap, entry)
+    return [(relevance, tx) for relevance, _, _, tx in sorted(heap, reverse=True)]
+
+
+def _query_terms(query: str, mode: str) -> List[str]:
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Неизвестный режим поиска '{mode}', допустимы: {SEARCH_MODES}")
+    return list(dict.fromkeys(query.lower().split()))
+
+
+class TransactionSearchIndex:
+    """
+    Индекс для многократного поиска подстроки в транзакциях.
+
+    Хранит поля поиска в нижнем регистре и триграммный инвертированный индекс.
+    Запрос длиной от трех символов проверяется только на транзакциях,
+    содержащих все его триграммы; более короткие запросы проверяются перебором.
+    """
 
-        # Расчет накоплений
-        rounded_amount = (amount // limit + 1) * limit
-        saved = rounded_amount - amount
-        services_logger.debug(
-            f"Транзакция с датой {operation_date}: сумма {amount}, округлено до {rounded_amount}, отложено {saved}."
+    NGRAM_SIZE = 3
+
+    def __init__(self, transactions: Iterable[Dict[str, Any]] = ()) -> None:
+        self._transactions: List[Dict[str, Any]] = []
+        self._fields: List[Tuple[str, ...]] = []
+        self._postings: Dict[str, List[int]] = {}
+        self.add(transactions)
+
+    def __len__(self) -> int:
+        return len(self._transactions)
+
+    @classmethod
+    def _ngrams(cls, text: str) -> Set[str]:
+        size = cls.NGRAM_SIZE
+        return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+    def add(self, transactions: Iterable[Dict[str, Any]]) -> None:
+        """
+        Добавляет новые транзакции в индекс.
+        """
+        for tx in transactions:
+            position = len(self._transactions)
+            fields = _search_fields(tx)
+            self._transactions.append(tx)
+            self._fields.append(fields)
+
+            # Слова, окруженные пробелами, дают триграммы границ слов для нечеткого поиска
+            words = f" {' '.join(_WORD_PATTERN.findall(' '.join(fields)))} "
+            ngrams = set().union(*(self._ngrams(field) for field in fields), self._ngrams(words))
+            for ngram in ngrams:
+                self._postings.setdefault(ngram, []).append(position)
+
+    def _candidates(self, query_lower: str) -> Iterable[int]:
+        """
+        Возвращает позиции транзакций, которые могут содержать запрос, в порядке добавления.
+        """
+        if len(query_lower) < self.NGRAM_SIZE:
+            return range(len(self._transactions))
+
+        postings = []
+        for ngram in self._ngrams(query_lower):
+            posting = self._postings.get(ngram)
+            if posting is None:
+                return []
+            postings.append(posting)
+
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates.intersection_update(posting)
+            if not candidates:
+                return []
+        return sorted(candidates)
+
+    def iter_search(self, query: str) -> Iterator[Dict[str, Any]]:
+        """
+        Лениво перебирает транзакции, у которых запрос содержится хотя бы в одном поле поиска.
+        """
+        query_lower = query.lower()
+        for position in self._candidates(query_lower):
+            if any(query_lower in field for field in self._fields[position]):
+                yield self._transactions[position]
+
+    def search(self, query: str) -> List[Dict[str, Any]]:
+        """
+        Возвращает транзакции, у которых запрос содержится хотя бы в одном поле поиска.
+        """
+        return list(self.iter_search(query))
+
+    def _fuzzy_candidates(self, term: str, threshold: float) -> Set[int]:
+        """
+        Возвращает позиции транзакций, в которых может быть слово, похожее на term.
+
+        Сходство не ниже threshold означает, что у слов есть не меньше
+        ceil(threshold * число триграмм term) общих триграмм; в индексе нет
+        только триграммы начала слова с двумя пробелами.
+        """
+        trigrams = _word_trigrams(term)
+        min_shared = max(1, ceil(threshold * len(trigrams)) - 1)
+        counts: Counter = Counter()
+        for trigram in trigrams:
+            if not trigram.startswith("  "):
+                counts.update(self._postings.get(trigram, ()))
+        return {position for position, shared in counts.items() if shared >= min_shared}
+
+    def _ranked_candidates(self, terms: List[str], mode: str, threshold: Optional[float]) -> Iterable[int]:
+        """
+        Возвращает позиции транзакций, которые могут подойти под запрос ranked_search, в порядке добавления.
+        """
+        term_candidates = []
+        for term in terms:
+            if len(term) < self.NGRAM_SIZE:
+                # Короткое слово не сужает выборку: в режиме "or" подходит любая транзакция
+                if mode == "or":
+                    return range(len(self._transactions))
+                continue
+            candidates = set(self._candidates(term))
+            if threshold is not None:
+                candidates |= self._fuzzy_candidates(term, threshold)
+            term_candidates.append(candidates)
+
+        if not term_candidates:
+            return range(len(self._transactions))
+        if mode == "and":
+            return sorted(set.intersection(*term_candidates))
+        return sorted(set.union(*term_candidates))
+
+    def ranked_search(
+        self, query: str, top_k: int = 10, mode: str = "and", threshold: Optional[float] = FUZZY_THRESHOLD
+    ) -> List[Tuple[float, Dict[str, Any]]]:
+        """
+        Возвращает до top_k транзакций с релевантностью, лучшие первыми (см. ranked_search).
+        """
+        terms = _query_terms(query, mode)
+        if not terms or top_k <= 0:
+            return []
+        candidates = (
+            (position, self._transactions[position], self._fields[position])
+            for position in self._ranked_candidates(terms, mode, threshold)
         )
-        total_saved += saved
+        return _top_ranked(candidates, terms, mode, threshold, top_k)
 
-    services_logger.info(f"Итоговая накопленная сумма: {total_saved}")
-    return round(total_saved, 2)
+
+def _iter_matches(
+    transactions: Union[List[Dict[str, Any]], TransactionSearchIndex], query: str
+) -> Iterator[Dict[str, Any]]:
+    """
+    Лениво перебирает транзакции, соответствующие запросу.
+    """
+    if isinstance(transactions, TransactionSearchIndex):
+        return transactions.iter_search(query)
+    query_lower = query.lower()
+    return (tx for tx in transactions if any(query_lower in field for field in _search_fields(tx)))
 
 
-def simple_search(transactions: List[Dict[str, Any]], query: str) -> str:
+@instrument("services.simple_search")
+def simple_search(
+    transactions: Union[List[Dict[str, Any]], TransactionSearchIndex], query: str, compact: bool = False
+) -> str:
     """
     Выполняет простой поиск по заданному запросу в транзакциях.
+    Для повторяющихся запросов по одним и тем же данным стоит передавать
+    заранее построенный TransactionSearchIndex.
     Args:
-        transactions(List[Dict[str, Any]]): Список транзакций.
+        transactions(Union[List[Dict[str, Any]], TransactionSearchIndex]): Список транзакций или индекс.
         query(str): Запрос для поиска.
+        compact(bool): Компактный JSON без отступов.
     Returns:
         str: JSON-строка с транзакциями, содержащими запрос.
     """
-    services_logger.info(f"Запуск простого поиска транзакций по запросу: '{query}'")
-    query_lower = query.lower()
-    matched_transactions = []
-
-    for tx in transactions:
-        description = tx.get("Описание операции", "").lower()
-        comment = tx.get("Комментарий", "").lower()
-        category = tx.get("Категория", "").lower()
-        tx_type = tx.get("Тип", "").lower()
-
-        if (
-            query_lower in description
-            or query_lower in comment
-            or query_lower in category
-            or query_lower in tx_type
-        ):
-            matched_transactions.append(tx)
+    services_logger.info("Запуск простого поиска транзакций по запросу: '%s'", query)
 
-    services_logger.info(
-        f"Поиск завершен. Найдено {len(matched_transactions)} транзакций, соответсвующих запросу."
-    )
+    with stage("services.simple_search.filter", rows_in=len(transactions)) as timer:
+        matched_transactions = list(_iter_matches(transactions, query))
+        timer.rows_out = len(matched_transactions)
+
+    services_logger.info("Поиск завершен. Найдено %s транзакций, соответсвующих запросу.", len(matched_transactions))
 
     # Конвертация результата в JSON
     try:
-        result_json = json.dumps(matched_transactions, ensure_ascii=False, indent=4)
+        with stage("services.simple_search.serialize", rows_in=len(matched_transactions)):
+            result_json = dumps_json(matched_transactions, compact)
         return result_json
     except TypeError as e:
-        services_logger.error(f"Ошибка при конвертации результатов поиска в JSON: {e}")
+        services_logger.error("Ошибка при конвертации результатов поиска в JSON: %s", e)
         return "[]"
 
 
-def filter_personal_transfers(transactions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+@instrument("services.simple_search_stream")
+def simple_search_stream(
+    transactions: Union[List[Dict[str, Any]], TransactionSearchIndex],
+    query: str,
+    offset: int = 0,
+    limit: Optional[int] = None,
+    compact: bool = False,
+) -> Iterator[str]:
     """
-    Фильтрует транзакции, относящиеся к переводам физическим лицам.
+    Выполняет простой поиск и отдает результат в виде JSON по частям.
+
+    Совпадения находятся лениво, поэтому список результатов целиком в памяти
+    не строится. Результат можно записать в файл через fp.writelines(...).
     Args:
-        transactions (List[Dict[str, Any]]): Список транзакций.
+        transactions(Union[List[Dict[str, Any]], TransactionSearchIndex]): Список транзакций или индекс.
+        query(str): Запрос для поиска.
+        offset(int): Количество пропускаемых совпадений.
+        limit(Optional[int]): Максимальное количество совпадений в ответе.
+        compact(bool): Компактный JSON без отступов.
+    Yields:
+        str: Фрагменты JSON-массива с найденными транзакциями.
+    """
+    services_logger.info(
+        "Запуск потокового поиска транзакций по запросу: '%s', offset=%s, limit=%s", query, offset, limit
+    )
+    stop = None if limit is None else offset + limit
+    page = islice(_iter_matches(transactions, query), offset, stop)
+    yield from iter_json(page, indent=None if compact else 4)
+
+
+@instrument("services.ranked_search")
+def ranked_search(
+    transactions: Union[List[Dict[str, Any]], TransactionSearchIndex],
+    query: str,
+    top_k: int = 10,
+    mode: str = "and",
+    fuzzy: bool = True,
+    threshold: float = FUZZY_THRESHOLD,
+    compact: bool = False,
+) -> str:
+    """
+    Ищет транзакции по нескольким словам с учетом опечаток и возвращает лучшие совпадения.
+
+    Слова запроса ищутся в тех же полях, что и в simple_search (SEARCH_FIELDS).
+    Слово совпадает с оценкой 1.0, если содержится в поле как подстрока, иначе -
+    с оценкой, равной триграммному сходству с самым похожим словом транзакции
+    (если fuzzy и сходство не ниже threshold). Релевантность транзакции - средняя
+    оценка слов запроса. Результаты упорядочены по релевантности, затем по дате
+    операции (свежие выше); для отбора лучших используется куча размера top_k.
+
+    Args:
+        transactions (Union[List[Dict[str, Any]], TransactionSearchIndex]): Список транзакций или индекс.
+        query (str): Слова запроса через пробел.
+        top_k (int): Максимальное количество результатов.
+        mode (str): "and" - должны совпасть все слова, "or" - хотя бы одно.
+        fuzzy (bool): Учитывать нечеткие совпадения.
+        threshold (float): Минимальное триграммное сходство для нечеткого совпадения.
+        compact (bool): Компактный JSON без отступов.
+
     Returns:
-        List[Dict[str, Any]]: Список транзакций, относящихся к переводам физическим лицам.
+        str: JSON-строка со списком транзакций, лучшие первыми.
+
+    Raises:
+        ValueError: Неизвестный режим поиска.
     """
-    services_logger.info("Начало фильтрации переводов физическим лицам.")
+    services_logger.info("Запуск поиска '%s': режим %s, нечеткий %s, top_k %s", query, mode, fuzzy, top_k)
+    fuzzy_threshold = threshold if fuzzy else None
+
+    with stage("services.ranked_search.rank", rows_in=len(transactions)) as timer:
+        if isinstance(transactions, TransactionSearchIndex):
+            ranked = transactions.ranked_search(query, top_k, mode, fuzzy_threshold)
+        else:
+            terms = _query_terms(query, mode)
+            candidates = ((position, tx, _search_fields(tx)) for position, tx in enumerate(transactions))
+            ranked = _top_ranked(candidates, terms, mode, fuzzy_threshold, top_k) if terms and top_k > 0 else []
+        timer.rows_out = len(ranked)
+
+    services_logger.info("Поиск завершен. Отобрано %s транзакций.", len(ranked))
+    with stage("services.ranked_search.serialize", rows_in=len(ranked)):
+        return dumps_json([tx for _, tx in ranked], compact)
+
+
+class TransferRule(NamedTuple):
+    """
+    Правило распознавания переводов.
+
+    Транзакция сначала проходит предварительный фильтр по категории, типу
+    и комментарию, затем поле field проверяется регулярным выражением (re.match).
+    None в categories или types означает отсутствие ограничения.
+    """
+
+    name: str
+    pattern: Pattern[str]
+    categories: Optional[FrozenSet[str]] = None
+    types: Optional[FrozenSet[str]] = frozenset({"Списание"})
+    field: str = "Описание операции"
+    require_empty_comment: bool = False
+
+
+PERSONAL_TRANSFER_RULE = TransferRule(
+    name="personal",
+    pattern=re.compile(r"^[А-ЯЁ][а-яё]+\s[А-ЯЁ]\.$"),
+    categories=frozenset({"Финансовые операции"}),
+    require_empty_comment=True,
+)
+PHONE_TRANSFER_RULE = TransferRule(
+    name="phone",
+    pattern=re.compile(r".*(?:\+7|\b8)[\s(-]*\d{3}[\s)-]*\d{3}[\s-]*\d{2}[\s-]*\d{2}\b"),
+)
+CARD_TRANSFER_RULE = TransferRule(
+    name="card",
+    pattern=re.compile(r".*\b\d{4}\s?\d{0,2}[\s*]*\*[\s*]*\d{4}\b"),
+)
+DEFAULT_TRANSFER_RULES = (PERSONAL_TRANSFER_RULE, PHONE_TRANSFER_RULE, CARD_TRANSFER_RULE)
+
+
+def _column_or_empty(df: pd.DataFrame, column: str) -> pd.Series:
+    if column in df.columns:
+        return df[column]
+    return pd.Series(None, index=df.index, dtype=object)
+
+
+@instrument("services.classify_transfers")
+def classify_transfers(
+    transactions: Transactions, rules: Sequence[TransferRule] = DEFAULT_TRANSFER_RULES
+) -> pd.DataFrame:
+    """
+    Проверяет транзакции набором правил распознавания переводов за один проход.
 
-    filtered_transactions = []
+    Args:
+        transactions (Union[List[Dict[str, Any]], pd.DataFrame]): Список транзакций или DataFrame.
+        rules (Sequence[TransferRule]): Правила распознавания.
 
-    for transaction in transactions:
-        category = transaction.get("Категория", "")
-        transaction_type = transaction.get("Тип", "")
-        description = transaction.get("Описание операции", "")
-        comment = transaction.get("Комментарий", "")
+    Returns:
+        pd.DataFrame: Булевы маски по одной колонке на правило (по имени правила),
+        строки соответствуют транзакциям в исходном порядке.
+    """
+    columns = ["Категория", "Тип", "Комментарий"] + [rule.field for rule in rules]
+    df = _to_frame(transactions, list(dict.fromkeys(columns)))
+    if isinstance(transactions, pd.DataFrame):
+        index = transactions.index
+    else:
+        index = pd.RangeIndex(len(transactions))
+    df.index = index
+
+    categories = _column_or_empty(df, "Категория")
+    types = _column_or_empty(df, "Тип")
+    comments = _column_or_empty(df, "Комментарий")
+    empty_comment = comments.isna() | comments.eq("")
+
+    masks = {}
+    for rule in rules:
+        # Предварительный фильтр по категории, типу и комментарию
+        candidates = pd.Series(True, index=index)
+        if rule.categories is not None:
+            candidates &= categories.isin(rule.categories)
+        if rule.types is not None:
+            candidates &= types.isin(rule.types)
+        if rule.require_empty_comment:
+            candidates &= empty_comment
+
+        # Маска заполняется по позициям: метки индекса могут повторяться
+        mask = np.zeros(len(df), dtype=bool)
+        survivors = _column_or_empty(df, rule.field)[candidates]
+        if not survivors.empty:
+            try:
+                matched = survivors.str.match(rule.pattern.pattern, flags=rule.pattern.flags, na=False)
+            except AttributeError:
+                # В поле нет строковых значений
+                matched = pd.Series(False, index=survivors.index)
+            mask[np.flatnonzero(candidates.to_numpy(dtype=bool))] = matched.to_numpy(dtype=bool)
+        masks[rule.name] = mask
+        if services_logger.isEnabledFor(logging.DEBUG):
+            services_logger.debug(
+                "Правило '%s': кандидатов %s, совпадений %s.", rule.name, len(survivors), int(mask.sum())
+            )
+
+    return pd.DataFrame(masks, index=index)
+
+
+@instrument("services.filter_personal_transfers")
+def filter_personal_transfers(transactions: Transactions) -> Union[List[Dict[str, Any]], pd.DataFrame]:
+    """
+    Фильтрует транзакции, относящиеся к переводам физическим лицам.
+    Args:
+        transactions (Union[List[Dict[str, Any]], pd.DataFrame]): Список транзакций или DataFrame.
+    Returns:
+        Union[List[Dict[str, Any]], pd.DataFrame]: Транзакции, относящиеся к переводам
+        физическим лицам, в том же виде, в каком были переданы.
+    """
+    services_logger.info("Начало фильтрации переводов физическим лицам.")
 
-        # Проверяем основное условие на категорию и тип
-        if category == "Финансовые операции" and transaction_type == "Списание":
-            # Проверяем формат имени в описании
-            if re.match(r"^[А-ЯЁ][а-яё]+\s[А-ЯЁ]\.$", description) and not comment:
-                filtered_transactions.append(transaction)
-                services_logger.debug(f"Транзакция добавлена: {transaction}")
+    mask = classify_transfers(transactions, [PERSONAL_TRANSFER_RULE])[PERSONAL_TRANSFER_RULE.name].to_numpy()
+    if isinstance(transactions, pd.DataFrame):
+        filtered_transactions = transactions[mask]
+    else:
+        filtered_transactions = [transactions[position] for position in np.flatnonzero(mask)]
 
-    services_logger.info(f"Фильтрация завершена. Найдено {len(filtered_transactions)} транзакций.")
+    services_logger.info("Фильтрация завершена. Найдено %s транзакций.", len(filtered_transactions))
     return filtered_transactions
 
 
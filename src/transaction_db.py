@@ -0,0 +1,370 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+from typing import Any, Iterable, List, NamedTuple, Optional, Sequence, Union
+from datetime import datetime
+
+from src.file_readers import CACHE_DIR, DATE_COLUMN, DEDUP_COLUMNS, SOURCE_COLUMN, read_statement
+from src.lazy_imports import lazy_import
+from src.logging_config import setup_logger
+from src.services import SUMMARY_KEYS, SUMMARY_LIMITS, summarize_by_month
+from src.utils import AMOUNT_COLUMNS, DATE_COLUMNS, add_service_columns, parse_numeric
+
+pd = lazy_import("pandas")
+
+transaction_db_logger = setup_logger("transaction_db", "logs/transaction_db.log")
+
+# Файл базы по умолчанию
+DATABASE_PATH = os.path.join("data", "transactions.db")
+
+# Формат хранения дат: строки в этом формате сравниваются в SQL как даты
+DB_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Ограничение на число параметров в одном SQL-запросе
+SQL_BATCH_SIZE = 500
+
+# Колонки сводки по (месяцу, категории, типу), см. services.summarize_by_month
+SUMMARY_VALUES = ["rows", "amount_count", "amount_total", "cashback"] + [f"savings_{limit}" for limit in SUMMARY_LIMITS]
+
+
+def _quote(column: str) -> str:
+    return '"' + column.replace('"', '""') + '"'
+
+
+# id - явный целочисленный ключ: в отличие от неявного rowid, VACUUM его не перенумеровывает,
+# поэтому на него можно ссылаться из других таблиц (например, полнотекстового индекса)
+TRANSACTIONS_SCHEMA = f"id INTEGER PRIMARY KEY, row_hash TEXT NOT NULL UNIQUE, month TEXT, {_quote(SOURCE_COLUMN)} TEXT"
+
+
+class ImportResult(NamedTuple):
+    """
+    Итог импорта выписки: сколько строк добавлено, сколько уже было в базе
+    и в каких месяцах появились новые операции.
+    """
+
+    added: int
+    skipped: int
+    months: List[str]
+
+
+def transaction_hashes(df: pd.DataFrame) -> List[str]:
+    """
+    Вычисляет устойчивый идентификатор каждой операции выписки.
+
+    Хэш строится по колонкам DEDUP_COLUMNS и порядковому номеру среди одинаковых
+    операций выписки, поэтому две одинаковые покупки в один день различаются,
+    а одна и та же операция в соседних выгрузках получает один и тот же хэш.
+
+    Args:
+        df (pd.DataFrame): Транзакции выписки.
+
+    Returns:
+        List[str]: Хэши строк в порядке DataFrame.
+    """
+    parts = []
+    for column in DEDUP_COLUMNS:
+        if column not in df.columns:
+            parts.append(pd.Series("", index=df.index))
+            continue
+        values = df[column]
+        if pd.api.types.is_datetime64_any_dtype(values):
+            text = values.dt.strftime(DB_DATE_FORMAT)
+        elif column in AMOUNT_COLUMNS:
+            # Суммы сравниваются с точностью до копеек: 150, 150.0 и "150" - одна сумма
+            values = parse_numeric(values)
+            text = values.map("{:.2f}".format)
+        else:
+            text = values.astype(str)
+        parts.append(text.where(values.notna(), "").astype(str))
+
+    keys = parts[0].str.cat(parts[1:], sep="\x1f")
+    occurrence = keys.groupby(keys).cumcount()
+    return [
+        hashlib.sha1(f"{key}\x1f{number}".encode("utf-8")).hexdigest()
+        for key, number in zip(keys, occurrence)
+    ]
+
+
+class TransactionDatabase:
+    """
+    Локальное хранилище транзакций в SQLite с пополнением только новыми операциями.
+
+    Каждая операция хранится один раз под хэшем из transaction_hashes, поэтому
+    повторный импорт пересекающейся выгрузки добавляет только новые строки.
+    Месяцы, в которых появились операции, помечаются как измененные: отчеты
+    достаточно пересчитать только по ним.
+
+    Пример:
+        with TransactionDatabase() as db:
+            db.import_statement("data/Statement_18.12.2023-18.12.2024.XLSX")
+            months = db.dirty_months()
+            cashback = analyze_cashback_by_month(db.load(months), months[0], months[-1])
+            db.mark_clean(months)
+    """
+
+    def __init__(self, path: str = DATABASE_PATH) -> None:
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._connection = sqlite3.connect(path)
+        with self._connection:
+            columns = self.columns()
+            if columns and "id" not in columns:
+                self._add_row_ids(columns)
+            self._connection.execute(f"CREATE TABLE IF NOT EXISTS transactions ({TRANSACTIONS_SCHEMA})")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS transactions_month ON transactions (month)")
+            self._connection.execute("CREATE TABLE IF NOT EXISTS dirty_months (month TEXT PRIMARY KEY)")
+            has_summary = self._connection.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'monthly_summary'"
+            ).fetchone()
+            self._connection.execute(
+                f"CREATE TABLE IF NOT EXISTS monthly_summary "
+                f"(month TEXT, category TEXT, type TEXT, {', '.join(f'{column} REAL' for column in SUMMARY_VALUES)}, "
+                f"PRIMARY KEY (month, category, type))"
+            )
+        if not has_summary and len(self) > 0:
+            # База создана до появления сводки
+            self.rebuild_summary()
+
+    def _add_row_ids(self, columns: List[str]) -> None:
+        """
+        Пересоздает таблицу transactions, созданную без колонки id, сохраняя порядок добавления строк.
+        Вызывается внутри транзакции.
+        """
+        data_columns = [column for column in columns if column not in ("row_hash", "month", SOURCE_COLUMN)]
+        copied = ", ".join(_quote(column) for column in ["row_hash", "month", SOURCE_COLUMN] + data_columns)
+        self._connection.execute("ALTER TABLE transactions RENAME TO transactions_without_id")
+        self._connection.execute(f"CREATE TABLE transactions ({TRANSACTIONS_SCHEMA})")
+        for column in data_columns:
+            self._connection.execute(f"ALTER TABLE transactions ADD COLUMN {_quote(column)}")
+        self._connection.execute(
+            f"INSERT INTO transactions ({copied}) SELECT {copied} FROM transactions_without_id ORDER BY rowid"
+        )
+        self._connection.execute("DROP TABLE transactions_without_id")
+        # Полнотекстовый индекс ссылался на прежние rowid и будет построен заново
+        self._connection.execute("DROP TABLE IF EXISTS transactions_fts")
+        transaction_db_logger.info("В таблицу transactions добавлена колонка id.")
+
+    def __enter__(self) -> "TransactionDatabase":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self._connection.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+
+    def close(self) -> None:
+        self._connection.close()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        return self._connection
+
+    def columns(self) -> List[str]:
+        """
+        Возвращает колонки таблицы transactions, включая служебные.
+        """
+        return [row[1] for row in self._connection.execute("PRAGMA table_info(transactions)")]
+
+    def _known_hashes(self, hashes: List[str]) -> set:
+        known = set()
+        for i in range(0, len(hashes), SQL_BATCH_SIZE):
+            batch = hashes[i:i + SQL_BATCH_SIZE]
+            placeholders = ", ".join("?" * len(batch))
+            known.update(
+                row[0] for row in self._connection.execute(
+                    f"SELECT row_hash FROM transactions WHERE row_hash IN ({placeholders})", batch
+                )
+            )
+        return known
+
+    def import_frame(self, df: pd.DataFrame, source: str = "") -> ImportResult:
+        """
+        Добавляет в базу операции, которых в ней еще нет.
+
+        Args:
+            df (pd.DataFrame): Транзакции выписки. Колонка "Дата операции" - datetime64.
+            source (str): Имя выписки для колонки SOURCE_COLUMN.
+
+        Returns:
+            ImportResult: Количество добавленных и пропущенных строк и измененные месяцы.
+        """
+        frame = df.drop(columns=[SOURCE_COLUMN], errors="ignore").reset_index(drop=True)
+        hashes = transaction_hashes(frame)
+        known = self._known_hashes(hashes)
+        is_new = [row_hash not in known for row_hash in hashes]
+        # Одинаковые операции внутри выписки уже различаются хэшем
+        new_rows = frame[is_new].copy()
+        new_hashes = [row_hash for row_hash, new in zip(hashes, is_new) if new]
+        summary = summarize_by_month(add_service_columns(new_rows))
+
+        if DATE_COLUMN in new_rows.columns and pd.api.types.is_datetime64_any_dtype(new_rows[DATE_COLUMN]):
+            months = new_rows[DATE_COLUMN].dt.strftime("%Y-%m")
+        else:
+            months = pd.Series(None, index=new_rows.index, dtype=object)
+        for column in new_rows.columns:
+            if pd.api.types.is_datetime64_any_dtype(new_rows[column]):
+                new_rows[column] = new_rows[column].dt.strftime(DB_DATE_FORMAT)
+        new_rows = new_rows.astype(object)
+        new_rows = new_rows.where(new_rows.notna(), None)
+        months = months.astype(object).where(months.notna(), None)
+
+        columns = [str(column) for column in new_rows.columns]
+        with self._connection:
+            existing_columns = set(self.columns())
+            for column in columns:
+                if column not in existing_columns:
+                    self._connection.execute(f"ALTER TABLE transactions ADD COLUMN {_quote(column)}")
+
+            insert_columns = ", ".join(_quote(column) for column in ["row_hash", "month", SOURCE_COLUMN] + columns)
+            placeholders = ", ".join("?" * (len(columns) + 3))
+            self._connection.executemany(
+                f"INSERT INTO transactions ({insert_columns}) VALUES ({placeholders})",
+                (
+                    (row_hash, month, source) + tuple(row)
+                    for row_hash, month, row in zip(new_hashes, months, new_rows.itertuples(index=False, name=None))
+                ),
+            )
+            self._add_summary(summary)
+            changed_months = sorted({month for month in months if month is not None})
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO dirty_months (month) VALUES (?)", [(month,) for month in changed_months]
+            )
+
+        result = ImportResult(added=len(new_hashes), skipped=len(hashes) - len(new_hashes), months=changed_months)
+        transaction_db_logger.info(
+            "Импорт '%s': добавлено %s, уже в базе %s, измененные месяцы: %s",
+            source, result.added, result.skipped, changed_months,
+        )
+        return result
+
+    def import_statement(self, file_path: str, cache_dir: Optional[str] = CACHE_DIR) -> ImportResult:
+        """
+        Читает XLSX-выписку (см. read_statement) и добавляет в базу новые операции.
+        """
+        return self.import_frame(read_statement(file_path, cache_dir=cache_dir), os.path.basename(file_path))
+
+    def _add_summary(self, summary: pd.DataFrame) -> None:
+        """
+        Прибавляет сводку новых строк к таблице monthly_summary. Вызывается внутри транзакции импорта.
+        """
+        columns = SUMMARY_KEYS + SUMMARY_VALUES
+        updates = ", ".join(f"{column} = {column} + excluded.{column}" for column in SUMMARY_VALUES)
+        self._connection.executemany(
+            f"INSERT INTO monthly_summary ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+            f"ON CONFLICT (month, category, type) DO UPDATE SET {updates}",
+            summary[columns].astype(object).itertuples(index=False, name=None),
+        )
+
+    def rebuild_summary(self) -> None:
+        """
+        Пересчитывает сводку по всем транзакциям базы (например, после изменения SUMMARY_LIMITS).
+        """
+        summary = summarize_by_month(add_service_columns(self.load()))
+        with self._connection:
+            self._connection.execute("DELETE FROM monthly_summary")
+            self._add_summary(summary)
+        transaction_db_logger.info("Сводка по месяцам пересчитана: %s строк.", len(summary))
+
+    def monthly_summary(
+        self, start: Optional[Union[str, datetime]] = None, end: Optional[Union[str, datetime]] = None
+    ) -> pd.DataFrame:
+        """
+        Возвращает итоги по (месяцу, категории, типу) за период [start, end).
+
+        Если границы периода совпадают с началом месяцев, итоги берутся из таблицы
+        monthly_summary, иначе считаются по исходным строкам периода.
+
+        Args:
+            start (Optional[Union[str, datetime]]): Начало периода включительно. None - без ограничения.
+            end (Optional[Union[str, datetime]]): Конец периода не включительно. None - без ограничения.
+
+        Returns:
+            pd.DataFrame: Сводка в формате services.summarize_by_month. Без границ периода
+            в нее входят и операции без даты (month - пустая строка).
+        """
+        bounds = [None if value is None else pd.Timestamp(value) for value in (start, end)]
+        conditions: List[str] = []
+        params: List[str] = []
+
+        if all(bound is None or bound == bound.to_period("M").start_time for bound in bounds):
+            for bound, operator in zip(bounds, (">=", "<")):
+                if bound is not None:
+                    conditions.append(f"month != '' AND month {operator} ?")
+                    params.append(bound.strftime("%Y-%m"))
+            where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+            columns = ", ".join(SUMMARY_KEYS + SUMMARY_VALUES)
+            summary = pd.read_sql_query(
+                f"SELECT {columns} FROM monthly_summary{where} ORDER BY month, category, type",
+                self._connection, params=params,
+            )
+            summary[["rows", "amount_count"]] = summary[["rows", "amount_count"]].astype(int)
+            return summary
+
+        for bound, operator in zip(bounds, (">=", "<")):
+            if bound is not None:
+                conditions.append(f"{_quote(DATE_COLUMN)} {operator} ?")
+                params.append(bound.strftime(DB_DATE_FORMAT))
+        df = self.read_frame(f"SELECT * FROM transactions WHERE {' AND '.join(conditions)} ORDER BY id", params)
+        transaction_db_logger.info(
+            "Период %s - %s не совпадает с границами месяцев: сводка по %s исходным строкам", start, end, len(df)
+        )
+        return summarize_by_month(add_service_columns(df))
+
+    def dirty_months(self) -> List[str]:
+        """
+        Возвращает месяцы 'YYYY-MM', в которых появились операции после последнего mark_clean.
+        """
+        return [row[0] for row in self._connection.execute("SELECT month FROM dirty_months ORDER BY month")]
+
+    def mark_clean(self, months: Optional[Iterable[str]] = None) -> None:
+        """
+        Снимает отметку об изменении с месяцев после пересчета отчетов. None - со всех месяцев.
+        """
+        with self._connection:
+            if months is None:
+                self._connection.execute("DELETE FROM dirty_months")
+            else:
+                self._connection.executemany(
+                    "DELETE FROM dirty_months WHERE month = ?", [(month,) for month in months]
+                )
+
+    def load(self, months: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """
+        Загружает транзакции из базы в порядке добавления.
+
+        Args:
+            months (Optional[Iterable[str]]): Месяцы 'YYYY-MM'. None - все транзакции.
+
+        Returns:
+            pd.DataFrame: Транзакции с датами в формате datetime64.
+        """
+        query = "SELECT * FROM transactions"
+        params: List[str] = []
+        if months is not None:
+            params = list(months)
+            query += f" WHERE month IN ({', '.join('?' * len(params))})"
+        df = self.read_frame(query + " ORDER BY id", params)
+        transaction_db_logger.info("Загружено %s транзакций из базы, месяцы: %s", len(df), months)
+        return df
+
+    def read_frame(self, query: str, params: Sequence[Any] = ()) -> pd.DataFrame:
+        """
+        Выполняет SELECT по таблице transactions и возвращает транзакции в виде DataFrame.
+
+        Служебные колонки id, row_hash и month отбрасываются, колонки дат переводятся в datetime64.
+        """
+        df = pd.read_sql_query(query, self._connection, params=list(params))
+        df = df.drop(columns=["id", "row_hash", "month"], errors="ignore")
+
+        # Обратно в datetime переводятся только колонки, сохраненные как даты
+        for column in DATE_COLUMNS:
+            if column in df.columns:
+                try:
+                    df[column] = pd.to_datetime(df[column], format=DB_DATE_FORMAT)
+                except (ValueError, TypeError):
+                    continue
+        return df
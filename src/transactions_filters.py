@@ -0,0 +1,357 @@
+from __future__ import annotations
+
+import functools
+import re
+from typing import Any, Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple, Union
+from datetime import datetime
+
+from src.file_readers import DATE_COLUMN
+from src.lazy_imports import lazy_import
+from src.logging_config import setup_logger
+from src.result_cache import fingerprint
+from src.services import TransferRule, classify_transfers
+from src.transaction_db import DB_DATE_FORMAT, TransactionDatabase
+
+pd = lazy_import("pandas")
+np = lazy_import("numpy")
+
+filters_logger = setup_logger("transactions_filters", "logs/transactions_filters.log")
+
+DateLike = Union[str, datetime, "pd.Timestamp"]
+
+
+class TransactionStore:
+    """
+    Хранилище транзакций, отсортированных по дате операции.
+
+    Категория хранится как pandas Categorical, а для каждой категории заранее
+    вычисляются позиции строк и их даты. Запросы вида (категория, начало, конец)
+    выполняются двоичным поиском (searchsorted) без полного просмотра данных.
+    Диапазон дат полуоткрытый: [start, end).
+    """
+
+    def __init__(
+        self,
+        data: pd.DataFrame,
+        date_column: str = "Дата операции",
+        category_column: str = "Категория",
+        date_format: Optional[str] = "%Y-%m-%d",
+    ) -> None:
+        self.date_column = date_column
+        self.category_column = category_column
+
+        frame = data.copy()
+        if not pd.api.types.is_datetime64_any_dtype(frame[date_column]):
+            frame[date_column] = pd.to_datetime(frame[date_column], format=date_format)
+        frame = frame.sort_values(date_column, kind="stable", na_position="last").reset_index(drop=True)
+        if category_column in frame.columns:
+            frame[category_column] = frame[category_column].astype("category")
+        self._frame = frame
+
+        self._dates = frame[date_column].to_numpy(dtype="datetime64[ns]")
+        self._category_positions: Dict[str, np.ndarray] = {}
+        if category_column in frame.columns:
+            # Позиции внутри каждой категории возрастают, а значит отсортированы по дате
+            self._category_positions = frame.groupby(category_column, observed=True, sort=False).indices
+        self._category_dates = {
+            category: self._dates[positions] for category, positions in self._category_positions.items()
+        }
+
+        filters_logger.info(
+            "Построено хранилище: %s транзакций, %s категорий.", len(frame), len(self._category_positions)
+        )
+
+    def __len__(self) -> int:
+        return len(self._frame)
+
+    @property
+    def frame(self) -> pd.DataFrame:
+        """
+        Транзакции, отсортированные по дате. Возвращается неглубокая копия:
+        при Copy-on-Write ее изменение не затрагивает данные хранилища.
+        """
+        return self._frame.copy(deep=False)
+
+    @property
+    def columns(self) -> pd.Index:
+        return self._frame.columns
+
+    def data_fingerprint(self) -> str:
+        """
+        Отпечаток содержимого для кэша результатов. Хэш данных вычисляется
+        один раз, повторные вызовы только проверяют, что данные не изменились
+        (см. result_cache.fingerprint).
+        """
+        return fingerprint(self._frame)
+
+    @staticmethod
+    def _bounds(dates: np.ndarray, start: Optional[DateLike], end: Optional[DateLike]) -> slice:
+        lo = 0 if start is None else np.searchsorted(dates, np.datetime64(pd.Timestamp(start)), side="left")
+        hi = len(dates) if end is None else np.searchsorted(dates, np.datetime64(pd.Timestamp(end)), side="left")
+        return slice(int(lo), int(hi))
+
+    def positions(
+        self, category: Optional[str] = None, start: Optional[DateLike] = None, end: Optional[DateLike] = None
+    ) -> np.ndarray:
+        """
+        Возвращает позиции строк, попадающих в категорию и диапазон дат, в порядке дат.
+        """
+        if category is None:
+            return np.arange(len(self._dates))[self._bounds(self._dates, start, end)]
+
+        category_positions = self._category_positions.get(category)
+        if category_positions is None:
+            return np.empty(0, dtype=np.intp)
+        return category_positions[self._bounds(self._category_dates[category], start, end)]
+
+    def query(
+        self, category: Optional[str] = None, start: Optional[DateLike] = None, end: Optional[DateLike] = None
+    ) -> pd.DataFrame:
+        """
+        Возвращает транзакции категории за период [start, end).
+
+        Args:
+            category (Optional[str]): Категория. None - все категории.
+            start (Optional[DateLike]): Начало периода включительно.
+            end (Optional[DateLike]): Конец периода не включительно.
+
+        Returns:
+            pd.DataFrame: Копия подходящих строк, отсортированных по дате.
+        """
+        return self._frame.iloc[self.positions(category, start, end)].copy()
+
+
+# Поля, в которых ищется подстрока TransactionFilter.text
+TEXT_SEARCH_COLUMNS = ("Описание операции", "Комментарий")
+CATEGORY_COLUMN = "Категория"
+TYPE_COLUMN = "Тип"
+AMOUNT_COLUMN = "Сумма"
+
+
+class TransactionFilter(NamedTuple):
+    """
+    Набор условий отбора транзакций. Условия объединяются через И, None - нет ограничения.
+
+    Диапазон дат полуоткрытый: [start, end), диапазон сумм - включительно.
+    text ищется без учета регистра как подстрока в TEXT_SEARCH_COLUMNS,
+    transfer_rule проверяется так же, как в services.classify_transfers.
+    """
+
+    start: Optional[DateLike] = None
+    end: Optional[DateLike] = None
+    categories: Optional[FrozenSet[str]] = None
+    types: Optional[FrozenSet[str]] = None
+    min_amount: Optional[float] = None
+    max_amount: Optional[float] = None
+    text: Optional[str] = None
+    transfer_rule: Optional[TransferRule] = None
+
+
+def filter_transactions(data: Union[pd.DataFrame, TransactionStore], flt: TransactionFilter) -> pd.DataFrame:
+    """
+    Отбирает транзакции по фильтру в памяти.
+
+    Args:
+        data (Union[pd.DataFrame, TransactionStore]): Нормализованные транзакции
+            (даты - datetime64, суммы - числа).
+        flt (TransactionFilter): Условия отбора.
+
+    Returns:
+        pd.DataFrame: Подходящие строки в исходном порядке.
+    """
+    df = data.frame if isinstance(data, TransactionStore) else data
+    mask = pd.Series(True, index=df.index)
+
+    def column(name: str, dtype: str = "object") -> pd.Series:
+        if name in df.columns:
+            return df[name]
+        return pd.Series(None, index=df.index, dtype=dtype)
+
+    if flt.start is not None:
+        mask &= column(DATE_COLUMN, "datetime64[ns]") >= pd.Timestamp(flt.start)
+    if flt.end is not None:
+        mask &= column(DATE_COLUMN, "datetime64[ns]") < pd.Timestamp(flt.end)
+    if flt.categories is not None:
+        mask &= column(CATEGORY_COLUMN).isin(flt.categories)
+    if flt.types is not None:
+        mask &= column(TYPE_COLUMN).isin(flt.types)
+    if flt.min_amount is not None or flt.max_amount is not None:
+        amounts = pd.to_numeric(column(AMOUNT_COLUMN), errors="coerce")
+        if flt.min_amount is not None:
+            mask &= amounts >= flt.min_amount
+        if flt.max_amount is not None:
+            mask &= amounts <= flt.max_amount
+    if flt.text:
+        query = flt.text.lower()
+        found = pd.Series(False, index=df.index)
+        for name in TEXT_SEARCH_COLUMNS:
+            found |= column(name).map(lambda value: isinstance(value, str) and query in value.lower()).astype(bool)
+        mask &= found
+    if flt.transfer_rule is not None:
+        mask &= classify_transfers(df, [flt.transfer_rule])[flt.transfer_rule.name]
+
+    return df[mask.to_numpy(dtype=bool)]
+
+
+def _quote(column: str) -> str:
+    return '"' + column.replace('"', '""') + '"'
+
+
+@functools.lru_cache(maxsize=64)
+def _compile_pattern(pattern: str, flags: int) -> re.Pattern:
+    return re.compile(pattern, flags)
+
+
+def _regexp_match(pattern: str, flags: int, value: Any) -> bool:
+    return isinstance(value, str) and _compile_pattern(pattern, flags).match(value) is not None
+
+
+def _lower(value: Any) -> Optional[str]:
+    # Регистр приводится в Python: встроенная lower() SQLite понимает только ASCII
+    return value.lower() if isinstance(value, str) else None
+
+
+def compile_filter(flt: TransactionFilter, columns: Iterable[str]) -> Tuple[str, List[Any]]:
+    """
+    Переводит фильтр в условие WHERE по таблице transactions.
+
+    Args:
+        flt (TransactionFilter): Условия отбора.
+        columns (Iterable[str]): Колонки таблицы. Отсутствующие колонки считаются пустыми (NULL).
+
+    Returns:
+        Tuple[str, List[Any]]: Условие SQL и его параметры.
+    """
+    columns = set(columns)
+
+    def column(name: str) -> str:
+        return _quote(name) if name in columns else "NULL"
+
+    conditions: List[str] = []
+    params: List[Any] = []
+
+    def is_in(name: str, values: FrozenSet[str]) -> None:
+        values = sorted(values)
+        conditions.append(f"{column(name)} IN ({', '.join('?' * len(values))})")
+        params.extend(values)
+
+    if flt.start is not None:
+        conditions.append(f"{column(DATE_COLUMN)} >= ?")
+        params.append(pd.Timestamp(flt.start).strftime(DB_DATE_FORMAT))
+    if flt.end is not None:
+        conditions.append(f"{column(DATE_COLUMN)} < ?")
+        params.append(pd.Timestamp(flt.end).strftime(DB_DATE_FORMAT))
+    if flt.categories is not None:
+        is_in(CATEGORY_COLUMN, flt.categories)
+    if flt.types is not None:
+        is_in(TYPE_COLUMN, flt.types)
+    if flt.min_amount is not None:
+        conditions.append(f"{column(AMOUNT_COLUMN)} >= ?")
+        params.append(float(flt.min_amount))
+    if flt.max_amount is not None:
+        conditions.append(f"{column(AMOUNT_COLUMN)} <= ?")
+        params.append(float(flt.max_amount))
+    if flt.text:
+        query = flt.text.lower()
+        if len(query) >= 3:
+            # Триграммный индекс находит подстроку длиной от трех символов
+            conditions.append("id IN (SELECT rowid FROM transactions_fts WHERE transactions_fts MATCH ?)")
+            params.append('"' + query.replace('"', '""') + '"')
+        else:
+            conditions.append(
+                "id IN (SELECT rowid FROM transactions_fts WHERE instr(description, ?) > 0 OR instr(comment, ?) > 0)"
+            )
+            params.extend([query, query])
+    if flt.transfer_rule is not None:
+        rule = flt.transfer_rule
+        if rule.categories is not None:
+            is_in(CATEGORY_COLUMN, rule.categories)
+        if rule.types is not None:
+            is_in(TYPE_COLUMN, rule.types)
+        if rule.require_empty_comment:
+            comment = column("Комментарий")
+            conditions.append(f"({comment} IS NULL OR {comment} = '')")
+        conditions.append(f"regexp_match(?, ?, {column(rule.field)})")
+        params.extend([rule.pattern.pattern, int(rule.pattern.flags)])
+
+    return " AND ".join(conditions) or "1", params
+
+
+class SQLiteTransactionFilter:
+    """
+    Отбор транзакций из TransactionDatabase одним SQL-запросом.
+
+    К таблице transactions добавляются индексы по дате, категории и типу и
+    таблица FTS5 с триграммным токенизатором для поиска подстроки в описании
+    и комментарии. Результаты совпадают с filter_transactions по данным
+    TransactionDatabase.load(), но строки не загружаются в память целиком,
+    поэтому подходит для выписок, не помещающихся в память.
+
+    Пример:
+        with TransactionDatabase() as db:
+            engine = SQLiteTransactionFilter(db)
+            transfers = engine.query(TransactionFilter(start="2024-01-01", transfer_rule=PERSONAL_TRANSFER_RULE))
+    """
+
+    def __init__(self, database: TransactionDatabase) -> None:
+        self.database = database
+        connection = database.connection
+        connection.create_function("regexp_match", 3, _regexp_match, deterministic=True)
+        connection.create_function("py_lower", 1, _lower, deterministic=True)
+        with connection:
+            connection.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS transactions_fts "
+                "USING fts5(description, comment, tokenize='trigram case_sensitive 1')"
+            )
+
+    def _prepare(self) -> List[str]:
+        """
+        Создает недостающие индексы и дописывает в FTS5 строки, добавленные после прошлого запроса.
+        Строки индекса хранятся под rowid, равным transactions.id. Таблица transactions
+        только пополняется, а id не меняется при VACUUM, поэтому достаточно сравнить id.
+        """
+        connection = self.database.connection
+        columns = self.database.columns()
+        with connection:
+            for name in (DATE_COLUMN, CATEGORY_COLUMN, TYPE_COLUMN):
+                if name in columns:
+                    index_name = _quote(f"transactions_{name}")
+                    connection.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON transactions ({_quote(name)})")
+
+            last_id = connection.execute("SELECT COALESCE(MAX(rowid), 0) FROM transactions_fts").fetchone()[0]
+            description, comment = (_quote(name) if name in columns else "NULL" for name in TEXT_SEARCH_COLUMNS)
+            inserted = connection.execute(
+                f"INSERT INTO transactions_fts (rowid, description, comment) "
+                f"SELECT id, py_lower({description}), py_lower({comment}) FROM transactions WHERE id > ?",
+                (last_id,),
+            ).rowcount
+        if inserted > 0:
+            filters_logger.info("В полнотекстовый индекс добавлено %s транзакций.", inserted)
+        return columns
+
+    def query(self, flt: TransactionFilter) -> pd.DataFrame:
+        """
+        Возвращает транзакции, подходящие под фильтр, в порядке добавления в базу.
+        """
+        where, params = compile_filter(flt, self._prepare())
+        df = self.database.read_frame(f"SELECT * FROM transactions WHERE {where} ORDER BY id", params)
+        filters_logger.info("Отобрано %s транзакций по фильтру %s", len(df), flt)
+        return df
+
+    def count(self, flt: TransactionFilter) -> int:
+        """
+        Возвращает количество транзакций, подходящих под фильтр, не загружая их.
+        """
+        where, params = compile_filter(flt, self._prepare())
+        row = self.database.connection.execute(f"SELECT COUNT(*) FROM transactions WHERE {where}", params).fetchone()
+        return row[0]
+
+    def explain(self, flt: TransactionFilter) -> List[str]:
+        """
+        Возвращает план выполнения запроса SQLite (EXPLAIN QUERY PLAN) для проверки использования индексов.
+        """
+        where, params = compile_filter(flt, self._prepare())
+        plan = self.database.connection.execute(
+            f"EXPLAIN QUERY PLAN SELECT * FROM transactions WHERE {where} ORDER BY id", params
+        )
+        return [row[-1] for row in plan]
@@ -0,0 +1,272 @@
+from __future__ import annotations
+
+import importlib.util
+import json
+from typing import Any, Dict, Iterator, List, Optional
+
+from src.lazy_imports import lazy_import
+from src.logging_config import setup_logger
+
+pd = lazy_import("pandas")
+# orjson - необязательная зависимость
+orjson = lazy_import("orjson") if importlib.util.find_spec("orjson") is not None else None
+
+utils_logger = setup_logger("utils", "logs/utils.log")
+
+# Колонки выписки и целевые типы для normalize_transactions
+AMOUNT_COLUMNS = ("Сумма", "Сумма операции")
+CASHBACK_COLUMNS = ("Кэшбек", "Кэшбэк")
+INTEGER_COLUMNS = ("MCC код",)
+DATE_COLUMNS = ("Дата операции", "Дата проводки")
+CATEGORICAL_COLUMNS = (
+    "Категория", "Тип", "Описание операции", "Статус", "Валюта",
+    "Тип кэшбэка", "Название счета", "Название карты", "Номер карты",
+)
+DATE_FORMATS = ("%d.%m.%Y", "%Y-%m-%d", "%d.%m.%Y %H:%M:%S", "%Y-%m-%d %H:%M:%S")
+
+# Допустимый формат строкового значения кешбэка, например "+74.5"
+CASHBACK_PATTERN = r"[+-]?\d*\.?\d+"
+
+# Сериализаторы компактного JSON. Форматированный JSON всегда строит json.dumps
+JSON_BACKENDS = ("orjson", "json")
+_json_backend = "orjson" if orjson is not None else "json"
+
+
+def configure_json_backend(backend: str) -> None:
+    """
+    Выбирает сериализатор компактного JSON: "orjson" (по умолчанию, если установлен) или "json".
+    """
+    global _json_backend
+    if backend not in JSON_BACKENDS:
+        raise ValueError(f"Неизвестный сериализатор JSON: {backend}")
+    if backend == "orjson" and orjson is None:
+        raise ImportError("Для сериализатора 'orjson' требуется пакет orjson")
+    _json_backend = backend
+
+
+def dumps_json(value: Any, compact: bool = False) -> str:
+    """
+    Сериализует значение в JSON с кириллицей без экранирования.
+
+    Форматированный вывод (compact=False) совпадает байт в байт
+    с json.dumps(value, ensure_ascii=False, indent=4). Компактный вывод
+    без пробелов строится выбранным сериализатором (см. configure_json_backend).
+    orjson записывает NaN как null и экспоненту без знака "+" (1e16).
+
+    Args:
+        value (Any): Значение для сериализации.
+        compact (bool): Компактный JSON без отступов и пробелов.
+
+    Returns:
+        str: JSON-строка.
+    """
+    if not compact:
+        return json.dumps(value, ensure_ascii=False, indent=4)
+    if _json_backend == "orjson":
+        try:
+            return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY).decode("utf-8")
+        except TypeError:
+            # Типы, которые не поддерживает orjson, сериализует json
+            pass
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def _dumps(value: Any, indent: Optional[int], level: int) -> str:
+    """
+    Сериализует значение с отступами, соответствующими уровню вложенности.
+    """
+    if indent is None:
+        return dumps_json(value, compact=True)
+    text = json.dumps(value, ensure_ascii=False, indent=indent)
+    return text.replace("\n", "\n" + " " * (indent * level))
+
+
+def iter_json(value: Any, indent: Optional[int] = 4, level: int = 0) -> Iterator[str]:
+    """
+    Сериализует значение в JSON по частям.
+
+    Словари обходятся по ключам, итераторы (например, генераторы) выводятся
+    как массивы поэлементно, не накапливаясь в памяти. Остальные значения
+    сериализуются целиком. При indent=4 склеенный результат совпадает
+    с json.dumps(..., ensure_ascii=False, indent=4).
+
+    Args:
+        value (Any): Значение для сериализации.
+        indent (Optional[int]): Отступ. None - компактный вывод без пробелов.
+        level (int): Уровень вложенности значения.
+
+    Yields:
+        str: Очередной фрагмент JSON.
+    """
+    if isinstance(value, dict):
+        yield from _iter_container(
+            ((_dumps(key if isinstance(key, str) else str(key), None, 0), item) for key, item in value.items()),
+            "{", "}", indent, level,
+        )
+    elif isinstance(value, Iterator):
+        yield from _iter_container(((None, item) for item in value), "[", "]", indent, level)
+    else:
+        yield _dumps(value, indent, level)
+
+
+def _iter_container(entries, opening: str, closing: str, indent: Optional[int], level: int) -> Iterator[str]:
+    if indent is None:
+        item_separator, key_separator, newline, closing_newline = ",", ":", "", ""
+    else:
+        newline = "\n" + " " * (indent * (level + 1))
+        closing_newline = "\n" + " " * (indent * level)
+        item_separator, key_separator = ",", ": "
+
+    empty = True
+    for key, item in entries:
+        yield (opening if empty else item_separator) + newline + ("" if key is None else key + key_separator)
+        empty = False
+        yield from iter_json(item, indent, level + 1)
+    yield opening + closing if empty else closing_newline + closing
+
+
+def parse_numeric(raw: pd.Series, pattern: Optional[str] = None) -> pd.Series:
+    """
+    Преобразует колонку в float64 за один проход.
+
+    Числа берутся как есть. Если задан pattern, строки преобразуются только
+    при полном совпадении с ним. Все остальные значения дают NaN.
+    """
+    if pd.api.types.is_numeric_dtype(raw):
+        return raw.astype(float)
+
+    values = pd.to_numeric(raw, errors="coerce")
+    if pattern is None:
+        return values
+    try:
+        matched = raw.str.fullmatch(pattern)
+    except AttributeError:
+        # В колонке нет ни одной строки
+        return values
+    values[matched.eq(False)] = float("nan")
+    return values
+
+
+def _parse_dates(raw: pd.Series) -> Optional[pd.Series]:
+    """
+    Подбирает формат дат из DATE_FORMATS, которому соответствуют все непустые значения.
+    """
+    for date_format in DATE_FORMATS:
+        try:
+            return pd.to_datetime(raw, format=date_format)
+        except (ValueError, TypeError):
+            continue
+    return None
+
+
+def normalize_transactions(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Однократно приводит колонки выписки к компактным типам.
+
+    Суммы и кешбэк становятся float64, MCC код - Int64, даты - datetime64,
+    а повторяющиеся строковые колонки (категория, тип, описание и т. п.) -
+    pandas Categorical. Функции services, reports и views распознают такие
+    колонки и не преобразуют их повторно.
+
+    Исходный DataFrame не изменяется. Объем памяти до и после нормализации
+    сохраняется в attrs["memory_usage"] результата.
+
+    Args:
+        df (pd.DataFrame): Транзакции выписки.
+
+    Returns:
+        pd.DataFrame: Нормализованная копия.
+    """
+    memory_before = int(df.memory_usage(deep=True).sum())
+    normalized = df.copy()
+
+    for column in AMOUNT_COLUMNS + CASHBACK_COLUMNS:
+        if column in normalized.columns:
+            pattern = CASHBACK_PATTERN if column in CASHBACK_COLUMNS else None
+            normalized[column] = parse_numeric(normalized[column], pattern)
+
+    for column in INTEGER_COLUMNS:
+        if column in normalized.columns:
+            values = parse_numeric(normalized[column])
+            if (values.dropna() % 1 == 0).all():
+                normalized[column] = values.astype("Int64")
+            else:
+                normalized[column] = values
+
+    for column in DATE_COLUMNS:
+        if column in normalized.columns and not pd.api.types.is_datetime64_any_dtype(normalized[column]):
+            dates = _parse_dates(normalized[column])
+            if dates is None:
+                utils_logger.warning("Не удалось определить формат дат в колонке '%s'.", column)
+            else:
+                normalized[column] = dates
+
+    for column in CATEGORICAL_COLUMNS:
+        if column in normalized.columns and not isinstance(normalized[column].dtype, pd.CategoricalDtype):
+            normalized[column] = normalized[column].astype("category")
+
+    memory_after = int(normalized.memory_usage(deep=True).sum())
+    normalized.attrs["memory_usage"] = {
+        "before": memory_before,
+        "after": memory_after,
+        "saved": memory_before - memory_after,
+    }
+    utils_logger.info(
+        "Нормализовано %s транзакций: память %s -> %s байт (сэкономлено %s).",
+        len(normalized), memory_before, memory_after, memory_before - memory_after,
+    )
+    return normalized
+
+
+def add_service_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Добавляет колонки под именами, которые ожидают функции services.
+
+    Кешбэк из выгрузки ("Кэшбэк") дублируется в колонку "Кэшбек", а сумма списаний -
+    в колонку "Сумма операции" (Инвесткопилка округляет только списания).
+    Существующие колонки не меняются, исходный DataFrame не изменяется.
+    """
+    df = df.copy()
+    if "Кэшбек" not in df.columns and "Кэшбэк" in df.columns:
+        df["Кэшбек"] = df["Кэшбэк"]
+    if "Сумма операции" not in df.columns and "Сумма" in df.columns:
+        df["Сумма операции"] = df["Сумма"]
+        if "Тип" in df.columns:
+            df["Сумма операции"] = df["Сумма операции"].where(df["Тип"].eq("Списание"))
+    return df
+
+
+def dataframe_to_records(
+    df: pd.DataFrame, date_format: str = "%Y-%m-%d", missing: Any = None
+) -> List[Dict[str, Any]]:
+    """
+    Преобразует DataFrame в список словарей, пригодный для json.dumps:
+    даты форматируются строкой, пропуски заменяются значением missing
+    (None - null в JSON, float("nan") - NaN, как у DataFrame.to_dict).
+    """
+    df = df.copy()
+    for column in df.columns:
+        if pd.api.types.is_datetime64_any_dtype(df[column]):
+            df[column] = df[column].dt.strftime(date_format)
+    df = df.astype(object)
+    return df.where(df.notna(), missing).to_dict(orient="records")
+
+
+def frame_to_json(df: pd.DataFrame, compact: bool = False, date_format: str = "%Y-%m-%d") -> str:
+    """
+    Сериализует DataFrame в JSON-массив записей.
+
+    Компактный JSON строится напрямую через DataFrame.to_json без промежуточного
+    списка словарей. Числа в нем записываются с 15 значащими цифрами: суммы
+    до копеек сохраняются точно. Форматированный JSON совпадает
+    с dumps_json(dataframe_to_records(df)).
+    """
+    if not compact:
+        return dumps_json(dataframe_to_records(df, date_format))
+    dates = {
+        column: df[column].dt.strftime(date_format)
+        for column in df.columns
+        if pd.api.types.is_datetime64_any_dtype(df[column])
+    }
+    frame = df.assign(**dates) if dates else df
+    return frame.to_json(orient="records", force_ascii=False, double_precision=15)
@@ -1,54 +1,163 @@
-import json
-import pandas as pd
+from __future__ import annotations
+
+from itertools import islice
+from typing import Any, Iterator, List, Optional, Tuple, Union
+
+from src.file_readers import iter_json_transactions
+from src.lazy_imports import lazy_import
 from src.logging_config import setup_logger
+from src.metrics import instrument, stage
+from src.result_cache import memoize
+from src.transaction_db import TransactionDatabase
+from src.transactions_filters import TransactionStore
+from src.utils import dumps_json, iter_json
+
+pd = lazy_import("pandas")
 
 views_logger = setup_logger("views", "logs/views.log")
 
 
-def main_page(file_path: str) -> str:
-    views_logger.info(f"Начало обработки файла: {file_path}")
+def _scan_transactions(file_path: str, offset: int = 0, limit: Optional[int] = None) -> Tuple[int, List[Any]]:
+    """
+    Потоково считает транзакции в файле и собирает страницу [offset, offset + limit).
+    При заданном limit память ограничена размером страницы.
+    """
+    total = 0
+    page = []
+    for transaction in iter_json_transactions(file_path):
+        if total >= offset and (limit is None or total < offset + limit):
+            page.append(transaction)
+        total += 1
+    return total, page
+
+
+@instrument("views.main_page")
+def main_page(file_path: str, preview_limit: Optional[int] = None, compact: bool = False) -> str:
+    """
+    Возвращает JSON с количеством транзакций в файле и самими транзакциями.
+
+    Файл читается потоково (JSON-массив или JSON Lines). Если задан preview_limit,
+    в ответ попадают только первые preview_limit транзакций, а количество
+    считается без загрузки всего файла в память. При compact=True JSON
+    выводится без отступов.
+    """
+    views_logger.info("Начало обработки файла: %s", file_path)
     try:
-        with open(file_path, encoding="utf-8") as f:
-            transactions = json.load(f)
-        views_logger.info(f"Файл обработан. Найдено транзакций: {len(transactions)}")
-        return json.dumps({
-            "total_transactions": len(transactions),
-            "transactions": transactions
-        }, ensure_ascii=False, indent=4)
+        with stage("views.main_page.load") as timer:
+            total_transactions, transactions = _scan_transactions(file_path, limit=preview_limit)
+            timer.rows_out = total_transactions
+        views_logger.info("Файл обработан. Найдено транзакций: %s", total_transactions)
+        with stage("views.main_page.serialize", rows_in=len(transactions)):
+            return dumps_json({
+                "total_transactions": total_transactions,
+                "transactions": transactions
+            }, compact)
     except FileNotFoundError:
-        views_logger.error(f"Файл {file_path} не найден.")
-        return json.dumps({"error": f"Файл {file_path} не найден."}, ensure_ascii=False, indent=4)
+        views_logger.error("Файл %s не найден.", file_path)
+        return dumps_json({"error": f"Файл {file_path} не найден."}, compact)
     except UnicodeDecodeError as e:
-        views_logger.error(f"Ошибка кодировки файла {file_path}: {e}")
-        return json.dumps({"error": f"Ошибка кодировки файла {file_path}"}, ensure_ascii=False, indent=4)
+        views_logger.error("Ошибка кодировки файла %s: %s", file_path, e)
+        return dumps_json({"error": f"Ошибка кодировки файла {file_path}"}, compact)
+
+
+@instrument("views.main_page_stream")
+def main_page_stream(
+    file_path: str, offset: int = 0, limit: Optional[int] = None, compact: bool = False
+) -> Iterator[str]:
+    """
+    Отдает содержимое файла транзакций в виде JSON по частям с постраничным выводом.
+
+    "total_transactions" содержит общее количество транзакций в файле,
+    "transactions" - только запрошенную страницу. Без limit файл читается
+    дважды: сначала для подсчета, затем для вывода, - так что память
+    не зависит от размера файла.
+    """
+    views_logger.info("Начало потоковой обработки файла: %s, offset=%s, limit=%s", file_path, offset, limit)
+    indent = None if compact else 4
+    try:
+        if limit is None:
+            total_transactions = sum(1 for _ in iter_json_transactions(file_path))
+            page = islice(iter_json_transactions(file_path), offset, None)
+        else:
+            total_transactions, transactions = _scan_transactions(file_path, offset, limit)
+            page = iter(transactions)
+    except FileNotFoundError:
+        views_logger.error("Файл %s не найден.", file_path)
+        yield from iter_json({"error": f"Файл {file_path} не найден."}, indent=indent)
+        return
+    except UnicodeDecodeError as e:
+        views_logger.error("Ошибка кодировки файла %s: %s", file_path, e)
+        yield from iter_json({"error": f"Ошибка кодировки файла {file_path}"}, indent=indent)
+        return
+
+    views_logger.info("Файл обработан. Найдено транзакций: %s", total_transactions)
+    yield from iter_json({
+        "total_transactions": total_transactions,
+        "transactions": page,
+    }, indent=indent)
 
 
 events_logger = setup_logger("events", "logs/events.log")
 
 
-def events_page(data: pd.DataFrame) -> str:
+def _events_from_summary(summary: pd.DataFrame, compact: bool) -> str:
+    """
+    Строит ответ events_page по сводке services.summarize_by_month.
+    """
+    with stage("views.events_page.summary", rows_in=len(summary)):
+        total_events = int(summary["amount_count"].sum())
+        counts = summary[summary["category"].ne("")].groupby("category")["amount_count"].sum()
+        counts = counts[counts > 0].sort_values(ascending=False, kind="stable")
+        category_counts = {category: int(count) for category, count in counts.items()}
+    events_logger.info("Обработано %s событий по сводке.", total_events)
+    return dumps_json({"total_events": total_events, "categories": category_counts}, compact)
+
+
+@instrument("views.events_page")
+@memoize
+def events_page(data: Union[pd.DataFrame, TransactionStore, TransactionDatabase], compact: bool = False) -> str:
     """
-    Обрабатывает события из DataFrame и возвращает JSON с анализом категорий.
+    Обрабатывает события из DataFrame или TransactionStore и возвращает JSON с анализом категорий.
+    Для TransactionDatabase ответ строится по сводке по месяцам без чтения транзакций.
+    При compact=True JSON выводится без отступов.
     """
     events_logger.info("Начало обработки событий.")
+    if hasattr(data, "monthly_summary"):
+        return _events_from_summary(data.monthly_summary(), compact)
+    if isinstance(data, TransactionStore):
+        data = data.frame
 
     # Проверка наличия обязательных колонок
     required_columns = {"Категория", "Сумма"}
     if not required_columns.issubset(data.columns):
-        events_logger.error(f"Отсутствуют обязательные колонки: {required_columns - set(data.columns)}")
+        events_logger.error("Отсутствуют обязательные колонки: %s", required_columns - set(data.columns))
         raise KeyError(f"Отсутствуют обязательные колонки: {required_columns - set(data.columns)}")
 
-    # Фильтрация данных
-    data["Сумма"] = pd.to_numeric(data["Сумма"], errors="coerce")  # Преобразуем "Сумма" в числовой формат
-    valid_data = data.dropna(subset=["Сумма"])  # Удаляем строки с некорректной суммой
+    # Фильтрация данных: строки с некорректной суммой не учитываются
+    with stage("views.events_page.filter", rows_in=len(data)) as timer:
+        amounts = data["Сумма"]
+        if not pd.api.types.is_numeric_dtype(amounts):
+            amounts = pd.to_numeric(amounts, errors="coerce")  # Преобразуем "Сумма" в числовой формат
+        valid_data = data[amounts.notna()]
+        timer.rows_out = len(valid_data)
 
     if valid_data.empty:
         events_logger.warning("DataFrame пуст.")
-        return json.dumps({"total_events": 0, "categories": {}}, ensure_ascii=False, indent=4)
+        return dumps_json({"total_events": 0, "categories": {}}, compact)
 
     # Подсчёт категорий
-    category_counts = valid_data["Категория"].value_counts().to_dict()
-    total_events = valid_data.shape[0]
+    with stage("views.events_page.aggregate", rows_in=len(valid_data)):
+        # Для Categorical value_counts упорядочивает равные частоты по кодам категорий,
+        # поэтому счетчики строятся в порядке первого появления и сортируются устойчиво
+        categories = valid_data["Категория"]
+        category_counts = (
+            categories.groupby(categories, observed=True, sort=False)
+            .size()
+            .sort_values(ascending=False, kind="stable")
+            .to_dict()
+        )
+        total_events = valid_data.shape[0]
 
-    events_logger.info(f"Обработано {total_events} событий.")
-    return json.dumps({"total_events": total_events, "categories": category_counts}, ensure_ascii=False, indent=4)
+    events_logger.info("Обработано %s событий.", total_events)
+    with stage("views.events_page.serialize"):
+        return dumps_json({"total_events": total_events, "categories": category_counts}, compact)
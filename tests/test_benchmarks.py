@@ -0,0 +1,64 @@
+import json
+import logging
+
+import pandas as pd
+import pytest
+
+from benchmarks.run_benchmarks import compare_results, main, prepare_inputs
+from benchmarks.synthetic import COLUMNS, generate_transactions, to_records
+from src.logging_config import _file_handlers
+from src.result_cache import configure_result_cache
+from src.services import filter_personal_transfers
+from src.utils import add_service_columns
+
+
+@pytest.fixture(autouse=True)
+def restore_settings():
+    levels = {name: logging.getLogger(name).level for name in _file_handlers}
+    yield
+    configure_result_cache(enabled=True)
+    for name, level in levels.items():
+        logging.getLogger(name).setLevel(level)
+
+
+def test_generate_transactions_schema_and_determinism():
+    df = generate_transactions(2000, seed=1)
+    assert tuple(df.columns) == COLUMNS
+    assert len(df) == 2000
+    assert pd.api.types.is_datetime64_any_dtype(df["Дата операции"])
+    assert df["Дата операции"].is_monotonic_decreasing
+    assert (df["Сумма"] > 0).all()
+    pd.testing.assert_frame_equal(add_service_columns(df.drop(columns="Сумма операции"))[list(COLUMNS)], df)
+    pd.testing.assert_frame_equal(df, generate_transactions(2000, seed=1))
+    assert len(filter_personal_transfers(df)) > 0
+
+
+def test_to_records():
+    records = to_records(generate_transactions(10))
+    assert set(records[0]) == set(COLUMNS)
+    assert isinstance(records[0]["Дата операции"], str)
+    json.dumps(records, ensure_ascii=False)
+
+
+def test_run_benchmarks_writes_results(tmp_path):
+    output = tmp_path / "results.json"
+    assert main(["--sizes", "200", "--repeat", "1", "--benchmarks", "events_page", "--output", str(output)]) == 0
+    report = json.loads(output.read_text(encoding="utf-8"))
+    assert [r["benchmark"] for r in report["results"]] == ["events_page"]
+    assert report["results"][0]["peak_memory_bytes"] > 0
+
+
+def test_compare_results():
+    baseline = {"results": [{"benchmark": "events_page", "rows": 10, "median_seconds": 1.0}]}
+    current = {"results": [{"benchmark": "events_page", "rows": 10, "median_seconds": 1.5}]}
+    assert compare_results(baseline, current)[0]["ratio"] == 1.5
+    assert compare_results(baseline, current, threshold=2.0) == []
+
+
+def test_prepare_inputs_builds_only_requested(tmp_path):
+    assert set(prepare_inputs(50, str(tmp_path), inputs=("df",))) == {"df"}
+    assert list(tmp_path.iterdir()) == []
+    data = prepare_inputs(50, str(tmp_path), inputs=("df", "json_path"))
+    assert set(data) == {"df", "json_path"}
+    with open(data["json_path"], encoding="utf-8") as f:
+        assert len(json.load(f)) == 50
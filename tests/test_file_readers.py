@@ -0,0 +1,200 @@
+import os
+import json
+import pytest
+import pandas as pd
+from src.file_readers import (
+    SOURCE_COLUMN, export_arrow, iter_json_transactions, iter_transaction_batches, open_arrow, read_statement,
+    read_statements,
+)
+from src.views import events_page
+
+
+@pytest.fixture
+def statement_file(tmp_path):
+    pytest.importorskip("openpyxl")
+    file_path = tmp_path / "statement.xlsx"
+    pd.DataFrame({
+        "Дата операции": ["17.12.2024", "16.12.2024", "01.11.2024"],
+        "Описание операции": ["Яна М.", "MOSKVA\\TEREMOK  CAFE", "Пятерочка"],
+        "Сумма": [7777.0, 602.0, 150.5],
+        "Категория": ["Финансовые операции", "Фастфуд", "Продукты"],
+        "Тип": ["Списание", "Списание", "Списание"],
+    }).to_excel(file_path, index=False)
+    yield file_path
+
+
+def test_read_statement_parses_dates(statement_file, tmp_path):
+    df = read_statement(str(statement_file), cache_dir=str(tmp_path / "cache"))
+    assert len(df) == 3
+    assert pd.api.types.is_datetime64_any_dtype(df["Дата операции"])
+    assert df["Дата операции"].iloc[0] == pd.Timestamp("2024-12-17")
+
+
+def test_read_statement_uses_cache(statement_file, tmp_path, monkeypatch):
+    cache_dir = tmp_path / "cache"
+    first = read_statement(str(statement_file), cache_dir=str(cache_dir))
+    assert len(os.listdir(cache_dir)) == 1
+
+    def fail_read_excel(*args, **kwargs):
+        raise AssertionError("XLSX не должен разбираться повторно")
+
+    monkeypatch.setattr(pd, "read_excel", fail_read_excel)
+    second = read_statement(str(statement_file), cache_dir=str(cache_dir))
+    pd.testing.assert_frame_equal(first, second, check_dtype=False)
+
+
+def test_read_statement_invalidates_cache_on_change(statement_file, tmp_path):
+    cache_dir = tmp_path / "cache"
+    read_statement(str(statement_file), cache_dir=str(cache_dir))
+
+    pd.DataFrame({
+        "Дата операции": ["17.12.2024"],
+        "Сумма": [10.0],
+        "Категория": ["Продукты"],
+    }).to_excel(statement_file, index=False)
+    stat = os.stat(statement_file)
+    os.utime(statement_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    df = read_statement(str(statement_file), cache_dir=str(cache_dir))
+    assert len(df) == 1
+    assert len(os.listdir(cache_dir)) == 1
+
+
+def test_read_statement_column_projection(statement_file, tmp_path):
+    cache_dir = tmp_path / "cache"
+    read_statement(str(statement_file), cache_dir=str(cache_dir))
+    df = read_statement(str(statement_file), columns=["Категория", "Сумма"], cache_dir=str(cache_dir))
+    assert list(df.columns) == ["Категория", "Сумма"]
+
+    result_data = json.loads(events_page(df))
+    assert result_data["total_events"] == 3
+
+
+def test_read_statement_without_cache(statement_file, tmp_path):
+    df = read_statement(str(statement_file), columns=["Сумма"], cache_dir=None)
+    assert list(df.columns) == ["Сумма"]
+    assert not (tmp_path / "cache").exists()
+
+
+def test_read_statement_normalize(statement_file, tmp_path):
+    df = read_statement(str(statement_file), cache_dir=str(tmp_path / "cache"), normalize=True)
+    assert isinstance(df["Категория"].dtype, pd.CategoricalDtype)
+    assert "memory_usage" in df.attrs
+
+
+@pytest.fixture
+def transactions():
+    return [
+        {"Сумма": 1500.5, "Тип": "Списание", "Описание операции": "MOSKVA\\OZON RU, [1]"},
+        {"Сумма": 2000, "Тип": "Пополнение", "Кэшбек": None},
+        {"Сумма": 1e10, "Тип": "Списание", "Комментарий": "}{"},
+    ]
+
+
+@pytest.mark.parametrize("indent", [None, 4])
+def test_iter_json_transactions_array(tmp_path, transactions, indent):
+    file_path = tmp_path / "transactions.json"
+    file_path.write_text(json.dumps(transactions, ensure_ascii=False, indent=indent), encoding="utf-8")
+    for chunk_size in [1, 7, 1 << 16]:
+        assert list(iter_json_transactions(str(file_path), chunk_size=chunk_size)) == transactions
+
+
+def test_iter_json_transactions_json_lines(tmp_path, transactions):
+    file_path = tmp_path / "transactions.jsonl"
+    lines = [json.dumps(tx, ensure_ascii=False) for tx in transactions]
+    file_path.write_text("\n".join(lines) + "\n\n", encoding="utf-8")
+    assert list(iter_json_transactions(str(file_path))) == transactions
+
+
+def test_iter_json_transactions_pretty_printed_object(tmp_path, transactions):
+    file_path = tmp_path / "transaction.json"
+    file_path.write_text("\n" + json.dumps(transactions[2], ensure_ascii=False, indent=4), encoding="utf-8")
+    assert list(iter_json_transactions(str(file_path))) == [transactions[2]]
+
+    file_path.write_text('{\n    "a": 1,\n', encoding="utf-8")
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_json_transactions(str(file_path)))
+
+
+def test_iter_json_transactions_empty_file(tmp_path):
+    file_path = tmp_path / "transactions.json"
+    file_path.write_text("[]", encoding="utf-8")
+    assert list(iter_json_transactions(str(file_path))) == []
+
+
+@pytest.mark.parametrize("content", [
+    "[{\"a\": 1}", "[{\"a\": 1} {\"b\": 2}]", "[{\"a\": 1},]",
+    "[1,2]]", "[1,2] x", "[]\n\n  [3]", "[{\"a\": 1}]        {}",
+])
+@pytest.mark.parametrize("chunk_size", [1, 4, 1 << 16])
+def test_iter_json_transactions_malformed(tmp_path, content, chunk_size):
+    file_path = tmp_path / "transactions.json"
+    file_path.write_text(content, encoding="utf-8")
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_json_transactions(str(file_path), chunk_size=chunk_size))
+
+
+def test_iter_json_transactions_trailing_whitespace(tmp_path):
+    file_path = tmp_path / "transactions.json"
+    file_path.write_text("[1, 2]\n  \n\t", encoding="utf-8")
+    for chunk_size in [1, 4, 1 << 16]:
+        assert list(iter_json_transactions(str(file_path), chunk_size=chunk_size)) == [1, 2]
+
+
+def test_iter_transaction_batches(tmp_path, transactions):
+    file_path = tmp_path / "transactions.json"
+    file_path.write_text(json.dumps(transactions, ensure_ascii=False), encoding="utf-8")
+    batches = list(iter_transaction_batches(str(file_path), batch_size=2))
+    assert batches == [transactions[:2], transactions[2:]]
+
+
+@pytest.fixture
+def statements_dir(tmp_path):
+    pytest.importorskip("openpyxl")
+    directory = tmp_path / "statements"
+    directory.mkdir()
+    # Выгрузки пересекаются 10.12.2024: одна операция есть в обеих, вторая - только в новой
+    pd.DataFrame({
+        "Дата операции": ["10.12.2024", "05.12.2024", "01.12.2024"],
+        "Описание операции": ["Пятерочка", "Теремок", "Пятерочка"],
+        "Сумма": [150.5, 602.0, 99.0],
+        "Категория": ["Продукты", "Фастфуд", "Продукты"],
+    }).to_excel(directory / "december.xlsx", index=False)
+    pd.DataFrame({
+        "Дата операции": ["20.12.2024", "10.12.2024", "10.12.2024"],
+        "Описание операции": ["Яна М.", "Пятерочка", "Пятерочка"],
+        "Сумма": [7777.0, 150.5, 150.5],
+        "Категория": ["Финансовые операции", "Продукты", "Продукты"],
+    }).to_excel(directory / "december_2.XLSX", index=False)
+    (directory / "notes.txt").write_text("не выписка", encoding="utf-8")
+    yield directory
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_read_statements_merges_overlapping_exports(statements_dir, tmp_path, max_workers):
+    df = read_statements(str(statements_dir), max_workers=max_workers, cache_dir=str(tmp_path / "cache"))
+    assert len(df) == 5
+    assert (df["Сумма"] == 150.5).sum() == 2
+    assert df[SOURCE_COLUMN].value_counts().to_dict() == {"december_2.XLSX": 3, "december.xlsx": 2}
+    assert isinstance(df["Категория"].dtype, pd.CategoricalDtype)
+    assert df["Сумма"].sum() == pytest.approx(7777.0 + 150.5 * 2 + 602.0 + 99.0)
+
+
+def test_read_statements_empty_directory(tmp_path):
+    assert read_statements(str(tmp_path), max_workers=1).empty
+
+
+def test_export_arrow_memory_mapped(statement_file, tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    df = read_statement(str(statement_file), cache_dir=None, normalize=True)
+    file_path = export_arrow(df, str(tmp_path / "arrow" / "transactions.arrow"))
+
+    allocated = pa.total_allocated_bytes()
+    mapped = open_arrow(file_path)
+    # Колонки ссылаются на отображенный файл: в памяти процесса только коды категорий
+    assert pa.total_allocated_bytes() - allocated < 4096
+    assert isinstance(mapped["Сумма"].dtype, pd.ArrowDtype)
+    assert isinstance(mapped["Категория"].dtype, pd.CategoricalDtype)
+    assert mapped["Описание операции"].tolist() == df["Описание операции"].tolist()
+    assert json.loads(events_page(mapped)) == json.loads(events_page(df))
+    assert open_arrow(file_path, columns=["Сумма"]).columns.tolist() == ["Сумма"]
@@ -0,0 +1,45 @@
+import subprocess
+import sys
+
+import pytest
+
+from src.lazy_imports import lazy_import
+
+# Модули, которые импортируются при запуске CLI, и бюджет времени их импорта
+ENTRY_POINTS = ("src.main", "src.reports", "src.views", "src.services")
+HEAVY_MODULES = ("pandas", "numpy", "orjson")
+STARTUP_BUDGET_US = 300_000
+
+
+def test_lazy_import_loads_on_attribute_access():
+    json_module = lazy_import("json")
+    assert json_module.loads("[1]") == [1]
+    with pytest.raises(ModuleNotFoundError):
+        lazy_import("no_such_module_finanalyze")
+
+
+def import_times(code: str):
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, check=True
+    )
+    times = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+@pytest.mark.parametrize("module", ENTRY_POINTS)
+def test_entry_point_import_budget(module):
+    code = (
+        f"import sys, {module}\n"
+        f"loaded = [name for name in {HEAVY_MODULES!r} "
+        f"if type(sys.modules.get(name)).__name__ not in ('NoneType', '_LazyModule')]\n"
+        f"assert not loaded, loaded"
+    )
+    times = import_times(code)
+    assert not set(HEAVY_MODULES) & set(times)
+    assert times[module] < STARTUP_BUDGET_US
@@ -0,0 +1,59 @@
+import logging
+import pytest
+from src import logging_config
+from src.logging_config import setup_logger, configure_logging, shutdown_logging
+
+
+@pytest.fixture
+def log_file(tmp_path):
+    levels = {name: logging.getLogger(name).level for name in logging_config._file_handlers}
+    yield tmp_path / "logs" / "test.log"
+    configure_logging(use_queue=True)
+    shutdown_logging()
+    for name, level in levels.items():
+        logging.getLogger(name).setLevel(level)
+
+
+def test_setup_logger_no_file_io_until_first_record(log_file):
+    logger = setup_logger("test_lazy", str(log_file))
+    assert not log_file.parent.exists()
+
+    logger.info("Сообщение %s", 1)
+    shutdown_logging()
+    assert "Сообщение 1" in log_file.read_text(encoding="utf-8")
+
+
+def test_configure_logging_level(log_file):
+    logger = setup_logger("test_level", str(log_file), level=logging.DEBUG)
+    configure_logging(level=logging.WARNING)
+    logger.info("Пропущено")
+    logger.warning("Записано")
+    shutdown_logging()
+
+    content = log_file.read_text(encoding="utf-8")
+    assert "Пропущено" not in content
+    assert "Записано" in content
+
+
+def test_configure_logging_synchronous(log_file):
+    logger = setup_logger("test_sync", str(log_file))
+    configure_logging(use_queue=False)
+    logger.info("Синхронная запись")
+    logger.handlers[0].flush()
+    assert "Синхронная запись" in log_file.read_text(encoding="utf-8")
+
+
+def test_logging_continues_after_shutdown(log_file):
+    logger = setup_logger("test_reopen", str(log_file), mode="w")
+    logger.info("До закрытия")
+    shutdown_logging()
+    logger.info("После закрытия")
+    configure_logging(use_queue=False)
+    logger.info("Без очереди")
+    configure_logging(use_queue=True)
+    logger.info("С очередью")
+    shutdown_logging()
+
+    content = log_file.read_text(encoding="utf-8")
+    for message in ("До закрытия", "После закрытия", "Без очереди", "С очередью"):
+        assert message in content
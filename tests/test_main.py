@@ -0,0 +1,85 @@
+import json
+
+import pytest
+
+from src.main import load_jobs, load_transactions, main
+
+
+@pytest.fixture
+def statement_file(tmp_path):
+    file_path = tmp_path / "transactions.json"
+    transactions = [
+        {"Дата операции": "10.12.2024", "Категория": "Фастфуд", "Сумма": 602.0, "Тип": "Списание",
+         "Описание операции": "MOSKVA\\TEREMOK  CAFE", "Кэшбэк": 6.0},
+        {"Дата операции": "05.12.2024", "Категория": "Финансовые операции", "Сумма": 1500.0, "Тип": "Списание",
+         "Описание операции": "Ирина Ш.", "Кэшбэк": None},
+        {"Дата операции": "01.11.2024", "Категория": "Пополнения", "Сумма": 10000.0, "Тип": "Пополнение",
+         "Описание операции": "Между своими счетами", "Кэшбэк": None},
+    ]
+    file_path.write_text(json.dumps(transactions, ensure_ascii=False), encoding="utf-8")
+    return file_path
+
+
+@pytest.fixture
+def jobs_file(tmp_path):
+    file_path = tmp_path / "jobs.json"
+    file_path.write_text(json.dumps({"jobs": [
+        {"name": "cashback", "type": "cashback"},
+        {"name": "piggy_bank", "type": "investment_bank", "limits": [50, 100]},
+        {"name": "teremok", "type": "search", "query": "teremok"},
+        {"name": "transfers", "type": "personal_transfers"},
+        {"name": "fastfood", "type": "spending", "category": "Фастфуд", "start_date": "2024-12-01"},
+        {"type": "events"},
+    ]}, ensure_ascii=False), encoding="utf-8")
+    return file_path
+
+
+def test_load_transactions_adds_service_columns(statement_file):
+    df = load_transactions(str(statement_file))
+    assert df["Кэшбек"].tolist()[0] == 6.0
+    assert df["Сумма операции"].isna().tolist() == [False, False, True]
+
+
+def test_main_runs_jobs(statement_file, jobs_file, tmp_path, capsys):
+    output_dir = tmp_path / "reports"
+    assert main([str(statement_file), "--jobs", str(jobs_file), "--output-dir", str(output_dir), "--workers", "3"]) == 0
+
+    def read(name):
+        return json.loads((output_dir / f"{name}.json").read_text(encoding="utf-8"))
+
+    assert read("cashback") == {"2024-11": {"Пополнения": 0.0}, "2024-12": {"Фастфуд": 6.0, "Финансовые операции": 0.0}}
+    assert read("piggy_bank")["2024-12"] == {"50": 98.0, "100": 198.0}
+    assert [tx["Описание операции"] for tx in read("teremok")] == ["MOSKVA\\TEREMOK  CAFE"]
+    assert [tx["Описание операции"] for tx in read("transfers")] == ["Ирина Ш."]
+    assert read("fastfood")["total_spent"] == 602
+    assert read("05_events")["total_events"] == 3
+    assert "fastfood" in capsys.readouterr().out
+
+
+def test_main_reports_failed_job(statement_file, tmp_path):
+    jobs_file = tmp_path / "jobs.json"
+    jobs_file.write_text(json.dumps([{"name": "bad", "type": "investment_bank", "limits": ["x"]}]), encoding="utf-8")
+    assert main([str(statement_file), "--jobs", str(jobs_file), "--output-dir", str(tmp_path / "out")]) == 1
+
+
+@pytest.mark.parametrize("jobs", [
+    [{"type": "unknown"}],
+    [{"type": "search"}],
+    [{"name": "a", "type": "events"}, {"name": "a", "type": "events"}],
+])
+def test_load_jobs_validation(tmp_path, jobs):
+    jobs_file = tmp_path / "jobs.json"
+    jobs_file.write_text(json.dumps(jobs), encoding="utf-8")
+    with pytest.raises(ValueError):
+        load_jobs(str(jobs_file))
+
+
+def test_main_runs_jobs_in_processes(statement_file, jobs_file, tmp_path):
+    pytest.importorskip("pyarrow")
+    threads_dir, processes_dir = tmp_path / "threads", tmp_path / "processes"
+    assert main([str(statement_file), "--jobs", str(jobs_file), "--output-dir", str(threads_dir)]) == 0
+    assert main([
+        str(statement_file), "--jobs", str(jobs_file), "--output-dir", str(processes_dir), "--processes", "2"
+    ]) == 0
+    for output in sorted(threads_dir.iterdir()):
+        assert (processes_dir / output.name).read_text(encoding="utf-8") == output.read_text(encoding="utf-8")
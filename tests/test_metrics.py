@@ -0,0 +1,82 @@
+import json
+
+import pandas as pd
+import pytest
+
+from src.metrics import (
+    configure_metrics, instrument, metrics_json, metrics_prometheus, metrics_snapshot, reset_metrics, stage
+)
+from src.reports import spending_by_category
+from src.result_cache import configure_result_cache
+from src.services import simple_search_stream, summarize_by_month
+from src.views import events_page
+
+
+@pytest.fixture
+def metrics():
+    configure_metrics(True)
+    configure_result_cache(enabled=False)
+    reset_metrics()
+    yield
+    configure_metrics(False)
+    configure_result_cache(enabled=True)
+    reset_metrics()
+
+
+@pytest.fixture
+def df():
+    return pd.DataFrame({
+        "Дата операции": ["2024-12-01", "2024-12-15", "2025-01-10"],
+        "Категория": ["Продукты", "Продукты", "Фастфуд"],
+        "Сумма": [100.0, 250.0, 600.0],
+    })
+
+
+def test_report_stages_are_recorded(metrics, df):
+    spending_by_category(df, "Продукты", "2024-12-01")
+    snapshot = metrics_snapshot()
+    assert snapshot["reports.spending_by_category"]["calls"] == 1
+    assert snapshot["reports.spending_by_category"]["rows_in"] == 3
+    assert snapshot["reports.spending_by_category.filter"]["rows_out"] == 2
+    for name in ("parse_dates", "aggregate", "serialize"):
+        assert snapshot[f"reports.spending_by_category.{name}"]["seconds_total"] >= 0
+
+    events_page(df)
+    assert metrics_snapshot()["views.events_page.aggregate"]["rows_in"] == 3
+
+
+def test_monthly_summary_is_recorded(metrics, df):
+    dates = pd.to_datetime(df["Дата операции"])
+    summarize_by_month(df.assign(**{"Дата операции": dates, "Кэшбек": 1.0, "Сумма операции": df["Сумма"]}))
+    snapshot = metrics_snapshot()["services.summarize_by_month"]
+    assert (snapshot["calls"], snapshot["rows_in"]) == (1, 3)
+
+
+def test_generator_and_errors_are_recorded(metrics):
+    list(simple_search_stream([{"Категория": "Продукты"}], "прод"))
+    assert metrics_snapshot()["services.simple_search_stream"]["calls"] == 1
+
+    @instrument("test.failing")
+    def failing():
+        raise ValueError
+
+    with pytest.raises(ValueError):
+        failing()
+    assert metrics_snapshot()["test.failing"]["errors"] == 1
+
+
+def test_export_formats(metrics):
+    with stage("test.stage", rows_in=10) as timer:
+        timer.rows_out = 4
+    assert json.loads(metrics_json())["test.stage"]["rows_out"] == 4
+    text = metrics_prometheus()
+    assert '# TYPE finanalyze_stage_calls_total counter' in text
+    assert 'finanalyze_stage_rows_in_total{stage="test.stage"} 10' in text
+
+
+def test_disabled_metrics_record_nothing(df):
+    reset_metrics()
+    with stage("test.stage") as timer:
+        timer.rows_out = 1
+    spending_by_category(df, "Продукты", "2024-12-01")
+    assert metrics_snapshot() == {}
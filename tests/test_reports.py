@@ -1,7 +1,10 @@
 import json
+import math
 import pandas as pd
 import json
-from src.reports import spending_by_category
+from src.reports import spending_by_category, spending_by_category_batch
+from src.transactions_filters import TransactionStore
+from src.utils import normalize_transactions
 
 
 def test_spending_by_category_valid_data():
@@ -64,3 +67,152 @@ def test_spending_by_category_empty_dataframe():
     assert result_data["transactions"] == []
 
 
+def test_spending_by_category_does_not_mutate_dataframe():
+    data = pd.DataFrame({
+        "Дата операции": ["2024-01-01", "2024-01-15", "2024-02-20"],
+        "Категория": ["Еда", "Еда", "Транспорт"],
+        "Сумма": [100, 200, 300]
+    })
+    spending_by_category(data, "Еда", "2024-01-01")
+    assert data["Дата операции"].tolist() == ["2024-01-01", "2024-01-15", "2024-02-20"]
+
+
+def test_spending_by_category_transaction_store():
+    data = pd.DataFrame({
+        "Дата операции": ["2024-01-15", "2024-01-01", "2024-02-20", "2024-05-01"],
+        "Категория": ["Еда", "Еда", "Транспорт", "Еда"],
+        "Сумма": [200, 100, 300, 50]
+    })
+    store = TransactionStore(data)
+    result_data = json.loads(spending_by_category(store, "Еда", "2024-01-01"))
+    expected_data = json.loads(spending_by_category(data, "Еда", "2024-01-01"))
+
+    assert result_data["total_spent"] == expected_data["total_spent"] == 300
+    assert result_data["transactions"] == sorted(expected_data["transactions"], key=lambda tx: tx["Дата операции"])
+
+
+def test_spending_by_category_batch_matches_single_report():
+    data = pd.DataFrame({
+        "Дата операции": ["2024-01-01", "2024-01-15", "2024-02-20", "2024-04-05", "2024-05-01"],
+        "Категория": ["Еда", "Еда", "Транспорт", "Еда", "Транспорт"],
+        "Сумма": [100.1, 200.2, 300, 50, 25.5]
+    })
+    start_dates = ["2024-01-01", "2024-01-08", "2024-02-01", "2024-03-01"]
+    result_data = json.loads(spending_by_category_batch(data, start_dates))
+
+    assert result_data["categories"] == ["Еда", "Транспорт"]
+    assert result_data["start_dates"] == start_dates
+    assert "transactions" not in result_data
+    for i, category in enumerate(result_data["categories"]):
+        for j, start_date in enumerate(start_dates):
+            expected = json.loads(spending_by_category(data, category, start_date))
+            assert result_data["total_spent"][i][j] == expected["total_spent"]
+
+
+def test_spending_by_category_batch_with_transactions():
+    data = pd.DataFrame({
+        "Дата операции": ["2024-01-01", "2024-01-15", "2024-02-20"],
+        "Категория": ["Еда", "Еда", "Транспорт"],
+        "Сумма": [100, 200, 300]
+    })
+    result_data = json.loads(spending_by_category_batch(
+        TransactionStore(data), ["2024-01-10"], categories=["Еда", "Кино"], include_transactions=True
+    ))
+
+    assert result_data["total_spent"] == [[200], [0]]
+    assert result_data["transactions"]["Еда"]["2024-01-10"] == [
+        {"Дата операции": "2024-01-15", "Категория": "Еда", "Сумма": 200}
+    ]
+    assert result_data["transactions"]["Кино"]["2024-01-10"] == []
+
+
+def test_spending_by_category_batch_errors():
+    data = pd.DataFrame({"Дата операции": ["2024-01-01"], "Сумма": [100]})
+    assert "Отсутствуют необходимые колонки" in json.loads(spending_by_category_batch(data, ["2024-01-01"]))["error"]
+
+    data = pd.DataFrame({"Дата операции": ["invalid_date"], "Категория": ["Еда"], "Сумма": [100]})
+    assert "Ошибка преобразования дат" in json.loads(spending_by_category_batch(data, ["2024-01-01"]))["error"]
+
+
+def test_spending_by_category_batch_empty_dataframe():
+    data = pd.DataFrame(columns=["Дата операции", "Категория", "Сумма"])
+    result_data = json.loads(spending_by_category_batch(data, ["2024-01-01"], categories=["Еда"]))
+    assert result_data["total_spent"] == [[0]]
+
+
+def test_spending_by_category_normalized_data():
+    data = pd.DataFrame({
+        "Дата операции": ["01.01.2024", "15.01.2024", "20.02.2024"],
+        "Категория": ["Еда", "Еда", "Транспорт"],
+        "Сумма": ["100", "200.5", "300"],
+        "MCC код": [5411, None, 4111],
+    })
+    result_data = json.loads(spending_by_category(normalize_transactions(data), "Еда", "2024-01-01"))
+
+    assert result_data["total_spent"] == 300
+    transaction = result_data["transactions"][1]
+    assert {key: transaction[key] for key in ("Дата операции", "Категория", "Сумма")} == {
+        "Дата операции": "2024-01-15", "Категория": "Еда", "Сумма": 200.5
+    }
+    assert math.isnan(transaction["MCC код"])
+
+
+def test_spending_by_category_compact_matches_pretty():
+    df = pd.DataFrame({
+        "Дата операции": ["2024-12-01", "2024-12-15", "2025-01-10"],
+        "Категория": ["Продукты", "Продукты", "Фастфуд"],
+        "Сумма": [100.0, 250.5, 600.0],
+        "Описание операции": ["Пятерочка", None, "Теремок"],
+    })
+    pretty = spending_by_category(df, "Продукты", "2024-12-01")
+    compact = spending_by_category(df, "Продукты", "2024-12-01", compact=True)
+    assert "\n" not in compact
+    assert json.loads(compact)["transactions"][1]["Описание операции"] is None
+    assert math.isnan(json.loads(pretty)["transactions"][1]["Описание операции"])
+    expected = json.loads(pretty)
+    expected["transactions"][1]["Описание операции"] = None
+    assert json.loads(compact) == expected
+    assert json.loads(spending_by_category(df, "Такси", "2024-12-01", compact=True))["transactions"] == []
+
+
+def test_spending_by_category_total_is_truncated():
+    # 0.3 + 0.6 + 0.1 дает 0.9999999999999999: дробная часть отбрасывается, как и раньше
+    data = pd.DataFrame({
+        "Дата операции": ["2023-12-31", "2024-01-01", "2024-01-02", "2024-01-03", "2024-01-04"],
+        "Категория": ["Еда", "Еда", "Еда", "Еда", "Транспорт"],
+        "Сумма": [0.1, 0.3, 0.6, 0.1, 299.99],
+    })
+    assert json.loads(spending_by_category(data, "Еда", "2024-01-01"))["total_spent"] == 0
+    assert json.loads(spending_by_category(data, "Транспорт", "2024-01-01"))["total_spent"] == 299
+
+    # Разность накопленных сумм за период с 2024-01-01 дает ровно 1.0,
+    # но пакетный расчет совпадает с одиночным
+    start_dates = ["2023-12-31", "2024-01-01"]
+    for source in (data, TransactionStore(data)):
+        result_data = json.loads(spending_by_category_batch(source, start_dates))
+        expected = [
+            [json.loads(spending_by_category(data, category, start_date))["total_spent"] for start_date in start_dates]
+            for category in ["Еда", "Транспорт"]
+        ]
+        assert result_data["total_spent"] == expected
+        assert result_data["total_spent"][0][1] == 0
+
+
+def test_spending_by_category_pretty_matches_original_output():
+    df = pd.DataFrame({
+        "Дата операции": ["2024-12-01", "2024-12-15", "2025-01-10"],
+        "Категория": ["Продукты", "Продукты", "Фастфуд"],
+        "Сумма": [100.0, 250.5, 600.0],
+        "Кэшбек": [1.0, float("nan"), 6.0],
+    })
+    filtered_df = df.iloc[:2].copy()
+    expected = json.dumps({
+        "category": "Продукты",
+        "total_spent": 350,
+        "start_date": "2024-12-01",
+        "end_date": "2025-03-01",
+        "transactions": filtered_df.to_dict(orient="records"),
+    }, ensure_ascii=False, indent=4)
+
+    assert spending_by_category(df, "Продукты", "2024-12-01") == expected
+    assert '"Кэшбек": NaN' in expected
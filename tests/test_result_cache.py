@@ -0,0 +1,149 @@
+import json
+
+import pandas as pd
+import pytest
+
+from src import result_cache as result_cache_module
+from src.reports import spending_by_category
+from src.result_cache import ResultCache, configure_result_cache, fingerprint, result_cache
+from src.services import analyze_cashback_categories
+from src.transactions_filters import TransactionStore
+from src.views import events_page
+
+
+@pytest.fixture(autouse=True)
+def clean_cache():
+    result_cache.clear()
+    yield
+    configure_result_cache(enabled=True)
+    result_cache.directory = None
+    result_cache.maxsize = result_cache_module.DEFAULT_MAXSIZE
+    result_cache.clear()
+
+
+@pytest.fixture
+def df():
+    return pd.DataFrame({
+        "Дата операции": ["2024-12-01", "2024-12-15", "2025-01-10"],
+        "Категория": ["Продукты", "Продукты", "Фастфуд"],
+        "Сумма": [100.0, 250.0, 600.0],
+    })
+
+
+def test_fingerprint_changes_when_dataframe_is_mutated(df):
+    before = fingerprint(df)
+    assert fingerprint(df.copy()) == before
+    df.loc[0, "Сумма"] = 101.0
+    assert fingerprint(df) != before
+    with pytest.raises(TypeError):
+        fingerprint(iter([1, 2]))
+
+
+def test_memoized_report_hits_on_store(df):
+    store = TransactionStore(df)
+    first = spending_by_category(store, "Продукты", "2024-12-01")
+    assert spending_by_category(store, "Продукты", "2024-12-01") == first
+    assert result_cache.stats()["hits"] == 1
+
+    # Новое хранилище с измененными данными получает новый отпечаток
+    df.loc[0, "Сумма"] = 1000.0
+    result = json.loads(spending_by_category(TransactionStore(df), "Продукты", "2024-12-01"))
+    assert result["total_spent"] == 1250
+    assert result_cache.stats()["misses"] == 2
+
+
+def test_memoized_report_hits_and_stays_correct_after_mutation(df):
+    first = spending_by_category(df, "Продукты", "2024-12-01")
+    assert spending_by_category(df, "Продукты", "2024-12-01") == first
+    assert result_cache.stats()["hits"] == 1
+
+    df.loc[0, "Сумма"] = 1000.0
+    result = json.loads(spending_by_category(df, "Продукты", "2024-12-01"))
+    assert result["total_spent"] == 1250
+    assert result_cache.stats()["misses"] == 2
+
+
+@pytest.mark.parametrize("mutate", [
+    lambda df: df.loc.__setitem__((1, "Категория"), "Фастфуд"),
+    lambda df: df.__setitem__("Сумма", df["Сумма"] * 2),
+    lambda df: df.drop(index=2, inplace=True),
+    lambda df: setattr(df, "index", [5, 6, 7]),
+])
+def test_fingerprint_detects_mutation_without_rehashing(df, mutate, monkeypatch):
+    before = fingerprint(df)
+    hashed = []
+    original = result_cache_module._hash_frame
+    monkeypatch.setattr(result_cache_module, "_hash_frame", lambda value: hashed.append(1) or original(value))
+    assert fingerprint(df) == before
+    assert hashed == []
+
+    mutate(df)
+    assert fingerprint(df) != before
+    assert fingerprint(df) == original(df)
+    assert len(hashed) == 1
+
+
+def test_positional_and_keyword_arguments_share_key(df):
+    spending_by_category(df, "Продукты", "2024-12-01")
+    spending_by_category(df, "Продукты", start_date="2024-12-01", compact=False)
+    spending_by_category(df=df, category="Продукты", start_date="2024-12-01")
+    assert result_cache.stats() == {"hits": 2, "misses": 1, "evictions": 0, "size": 1, "maxsize": 128}
+
+
+def test_store_frame_cannot_change_cached_data(df):
+    store = TransactionStore(df)
+    first = spending_by_category(store, "Продукты", "2024-12-01")
+    frame = store.frame
+    frame.loc[0, "Сумма"] = 1000.0
+    assert spending_by_category(store, "Продукты", "2024-12-01") == first
+    assert result_cache.stats()["hits"] == 1
+
+
+def test_memoized_store_and_views(df):
+    store = TransactionStore(df)
+    events_page(store)
+    events_page(store)
+    events_page(df)
+    assert result_cache.stats()["hits"] == 1
+    assert json.loads(events_page(df))["total_events"] == 3
+    assert result_cache.stats()["hits"] == 2
+
+
+def test_memoized_dict_result_is_copied():
+    frame = pd.DataFrame([{"Дата операции": "01.12.2024", "Категория": "Продукты", "Кэшбек": 5}])
+    result = analyze_cashback_categories(frame, 2024, 12)
+    result["Продукты"] = -1
+    assert analyze_cashback_categories(frame, 2024, 12) == {"Продукты": 5.0}
+    assert result_cache.stats()["hits"] == 1
+
+
+def test_list_arguments_bypass_cache():
+    # Список транзакций не сериализуется при каждом вызове ради ключа
+    transactions = [{"Дата операции": "01.12.2024", "Категория": "Продукты", "Кэшбек": 5}]
+    analyze_cashback_categories(transactions, 2024, 12)
+    analyze_cashback_categories(transactions, 2024, 12)
+    assert len(result_cache) == 0
+
+
+def test_result_cache_lru_eviction():
+    cache = ResultCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.stats() == {"hits": 2, "misses": 1, "evictions": 1, "size": 2, "maxsize": 2}
+
+
+def test_result_cache_disk_backing(tmp_path):
+    ResultCache(directory=str(tmp_path)).put("key", {"a": 1})
+    assert ResultCache(directory=str(tmp_path)).get("key") == {"a": 1}
+
+
+def test_disabled_cache_calls_function(df):
+    configure_result_cache(enabled=False)
+    spending_by_category(df, "Продукты", "2024-12-01")
+    spending_by_category(df, "Продукты", "2024-12-01")
+    assert result_cache.stats()["hits"] == 0
+    assert len(result_cache) == 0
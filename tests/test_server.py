@@ -0,0 +1,126 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+from src.server import AnalyticsServer
+
+
+def write_statement(file_path, transactions):
+    file_path.write_text(json.dumps(transactions, ensure_ascii=False), encoding="utf-8")
+
+
+TRANSACTIONS = [
+    {"Дата операции": "10.12.2024", "Категория": "Фастфуд", "Сумма": 602.0, "Тип": "Списание",
+     "Описание операции": "MOSKVA\\TEREMOK  CAFE", "Кэшбэк": 6.0},
+    {"Дата операции": "05.12.2024", "Категория": "Супермаркеты", "Сумма": 1500.0, "Тип": "Списание",
+     "Описание операции": "Пятёрочка", "Кэшбэк": 15.0},
+]
+
+
+async def http_get(port, target, method="GET"):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"{method} {target} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode("utf-8"))
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, body = response.split(b"\r\n\r\n", 1)
+    return int(head.split()[1]), json.loads(body.decode("utf-8"))
+
+
+@pytest.fixture
+def statement_file(tmp_path):
+    file_path = tmp_path / "transactions.json"
+    write_statement(file_path, TRANSACTIONS)
+    return file_path
+
+
+def run_with_server(statement_file, scenario, processes=None):
+    async def runner():
+        server = AnalyticsServer(str(statement_file), port=0, reload_interval=None, compact=True, processes=processes)
+        await server.start()
+        try:
+            return await scenario(server)
+        finally:
+            await server.stop()
+
+    return asyncio.run(runner())
+
+
+def test_endpoints(statement_file):
+    async def scenario(server):
+        return await asyncio.gather(
+            http_get(server.port, "/events"),
+            http_get(server.port, "/search?query=teremok"),
+            http_get(server.port, "/cashback"),
+            http_get(
+                server.port, "/spending?category=%D0%A4%D0%B0%D1%81%D1%82%D1%84%D1%83%D0%B4&start_date=2024-12-01"
+            ),
+        )
+
+    events, search, cashback, spending = run_with_server(statement_file, scenario)
+    assert events == (200, {"total_events": 2, "categories": {"Фастфуд": 1, "Супермаркеты": 1}})
+    assert search[0] == 200 and [tx["Описание операции"] for tx in search[1]] == ["MOSKVA\\TEREMOK  CAFE"]
+    assert cashback == (200, {"2024-12": {"Супермаркеты": 15.0, "Фастфуд": 6.0}})
+    assert spending[0] == 200 and spending[1]["total_spent"] == 602
+
+
+@pytest.mark.parametrize("method, target, status", [
+    ("GET", "/unknown", 404),
+    ("GET", "/search", 400),
+    ("POST", "/events", 405),
+    ("GET", "/spending?category=x&start_date=2024-13-01", 400),
+])
+def test_errors(statement_file, method, target, status):
+    async def scenario(server):
+        return await http_get(server.port, target, method)
+
+    code, body = run_with_server(statement_file, scenario)
+    assert code == status and "error" in body
+
+
+def test_reload_on_change(statement_file):
+    async def scenario(server):
+        before = await http_get(server.port, "/health")
+        old_data = server.data
+        write_statement(statement_file, TRANSACTIONS[:1])
+        os.utime(statement_file, ns=(0, 1))
+        reloaded = await server.reload_if_changed()
+        unchanged = await server.reload_if_changed()
+        after = await http_get(server.port, "/events")
+        return before, old_data, reloaded, unchanged, after
+
+    before, old_data, reloaded, unchanged, after = run_with_server(statement_file, scenario)
+    assert before[1]["transactions"] == 2
+    assert reloaded and not unchanged
+    assert len(old_data.frame) == 2
+    assert after[1]["total_events"] == 1
+
+
+def test_reload_keeps_data_on_broken_file(statement_file):
+    async def scenario(server):
+        statement_file.write_text("[{", encoding="utf-8")
+        reloaded = await server.reload_if_changed()
+        return reloaded, await http_get(server.port, "/health")
+
+    reloaded, health = run_with_server(statement_file, scenario)
+    assert not reloaded
+    assert health[1]["transactions"] == 2
+
+
+def test_process_pool(statement_file):
+    pytest.importorskip("pyarrow")
+
+    async def scenario(server):
+        first = await asyncio.gather(http_get(server.port, "/events"), http_get(server.port, "/cashback"))
+        old_pool = server._process_pool
+        write_statement(statement_file, TRANSACTIONS[:1])
+        os.utime(statement_file, ns=(0, 1))
+        await server.reload_if_changed()
+        return first, old_pool is not server._process_pool, await http_get(server.port, "/events")
+
+    (events, cashback), replaced, after = run_with_server(statement_file, scenario, processes=2)
+    assert events == (200, {"total_events": 2, "categories": {"Фастфуд": 1, "Супермаркеты": 1}})
+    assert cashback == (200, {"2024-12": {"Супермаркеты": 15.0, "Фастфуд": 6.0}})
+    assert replaced and after[1]["total_events"] == 1
@@ -1,6 +1,13 @@
+import math
+import re
 import pytest
 import json
-from src.services import analyze_cashback_categories, investment_bank, simple_search, filter_personal_transfers
+import pandas as pd
+from src.services import (
+    analyze_cashback_categories, analyze_cashback_by_month, investment_bank, investment_bank_by_month, simple_search,
+    filter_personal_transfers, TransactionSearchIndex, simple_search_stream, classify_transfers, TransferRule,
+    ranked_search, trigram_similarity,
+)
 
 def test_analyze_cashback_categories_valid_data():
     transactions = [
@@ -50,6 +57,86 @@ def test_analyze_cashback_categories_empty_transactions():
     result = analyze_cashback_categories(transactions, 2024, 12)
     assert result == {}
 
+
+def test_analyze_cashback_categories_dataframe():
+    data = pd.DataFrame([
+        {"Дата операции": "15.12.2024", "Категория": "Техника", "Кэшбек": "+74.5"},
+        {"Дата операции": "18.12.2024", "Категория": "Фастфуд", "Кэшбек": 30},
+        {"Дата операции": "17.12.2024", "Категория": "Фастфуд", "Кэшбек": "+15.5$"},
+        {"Дата операции": "25.11.2024", "Категория": "Продукты", "Кэшбек": "+23.5"},
+    ])
+    result = analyze_cashback_categories(data, 2024, 12)
+    assert result == {"Техника": 74.5, "Фастфуд": 30.0}
+    assert list(data.columns) == ["Дата операции", "Категория", "Кэшбек"]
+
+
+def test_analyze_cashback_categories_parsed_dates():
+    data = pd.DataFrame({
+        "Дата операции": pd.to_datetime(["2024-12-15", "2024-12-18", "2024-11-25"]),
+        "Категория": ["Техника", "Фастфуд", "Продукты"],
+        "Кэшбек": [74.5, None, 23.5],
+    })
+    result = analyze_cashback_categories(data, 2024, 12)
+    assert result == {"Техника": 74.5, "Фастфуд": 0.0}
+
+
+def test_analyze_cashback_categories_missing_category():
+    transactions = [
+        {"Дата операции": "15.12.2024", "Кэшбек": "+10"},
+        {"Категория": "Техника", "Кэшбек": "+5"},
+    ]
+    result = analyze_cashback_categories(transactions, 2024, 12)
+    assert result == {"Неизвестная категория": 10.0}
+
+
+def test_analyze_cashback_categories_empty_values():
+    # Как в исходной версии: None категория остается ключом None, NaN кешбэк дает NaN
+    transactions = [
+        {"Дата операции": "15.12.2024", "Категория": None, "Кэшбек": "+10"},
+        {"Дата операции": "15.12.2024", "Кэшбек": "+1"},
+        {"Дата операции": "16.12.2024", "Категория": "Техника", "Кэшбек": float("nan")},
+        {"Дата операции": "17.12.2024", "Категория": "Техника", "Кэшбек": 5},
+        {"Дата операции": "17.12.2024", "Категория": "Фастфуд", "Кэшбек": None},
+    ]
+    result = analyze_cashback_categories(transactions, 2024, 12)
+    assert list(result) == [None, "Неизвестная категория", "Техника", "Фастфуд"]
+    assert result[None] == 10.0 and result["Неизвестная категория"] == 1.0 and result["Фастфуд"] == 0.0
+    assert math.isnan(result["Техника"])
+
+
+def test_analyze_cashback_by_month_range():
+    transactions = [
+        {"Дата операции": "15.12.2024", "Категория": "Техника", "Кэшбек": "+74.5"},
+        {"Дата операции": "18.12.2024", "Категория": "Фастфуд", "Кэшбек": "+30"},
+        {"Дата операции": "25.11.2024", "Категория": "Продукты", "Кэшбек": "+23.5"},
+        {"Дата операции": "15.11.2024", "Категория": "Продукты", "Кэшбек": "+40"},
+        {"Дата операции": "10.10.2024", "Категория": "Техника", "Кэшбек": "+5"},
+        {"Дата операции": "10.01.2025", "Категория": "Техника", "Кэшбек": "+7"},
+    ]
+    result = analyze_cashback_by_month(transactions, "2024-11", "2024-12")
+    assert result == {
+        "2024-11": {"Продукты": 63.5},
+        "2024-12": {"Техника": 74.5, "Фастфуд": 30.0},
+    }
+    assert list(result) == ["2024-11", "2024-12"]
+
+
+def test_analyze_cashback_by_month_matches_single_month():
+    transactions = [
+        {"Дата операции": "15.12.2024", "Категория": "Техника", "Кэшбек": "+74.5"},
+        {"Дата операции": "25.11.2024", "Категория": "Продукты", "Кэшбек": "150 рублей"},
+        {"Дата операции": "10.01.2025", "Категория": "Техника", "Кэшбек": "+7"},
+    ]
+    by_month = analyze_cashback_by_month(transactions)
+    assert list(by_month) == ["2024-11", "2024-12", "2025-01"]
+    assert by_month["2024-11"] == analyze_cashback_categories(transactions, 2024, 11)
+    assert by_month["2025-01"] == analyze_cashback_categories(transactions, 2025, 1)
+
+
+def test_analyze_cashback_by_month_invalid_month():
+    with pytest.raises(ValueError):
+        analyze_cashback_by_month([{"Дата операции": "15.12.2024"}], "12.2024")
+
 def test_investment_bank_valid_data():
     transactions = [
         {"Дата операции": "2024-12-01", "Сумма операции": "174.5"},
@@ -96,6 +183,39 @@ def test_investment_bank_partial_matching_data():
     result = investment_bank("2024-12", transactions, 100)
     assert result == pytest.approx(142.18, 0.01)
 
+
+def test_investment_bank_dataframe():
+    data = pd.DataFrame({
+        "Дата операции": pd.to_datetime(["2024-12-01", "2024-12-15", "2024-11-01"]),
+        "Сумма операции": [174.5, 49.99, 200.0],
+    })
+    result = investment_bank("2024-12", data, 100)
+    assert result == pytest.approx(75.51, 0.01)
+
+
+def test_investment_bank_by_month_matrix():
+    transactions = [
+        {"Дата операции": "2024-12-01", "Сумма операции": "174.5"},
+        {"Дата операции": "2024-12-15", "Сумма операции": "49.99"},
+        {"Дата операции": "2024-12-20", "Сумма операции": "333.33"},
+        {"Дата операции": "2024-11-01", "Сумма операции": "200.00"},
+        {"Дата операции": "2024-10-01", "Сумма операции": ""},
+        {"Дата операции": "12-01-2024", "Сумма операции": "100.00"},
+    ]
+    result = investment_bank_by_month(transactions, [10, 50, 100], "2024-11", "2024-12")
+    assert list(result.index) == ["2024-11", "2024-12"]
+    assert list(result.columns) == [10, 50, 100]
+    for month in result.index:
+        for limit in result.columns:
+            assert result.loc[month, limit] == pytest.approx(investment_bank(month, transactions, limit))
+    assert result.loc["2024-12", 100] == pytest.approx(142.18, 0.01)
+
+
+def test_investment_bank_by_month_empty_transactions():
+    result = investment_bank_by_month([], [10, 50])
+    assert result.empty
+    assert list(result.columns) == [10, 50]
+
 def test_simple_search_full_match():
     transactions = [
         {"Описание операции": "MOSKVA\OZON RU", "Категория": "Маркетплейсы", "Тип": "Списание", "Комментарий": ""},
@@ -157,13 +277,113 @@ def test_simple_search_empty_query():
     assert len(result_data) == 2
 
 
+def test_search_index_matches_simple_search():
+    transactions = [
+        {"Описание операции": "MOSKVA\\OZON RU", "Категория": "Маркетплейсы", "Тип": "Списание", "Комментарий": ""},
+        {"Описание операции": "Вход. перевод от клиента Альфа-Банка", "Категория": "Пополнения",
+         "Тип": "Пополнение", "Комментарий": "Возврат средств"},
+        {"Описание операции": "Яндекс Такси", "Категория": "Такси", "Тип": "Списание"},
+    ]
+    index = TransactionSearchIndex(transactions)
+    for query in ["", "о", "оз", "ozon", "ПОПОЛН", "такси", "списание", "альфа-банка", "метро"]:
+        assert simple_search(index, query) == simple_search(transactions, query)
+
+
+def test_search_index_add():
+    index = TransactionSearchIndex([
+        {"Описание операции": "MOSKVA\\OZON RU", "Категория": "Маркетплейсы", "Тип": "Списание", "Комментарий": ""},
+    ])
+    assert index.search("такси") == []
+
+    new_transaction = {"Описание операции": "Яндекс Такси", "Категория": "Такси", "Тип": "Списание"}
+    index.add([new_transaction])
+    assert len(index) == 2
+    assert index.search("такси") == [new_transaction]
+    assert len(index.search("списание")) == 2
+
+
+@pytest.fixture
+def merchants():
+    return [
+        {"Дата операции": "01.12.2024", "Описание операции": "MOSKVA\\TEREMOK  CAFE", "Категория": "Фастфуд",
+         "Тип": "Списание"},
+        {"Дата операции": "15.12.2024", "Описание операции": "MOSKVA\\TEREMOK  CAFE", "Категория": "Фастфуд",
+         "Тип": "Списание"},
+        {"Дата операции": "10.12.2024", "Описание операции": "Moskovskaya o\\PYATEROCHKA 24",
+         "Категория": "Супермаркеты", "Тип": "Списание", "Комментарий": "продукты к ужину"},
+        {"Дата операции": "05.12.2024", "Описание операции": "Яндекс Такси", "Категория": "Такси", "Тип": "Списание"},
+        {"Описание операции": "Teremok", "Категория": "Фастфуд", "Тип": "Списание"},
+    ]
+
+
+def test_trigram_similarity():
+    assert trigram_similarity("teremok", "teremok") == 1.0
+    assert trigram_similarity("teremk", "teremok") == pytest.approx(0.5)
+    assert trigram_similarity("метро", "teremok") == 0.0
+
+
+@pytest.mark.parametrize("query, mode, expected", [
+    # Точные совпадения ранжируются по дате: свежие выше, без даты - в конце
+    ("teremok", "and", ["15.12.2024", "01.12.2024", None]),
+    ("TEREMK", "and", ["15.12.2024", "01.12.2024", None]),
+    ("pyaterocka ужин", "and", ["10.12.2024"]),
+    ("teremok такси", "and", []),
+    ("teremok такси", "or", ["15.12.2024", "05.12.2024", "01.12.2024", None]),
+    ("такси cafe", "or", ["15.12.2024", "05.12.2024", "01.12.2024"]),
+])
+def test_ranked_search(merchants, query, mode, expected):
+    result = json.loads(ranked_search(merchants, query, top_k=4, mode=mode))
+    assert [tx.get("Дата операции") for tx in result] == expected
+    assert ranked_search(TransactionSearchIndex(merchants), query, top_k=4, mode=mode) == json.dumps(
+        result, ensure_ascii=False, indent=4
+    )
+
+
+def test_ranked_search_relevance_before_recency(merchants):
+    index = TransactionSearchIndex(merchants)
+    ranked = index.ranked_search("teremok cafe", top_k=10, mode="or")
+    assert [round(relevance, 2) for relevance, _ in ranked] == [1.0, 1.0, 0.5]
+    assert ranked[0][1]["Дата операции"] == "15.12.2024"
+
+
+def test_ranked_search_top_k_and_options(merchants):
+    assert len(json.loads(ranked_search(merchants, "списание", top_k=2))) == 2
+    assert json.loads(ranked_search(merchants, "teremk", fuzzy=False)) == []
+    assert json.loads(ranked_search(merchants, "teremok", top_k=0)) == []
+    assert json.loads(ranked_search(merchants, "   ")) == []
+    with pytest.raises(ValueError):
+        ranked_search(merchants, "teremok", mode="xor")
+
+
+def test_simple_search_stream_matches_simple_search():
+    transactions = [
+        {"Описание операции": "Яндекс Такси", "Категория": "Такси", "Тип": "Списание", "Комментарий": ""},
+        {"Описание операции": "Ситимобил", "Категория": "Такси", "Тип": "Списание", "Комментарий": ""},
+        {"Описание операции": "Пятерочка", "Категория": "Продукты", "Тип": "Списание", "Комментарий": ""},
+    ]
+    result = "".join(simple_search_stream(transactions, "такси"))
+    assert result == simple_search(transactions, "такси")
+
+
+def test_simple_search_stream_pagination():
+    transactions = [
+        {"Описание операции": f"Такси {i}", "Категория": "Такси", "Тип": "Списание", "Комментарий": ""}
+        for i in range(5)
+    ]
+    index = TransactionSearchIndex(transactions)
+    result = "".join(simple_search_stream(index, "такси", offset=1, limit=2, compact=True))
+    assert "\n" not in result
+    assert json.loads(result) == transactions[1:3]
+
+
 def test_filter_personal_transfers_valid_data():
     transactions = [
         {"Описание операции": "Иван М.", "Комментарий": "", "Тип": "Списание", "Категория": "Финансовые операции"},
         {"Описание операции": "Анастасия О.", "Комментарий": "Перевод денежных средств", "Тип": "Списание",
          "Категория": "Финансовые операции"},
         {"Описание операции": "Руслан К.", "Комментарий": "", "Тип": "Списание", "Категория": "Финансовые операции"},
-        {"Описание операции": "Александр К.", "Комментарий": "", "Тип": "Пополнение", "Категория": "Финансовые операции"},
+        {"Описание операции": "Александр К.", "Комментарий": "", "Тип": "Пополнение",
+         "Категория": "Финансовые операции"},
     ]
     result = filter_personal_transfers(transactions)
     expected = [
@@ -176,7 +396,6 @@ def test_filter_personal_transfers_valid_data():
            sorted(expected, key=lambda x: (x["Описание операции"], x["Комментарий"]))
 
 
-
 def test_filter_personal_transfers_empty_data():
     transactions = []
     result = filter_personal_transfers(transactions)
@@ -193,13 +412,54 @@ def test_filter_personal_transfers_no_valid_type():
     assert result == []
 
 
+def test_filter_personal_transfers_dataframe():
+    data = pd.DataFrame([
+        {"Описание операции": "Иван М.", "Комментарий": None, "Тип": "Списание", "Категория": "Финансовые операции"},
+        {"Описание операции": "Анастасия О.", "Комментарий": "Перевод", "Тип": "Списание",
+         "Категория": "Финансовые операции"},
+        {"Описание операции": "Александр К.", "Комментарий": "", "Тип": "Пополнение",
+         "Категория": "Финансовые операции"},
+    ], index=[10, 20, 30])
+    result = filter_personal_transfers(data)
+    assert isinstance(result, pd.DataFrame)
+    assert list(result.index) == [10]
 
 
+def test_classify_transfers_default_rules():
+    transactions = [
+        {"Описание операции": "Иван М.", "Комментарий": "", "Тип": "Списание", "Категория": "Финансовые операции"},
+        {"Описание операции": "Перевод по номеру +7 999 123-45-67", "Тип": "Списание", "Категория": "Переводы"},
+        {"Описание операции": "Перевод на карту 458443******0034", "Тип": "Списание", "Категория": "Переводы"},
+        {"Описание операции": "Пятерочка", "Тип": "Списание", "Категория": "Продукты"},
+    ]
+    result = classify_transfers(transactions)
+    assert list(result.columns) == ["personal", "phone", "card"]
+    assert result["personal"].tolist() == [True, False, False, False]
+    assert result["phone"].tolist() == [False, True, False, False]
+    assert result["card"].tolist() == [False, False, True, False]
 
 
-
-
-
-
-
-
+def test_classify_transfers_custom_rule():
+    rule = TransferRule(name="sbp", pattern=re.compile(r"^СБП"), types=None, field="Комментарий")
+    transactions = [
+        {"Описание операции": "Иван М.", "Комментарий": "СБП перевод", "Тип": "Пополнение"},
+        {"Описание операции": "Иван М.", "Комментарий": "", "Тип": "Списание"},
+    ]
+    result = classify_transfers(transactions, [rule])
+    assert result["sbp"].tolist() == [True, False]
+
+
+def test_classify_transfers_duplicate_index():
+    df = pd.DataFrame(
+        {
+            "Описание операции": ["Иван М.", "Пятерочка"],
+            "Комментарий": ["", ""],
+            "Тип": ["Списание", "Списание"],
+            "Категория": ["Финансовые операции", "Финансовые операции"],
+        },
+        index=[0, 0],
+    )
+    result = classify_transfers(df)
+    assert list(result.index) == [0, 0]
+    assert result["personal"].tolist() == [True, False]
+    assert len(filter_personal_transfers(df)) == 1
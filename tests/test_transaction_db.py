@@ -0,0 +1,165 @@
+import json
+
+import pandas as pd
+import pytest
+
+from src.file_readers import SOURCE_COLUMN
+from src.services import (
+    analyze_cashback_by_month, analyze_cashback_categories, investment_bank, investment_bank_by_month,
+    summarize_by_month,
+)
+from src.transaction_db import TransactionDatabase, transaction_hashes
+from src.utils import add_service_columns
+from src.views import events_page
+
+
+def make_export(rows):
+    df = pd.DataFrame(rows, columns=["Дата операции", "Описание операции", "Сумма", "Категория", "Кэшбек", "Статус"])
+    df["Дата операции"] = pd.to_datetime(df["Дата операции"], format="%d.%m.%Y")
+    return df
+
+
+@pytest.fixture
+def december():
+    return make_export([
+        ["10.12.2024", "Пятерочка", 150.5, "Продукты", 1.5, "OK"],
+        ["10.12.2024", "Пятерочка", 150.5, "Продукты", 1.5, "OK"],
+        ["28.11.2024", "Теремок", 602.0, "Фастфуд", 6.0, "OK"],
+    ])
+
+
+@pytest.fixture
+def database(tmp_path):
+    with TransactionDatabase(str(tmp_path / "transactions.db")) as db:
+        yield db
+
+
+def test_transaction_hashes_keep_identical_operations_apart(december):
+    hashes = transaction_hashes(december)
+    assert len(set(hashes)) == 3
+    # Хэш не зависит от статуса и типа суммы
+    changed = december.assign(Статус="FAILED", Сумма=december["Сумма"].astype(object))
+    assert transaction_hashes(changed) == hashes
+
+
+def test_import_appends_only_new_rows(database, december):
+    first = database.import_frame(december, "december.xlsx")
+    assert (first.added, first.skipped, first.months) == (3, 0, ["2024-11", "2024-12"])
+    database.mark_clean()
+
+    january = make_export([
+        ["05.01.2025", "Лента", 300.0, "Продукты", 3.0, "OK"],
+        ["10.12.2024", "Пятерочка", 150.5, "Продукты", 1.5, "OK"],
+        ["10.12.2024", "Пятерочка", 150.5, "Продукты", 1.5, "OK"],
+        ["10.12.2024", "Пятерочка", 150.5, "Продукты", 1.5, "OK"],
+    ])
+    second = database.import_frame(january, "january.xlsx")
+    assert (second.added, second.skipped) == (2, 2)
+    assert database.dirty_months() == ["2024-12", "2025-01"]
+    assert len(database) == 5
+
+    repeated = database.import_frame(january, "january.xlsx")
+    assert repeated.added == 0
+
+
+def test_load_dirty_months_for_recompute(database, december):
+    database.import_frame(december, "december.xlsx")
+    df = database.load(["2024-12"])
+    assert len(df) == 2
+    assert pd.api.types.is_datetime64_any_dtype(df["Дата операции"])
+    assert set(df[SOURCE_COLUMN]) == {"december.xlsx"}
+    assert analyze_cashback_by_month(df, "2024-12", "2024-12") == {"2024-12": {"Продукты": 3.0}}
+
+    database.mark_clean(["2024-12"])
+    assert database.dirty_months() == ["2024-11"]
+
+
+def test_database_persists_between_sessions(tmp_path, december):
+    path = str(tmp_path / "transactions.db")
+    with TransactionDatabase(path) as db:
+        db.import_frame(december)
+    with TransactionDatabase(path) as db:
+        assert db.import_frame(december).added == 0
+        pd.testing.assert_frame_equal(
+            db.load()[december.columns], december, check_dtype=False
+        )
+
+
+def make_statement(rows):
+    df = pd.DataFrame(rows, columns=["Дата операции", "Описание операции", "Сумма", "Категория", "Тип", "Кэшбэк"])
+    df["Дата операции"] = pd.to_datetime(df["Дата операции"], format="%d.%m.%Y %H:%M")
+    return df
+
+
+@pytest.fixture
+def statement():
+    return make_statement([
+        ["28.11.2024 12:00", "Теремок", 602.0, "Фастфуд", "Списание", 6.0],
+        ["01.12.2024 09:15", "Пятерочка", 150.5, "Супермаркеты", "Списание", 1.5],
+        ["03.12.2024 18:40", "Пятерочка", 99.0, "Супермаркеты", "Списание", None],
+        ["05.12.2024 10:00", "Зарплата", 50000.0, "Пополнения", "Пополнение", None],
+        ["10.12.2024 20:00", "Без категории", 37.0, None, "Списание", 0.5],
+        [None, "Без даты", 10.0, "Фастфуд", "Списание", None],
+    ])
+
+
+def test_monthly_summary_is_updated_incrementally(database, statement):
+    database.import_frame(statement.iloc[:3], "first.xlsx")
+    database.import_frame(statement, "second.xlsx")
+
+    summary = database.monthly_summary()
+    expected = summarize_by_month(add_service_columns(statement))
+    pd.testing.assert_frame_equal(summary, expected, check_dtype=False)
+
+    database.rebuild_summary()
+    pd.testing.assert_frame_equal(database.monthly_summary(), expected, check_dtype=False)
+
+
+def test_monthly_summary_period(database, statement):
+    database.import_frame(statement, "statement.xlsx")
+    december = database.monthly_summary("2024-12-01", "2025-01-01")
+    assert december["month"].unique().tolist() == ["2024-12"]
+    assert december["rows"].sum() == 4
+
+    # Период не по границам месяцев считается по исходным строкам
+    partial = database.monthly_summary("2024-12-02", "2024-12-06")
+    assert partial["rows"].sum() == 2
+    assert partial["amount_total"].sum() == 50099.0
+
+
+def test_services_answer_from_summary(database, statement, monkeypatch):
+    database.import_frame(statement, "statement.xlsx")
+    raw = add_service_columns(database.load())
+    expected_events = json.loads(events_page(raw))
+    expected_cashback = analyze_cashback_categories(raw, 2024, 12)
+    expected_savings = investment_bank_by_month(raw, [10, 100])
+    expected_bank = investment_bank("2024-12", raw, 100)
+
+    # Ответы по сводке не читают транзакции из базы
+    monkeypatch.setattr(database, "load", lambda months=None: pytest.fail("load"))
+    assert json.loads(events_page(database)) == expected_events
+    assert analyze_cashback_categories(database, 2024, 12) == pytest.approx(expected_cashback)
+    assert analyze_cashback_by_month(database) == analyze_cashback_by_month(raw)
+    pd.testing.assert_frame_equal(investment_bank_by_month(database, [10, 100]), expected_savings, check_dtype=False)
+    assert investment_bank("2024-12", database, 100) == expected_bank
+    assert expected_bank == 49.5 + 1.0 + 63.0
+
+
+def test_services_fall_back_to_raw_rows(database, statement):
+    database.import_frame(statement, "statement.xlsx")
+    raw = add_service_columns(database.load())
+    assert investment_bank("2024-12", database, 7) == investment_bank("2024-12", raw, 7)
+    assert investment_bank("2024-12-01", database, 100) == investment_bank("2024-12-01", raw, 100) == 49.5
+    pd.testing.assert_frame_equal(investment_bank_by_month(database, [7]), investment_bank_by_month(raw, [7]))
+
+
+def test_services_accept_float_limits(database, statement, monkeypatch):
+    database.import_frame(statement, "statement.xlsx")
+    raw = add_service_columns(database.load())
+    expected_savings = investment_bank_by_month(raw, [10.0, 50])
+    expected_bank = investment_bank("2024-12", raw, 50.0)
+
+    # Целые пределы типа float берутся из сводки, как и int
+    monkeypatch.setattr(database, "load", lambda months=None: pytest.fail("load"))
+    assert investment_bank("2024-12", database, 50.0) == expected_bank
+    pd.testing.assert_frame_equal(investment_bank_by_month(database, [10.0, 50]), expected_savings, check_dtype=False)
@@ -0,0 +1,163 @@
+import pytest
+import pandas as pd
+
+from src.services import PERSONAL_TRANSFER_RULE, PHONE_TRANSFER_RULE
+from src.transaction_db import TransactionDatabase
+from src.transactions_filters import (
+    SQLiteTransactionFilter, TransactionFilter, TransactionStore, compile_filter, filter_transactions,
+)
+
+
+@pytest.fixture
+def transactions():
+    return pd.DataFrame({
+        "Дата операции": ["2024-02-20", "2024-01-15", "2024-01-01", "2024-03-10"],
+        "Категория": ["Транспорт", "Еда", "Еда", "Еда"],
+        "Сумма": [300, 200, 100, 400],
+    })
+
+
+def test_transaction_store_sorted_by_date(transactions):
+    store = TransactionStore(transactions)
+    assert len(store) == 4
+    assert store.frame["Дата операции"].is_monotonic_increasing
+    assert isinstance(store.frame["Категория"].dtype, pd.CategoricalDtype)
+    assert transactions["Дата операции"].tolist()[0] == "2024-02-20"
+
+
+def test_transaction_store_query_category_and_range(transactions):
+    store = TransactionStore(transactions)
+    result = store.query("Еда", "2024-01-01", "2024-03-10")
+    assert result["Сумма"].tolist() == [100, 200]
+
+
+def test_transaction_store_query_without_category(transactions):
+    store = TransactionStore(transactions)
+    result = store.query(start="2024-01-15")
+    assert result["Сумма"].tolist() == [200, 300, 400]
+
+
+def test_transaction_store_unknown_category(transactions):
+    store = TransactionStore(transactions)
+    assert store.query("Кино").empty
+
+
+def test_transaction_store_invalid_dates():
+    data = pd.DataFrame({"Дата операции": ["invalid_date"], "Категория": ["Еда"], "Сумма": [1]})
+    with pytest.raises(ValueError):
+        TransactionStore(data)
+
+
+@pytest.fixture
+def statement():
+    df = pd.DataFrame(
+        [
+            ["01.12.2024 10:00:00", "Ирина Ш.", 1500.0, "Финансовые операции", "Списание", None],
+            ["03.12.2024 12:30:00", "MOSKVA\\TEREMOK  CAFE", 602.0, "Фастфуд", "Списание", "обед"],
+            ["05.12.2024 09:00:00", "Перевод +7 921 123-45-67", 300.0, "Финансовые операции", "Списание", ""],
+            ["10.12.2024 18:00:00", "Пятёрочка", 150.5, "Супермаркеты", "Списание", "Продукты \"к ужину\""],
+            ["15.12.2024 00:00:00", "Зарплата", 50000.0, "Пополнения", "Пополнение", None],
+            ["20.12.2024 20:00:00", "Teremok", 450.0, "Фастфуд", "Списание", "ужин"],
+            ["20.12.2024 20:00:00", "Teremok", 450.0, "Фастфуд", "Списание", "ужин"],
+        ],
+        columns=["Дата операции", "Описание операции", "Сумма", "Категория", "Тип", "Комментарий"],
+    )
+    df["Дата операции"] = pd.to_datetime(df["Дата операции"], format="%d.%m.%Y %H:%M:%S")
+    return df
+
+
+def records(df):
+    # Типы колонок у пустого и непустого результата read_sql_query могут различаться
+    return df.astype(object).where(df.notna(), None).to_dict("records")
+
+
+@pytest.fixture
+def engine(tmp_path, statement):
+    with TransactionDatabase(str(tmp_path / "transactions.db")) as db:
+        db.import_frame(statement, "statement.xlsx")
+        yield SQLiteTransactionFilter(db)
+
+
+@pytest.mark.parametrize("flt, descriptions", [
+    (TransactionFilter(), None),
+    (
+        TransactionFilter(start="2024-12-03 12:30", end="2024-12-15"),
+        ["MOSKVA\\TEREMOK  CAFE", "Перевод +7 921 123-45-67", "Пятёрочка"],
+    ),
+    (TransactionFilter(categories=frozenset({"Фастфуд"}), min_amount=500), ["MOSKVA\\TEREMOK  CAFE"]),
+    (TransactionFilter(types=frozenset({"Пополнение"})), ["Зарплата"]),
+    (TransactionFilter(min_amount=300, max_amount=602), None),
+    (TransactionFilter(text="TEREMOK"), ["MOSKVA\\TEREMOK  CAFE", "Teremok", "Teremok"]),
+    (TransactionFilter(text="ПЯТЁР"), ["Пятёрочка"]),
+    (TransactionFilter(text="ин"), ["Ирина Ш.", "Пятёрочка", "Teremok", "Teremok"]),
+    (TransactionFilter(text='"к ужину"'), ["Пятёрочка"]),
+    (TransactionFilter(text="обед", categories=frozenset({"Супермаркеты"})), []),
+    (TransactionFilter(transfer_rule=PERSONAL_TRANSFER_RULE), ["Ирина Ш."]),
+    (TransactionFilter(transfer_rule=PHONE_TRANSFER_RULE, end="2024-12-31"), ["Перевод +7 921 123-45-67"]),
+])
+def test_sqlite_filter_matches_in_memory(engine, statement, flt, descriptions):
+    result = engine.query(flt)
+    expected = filter_transactions(engine.database.load(), flt)
+    assert records(result) == records(expected)
+    assert filter_transactions(statement, flt)["Описание операции"].tolist() == result["Описание операции"].tolist()
+    if descriptions is not None:
+        assert result["Описание операции"].tolist() == descriptions
+    assert engine.count(flt) == len(result)
+
+
+def test_sqlite_filter_indexes_new_rows(engine, statement):
+    assert engine.count(TransactionFilter(text="лента")) == 0
+    later = statement.iloc[:1].assign(**{"Описание операции": "Лента", "Дата операции": pd.Timestamp("2025-01-05")})
+    engine.database.import_frame(later, "january.xlsx")
+    assert engine.query(TransactionFilter(text="лента"))["Описание операции"].tolist() == ["Лента"]
+
+
+def test_sqlite_filter_uses_indexes(engine):
+    plan = " ".join(engine.explain(TransactionFilter(categories=frozenset({"Фастфуд"}), text="teremok")))
+    assert "transactions_Категория" in plan or "transactions_fts" in plan
+    assert "SCAN transactions" not in plan.replace("SCAN transactions_fts", "")
+
+
+def test_sqlite_filter_text_search_survives_vacuum(engine):
+    assert engine.count(TransactionFilter(text="teremok")) == 3
+    connection = engine.database.connection
+    table_info = connection.execute("PRAGMA table_info(transactions)")
+    assert ("id", "INTEGER", 1) in [(row[1], row[2], row[5]) for row in table_info]
+
+    # После удаления строки VACUUM перенумеровал бы неявный rowid, но не id
+    with connection:
+        connection.execute("DELETE FROM transactions WHERE id = 1")
+        connection.execute("DELETE FROM transactions_fts WHERE rowid = 1")
+    connection.execute("VACUUM")
+    result = engine.query(TransactionFilter(text="teremok"))
+    assert result["Описание операции"].tolist() == ["MOSKVA\\TEREMOK  CAFE", "Teremok", "Teremok"]
+    result = engine.query(TransactionFilter(text="ужин"))
+    assert result["Описание операции"].tolist() == ["Пятёрочка", "Teremok", "Teremok"]
+
+
+def test_sqlite_filter_database_without_row_ids(tmp_path, statement):
+    path = str(tmp_path / "transactions.db")
+    with TransactionDatabase(path) as db:
+        db.import_frame(statement, "statement.xlsx")
+        expected = db.load()
+        engine = SQLiteTransactionFilter(db)
+        assert engine.count(TransactionFilter(text="teremok")) == 3
+        # Схема таблицы до появления колонки id
+        columns = ", ".join(f'"{column}"' for column in db.columns() if column != "id")
+        with db.connection:
+            db.connection.execute(f"CREATE TABLE transactions_old AS SELECT {columns} FROM transactions ORDER BY id")
+            db.connection.execute("DROP TABLE transactions")
+            db.connection.execute("ALTER TABLE transactions_old RENAME TO transactions")
+
+    with TransactionDatabase(path) as db:
+        assert "id" in db.columns()
+        pd.testing.assert_frame_equal(db.load(), expected)
+        result = SQLiteTransactionFilter(db).query(TransactionFilter(text="teremok"))
+        assert result["Описание операции"].tolist() == ["MOSKVA\\TEREMOK  CAFE", "Teremok", "Teremok"]
+
+
+def test_filter_missing_columns():
+    df = pd.DataFrame({"Сумма": [1.0, 2.0]})
+    flt = TransactionFilter(start="2024-01-01", categories=frozenset({"Еда"}), transfer_rule=PERSONAL_TRANSFER_RULE)
+    assert filter_transactions(df, flt).empty
+    assert compile_filter(flt, df.columns)[0].startswith("NULL >= ?")
@@ -0,0 +1,135 @@
+import io
+import json
+import pytest
+import pandas as pd
+from src import utils
+from src.utils import (
+    configure_json_backend, dataframe_to_records, dumps_json, frame_to_json, iter_json, normalize_transactions,
+    parse_numeric,
+)
+
+
+@pytest.mark.parametrize("value", [
+    {"total_transactions": 2, "transactions": [{"Сумма": "1500", "Тип": "Списание"}, {"Кэшбек": None}]},
+    [],
+    {},
+    {"nested": {"empty": [], "list": [1, [2, 3]]}},
+    "строка",
+])
+def test_iter_json_matches_json_dumps(value):
+    assert "".join(iter_json(value)) == json.dumps(value, ensure_ascii=False, indent=4)
+    assert "".join(iter_json(value, indent=None)) == json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def test_iter_json_streams_iterators():
+    items = ({"id": i} for i in range(3))
+    result = "".join(iter_json({"total": 3, "items": items}))
+    assert result == json.dumps({"total": 3, "items": [{"id": 0}, {"id": 1}, {"id": 2}]}, indent=4)
+
+
+def test_iter_json_empty_iterator():
+    assert "".join(iter_json(iter([]))) == "[]"
+
+
+def test_iter_json_to_file():
+    fp = io.StringIO()
+    fp.writelines(iter_json(iter([{"Категория": "Еда"}]), indent=None))
+    assert fp.getvalue() == '[{"Категория":"Еда"}]'
+
+
+@pytest.fixture
+def statement():
+    return pd.DataFrame({
+        "Дата операции": ["17.12.2024", "16.12.2024", "16.12.2024", "15.12.2024"],
+        "Описание операции": ["Яна М.", "MOSKVA\\TEREMOK", "MOSKVA\\TEREMOK", "Пятерочка"],
+        "Сумма": ["7777", "+602.5", "602.5", "invalid_sum"],
+        "Кэшбек": ["+30", "150 рублей", None, "1e5"],
+        "Категория": ["Финансовые операции", "Фастфуд", "Фастфуд", "Продукты"],
+        "Тип": ["Списание", "Списание", "Списание", "Списание"],
+        "MCC код": [None, 5814.0, 5814.0, 5411.0],
+    })
+
+
+def test_normalize_transactions_dtypes(statement):
+    result = normalize_transactions(statement)
+
+    assert pd.api.types.is_datetime64_any_dtype(result["Дата операции"])
+    assert result["Дата операции"].iloc[0] == pd.Timestamp("2024-12-17")
+    assert result["Сумма"].dtype == "float64"
+    assert result["Сумма"].iloc[1] == 602.5
+    assert pd.isna(result["Сумма"].iloc[3])
+    assert result["MCC код"].dtype == "Int64"
+    for column in ["Категория", "Тип", "Описание операции"]:
+        assert isinstance(result[column].dtype, pd.CategoricalDtype)
+
+
+def test_normalize_transactions_cashback_pattern(statement):
+    result = normalize_transactions(statement)
+    assert result["Кэшбек"].iloc[0] == 30.0
+    assert result["Кэшбек"].iloc[1:].isna().all()
+
+
+def test_normalize_transactions_memory_report(statement):
+    result = normalize_transactions(statement)
+    memory_usage = result.attrs["memory_usage"]
+    assert memory_usage["saved"] == memory_usage["before"] - memory_usage["after"]
+    assert statement["Сумма"].tolist() == ["7777", "+602.5", "602.5", "invalid_sum"]
+
+
+def test_parse_numeric():
+    raw = pd.Series(["+74.5", 30, None, "150 рублей", "5."], dtype=object)
+    assert parse_numeric(raw).tolist()[:2] == [74.5, 30.0]
+    assert parse_numeric(raw, r"[+-]?\d*\.?\d+").isna().tolist() == [False, False, True, True, True]
+
+
+def test_dataframe_to_records():
+    data = pd.DataFrame({
+        "Дата операции": pd.to_datetime(["2024-12-17", None]),
+        "MCC код": pd.array([5814, None], dtype="Int64"),
+        "Категория": pd.Categorical(["Фастфуд", None]),
+    })
+    assert dataframe_to_records(data) == [
+        {"Дата операции": "2024-12-17", "MCC код": 5814, "Категория": "Фастфуд"},
+        {"Дата операции": None, "MCC код": None, "Категория": None},
+    ]
+
+
+@pytest.fixture(params=["json", "orjson"])
+def json_backend(request):
+    if request.param == "orjson":
+        pytest.importorskip("orjson")
+    previous = utils._json_backend
+    configure_json_backend(request.param)
+    yield request.param
+    configure_json_backend(previous)
+
+
+JSON_VALUES = [
+    {"Описание": "MOSKVA\\OZON RU", "Сумма": 150.5, "Кэшбек": None, "items": [1, {"a": []}], "пусто": {}},
+    [],
+    "строка \"в кавычках\"\n",
+]
+
+
+@pytest.mark.parametrize("value", JSON_VALUES)
+def test_dumps_json(json_backend, value):
+    assert dumps_json(value) == json.dumps(value, ensure_ascii=False, indent=4)
+    compact = dumps_json(value, compact=True)
+    assert json.loads(compact) == value
+    assert "\n" not in compact.replace("\\n", "")
+
+
+def test_configure_json_backend_unknown():
+    with pytest.raises(ValueError):
+        configure_json_backend("yaml")
+
+
+def test_frame_to_json(json_backend):
+    df = pd.DataFrame({
+        "Дата операции": pd.to_datetime(["2024-12-01", None]),
+        "Категория": pd.Categorical(["Продукты", "Фастфуд"]),
+        "Описание": ["MOSKVA\\OZON RU", None],
+        "Сумма": [1234567.89, float("nan")],
+    })
+    assert frame_to_json(df) == json.dumps(dataframe_to_records(df), ensure_ascii=False, indent=4)
+    assert json.loads(frame_to_json(df, compact=True)) == dataframe_to_records(df)
@@ -2,7 +2,9 @@ import os
 import json
 import pytest
 import pandas as pd
-from src.views import main_page, events_page
+from src.views import main_page, main_page_stream, events_page
+from src.transactions_filters import TransactionStore
+from src.utils import normalize_transactions
 
 
 @pytest.fixture
@@ -80,3 +82,77 @@ def test_events_page_invalid_data_format():
     assert result_data["total_events"] == 2
     assert result_data["categories"] == {"Продукты": 1, "Транспорт": 1}
 
+
+def test_main_page_stream_matches_main_page(temp_file):
+    transactions = [
+        {"Сумма": "1500", "Тип": "Списание", "Кэшбек": "+15"},
+        {"Сумма": "2000", "Тип": "Пополнение", "Кэшбек": "+20"},
+    ]
+    temp_file.write_text(json.dumps(transactions, ensure_ascii=False), encoding="utf-8")
+    assert "".join(main_page_stream(str(temp_file))) == main_page(str(temp_file))
+
+
+def test_main_page_stream_pagination(temp_file):
+    transactions = [{"Сумма": str(i), "Тип": "Списание"} for i in range(10)]
+    temp_file.write_text(json.dumps(transactions, ensure_ascii=False), encoding="utf-8")
+    result = "".join(main_page_stream(str(temp_file), offset=8, limit=5, compact=True))
+    result_data = json.loads(result)
+    assert result_data["total_transactions"] == 10
+    assert result_data["transactions"] == transactions[8:]
+
+
+def test_main_page_stream_file_not_found(temp_file):
+    result_data = json.loads("".join(main_page_stream(str(temp_file))))
+    assert "не найден" in result_data["error"]
+
+
+def test_events_page_transaction_store():
+    data = pd.DataFrame([
+        {"Дата операции": "2024-12-02", "Категория": "Еда", "Сумма": 150},
+        {"Дата операции": "2024-12-01", "Категория": "Еда", "Сумма": 200},
+        {"Дата операции": "2024-12-03", "Категория": "Развлечения", "Сумма": "invalid_sum"},
+    ])
+    result_data = json.loads(events_page(TransactionStore(data)))
+    assert result_data["total_events"] == 2
+    assert result_data["categories"] == {"Еда": 2}
+
+
+def test_events_page_normalized_data():
+    data = normalize_transactions(pd.DataFrame({
+        "Категория": ["Продукты", "Транспорт", "Продукты"],
+        "Сумма": ["500", "1000", "invalid_sum"],
+    }))
+    result_data = json.loads(events_page(data))
+    assert result_data["total_events"] == 2
+    assert result_data["categories"] == {"Продукты": 1, "Транспорт": 1}
+
+
+def test_events_page_tie_order_matches_object_dtype():
+    raw = pd.DataFrame({
+        "Категория": ["Транспорт", "Еда", "Транспорт", "Еда", "Кино", "Авто", "Кино"],
+        "Сумма": [100, 200, 300, 400, 500, 600, "invalid_sum"],
+    })
+    expected = json.loads(events_page(raw))["categories"]
+    result_data = json.loads(events_page(normalize_transactions(raw)))
+
+    # Равные частоты идут в порядке первого появления, а не в порядке категорий
+    assert list(expected.items()) == [("Транспорт", 2), ("Еда", 2), ("Кино", 1), ("Авто", 1)]
+    assert list(result_data["categories"].items()) == list(expected.items())
+
+
+def test_main_page_preview_limit(temp_file):
+    transactions = [{"Сумма": str(i), "Тип": "Списание"} for i in range(10)]
+    temp_file.write_text(json.dumps(transactions, ensure_ascii=False), encoding="utf-8")
+    result_data = json.loads(main_page(str(temp_file), preview_limit=3))
+    assert result_data["total_transactions"] == 10
+    assert result_data["transactions"] == transactions[:3]
+
+
+def test_main_page_json_lines(tmp_path):
+    file_path = tmp_path / "transactions.jsonl"
+    transactions = [{"Сумма": "1500", "Тип": "Списание"}, {"Сумма": "2000", "Тип": "Пополнение"}]
+    file_path.write_text("\n".join(json.dumps(tx, ensure_ascii=False) for tx in transactions), encoding="utf-8")
+    result_data = json.loads(main_page(str(file_path)))
+    assert result_data["total_transactions"] == 2
+    assert result_data["transactions"] == transactions
+    assert json.loads("".join(main_page_stream(str(file_path), offset=1)))["transactions"] == transactions[1:]